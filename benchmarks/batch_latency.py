@@ -0,0 +1,78 @@
+"""
+MPyg321 command batching benchmark
+Times a "scene change" reconfiguring several players at once (LOAD, JUMP,
+VOLUME, PITCH, EQ, SEQ on each of them) until all the commands are
+acknowledged, with one write per command and with one write per player
+using batch(), against the fake mpg123 (benchmarks/fake_mpg123.py).
+
+Usage: python benchmarks/batch_latency.py [--players N] [--runs N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+
+FAKE_PLAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mpg123.py")
+
+
+def scene(player, run):
+    """Commands of a scene change, returns their futures"""
+    return [
+        player.play_song("scene{}.mp3".format(run)),
+        player.jump(100),
+        player.volume(40 + run % 20),
+        player.pitch(0.01 * (run % 5)),
+        player.eq(3, run % 32, 1.5),
+        player.seq(1.2, 1.0, 0.8),
+    ]
+
+
+def change_scene(players, run, batched):
+    """Seconds taken to reconfigure all the players"""
+    start = time.perf_counter()
+    futures = []
+    for player in players:
+        if batched:
+            with player.batch() as batch:
+                scene(player, run)
+            futures.extend(batch)
+        else:
+            futures.extend(scene(player, run))
+    for future in futures:
+        future.result(5)
+    return time.perf_counter() - start
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    players = [MPyg123Player(FAKE_PLAYER) for _ in range(args.players)]
+    change_scene(players, 0, False)  # warm up, the players start
+    print("{} players, {} scene changes".format(args.players, args.runs))
+    for batched in (False, True):
+        samples = sorted(
+            change_scene(players, run, batched) * 1000 for run in range(args.runs)
+        )
+        print(
+            "{:<22} mean {:6.2f} ms  p50 {:6.2f} ms  max {:6.2f} ms".format(
+                "batch()" if batched else "one write per command",
+                statistics.mean(samples),
+                samples[len(samples) // 2],
+                samples[-1],
+            )
+        )
+    for player in players:
+        player.quit()
+
+
+if __name__ == "__main__":
+    main()
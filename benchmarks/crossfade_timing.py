@@ -0,0 +1,129 @@
+"""
+MPyg321 crossfade timing benchmark
+Crossfades a queue of short songs across two fake mpg123 players
+(benchmarks/fake_mpg123.py) with a Crossfader, and reports the lateness
+of the scheduler timer wakeups, the VOLUME commands sent and coalesced,
+and how far from the end of the outgoing song minus the fade duration
+the incoming song started. The same fades done by a sleep loop sending
+a volume every 10 ms are timed for comparison.
+
+Usage: python benchmarks/crossfade_timing.py [--songs N] [--seconds S]
+       [--duration S]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.consts import MPyg321Events  # noqa: E402
+from mpyg321.Crossfader import Crossfader  # noqa: E402
+from mpyg321.Metrics import Histogram  # noqa: E402
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+
+FAKE_PLAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mpg123.py")
+FPS = 44100 / 1152
+
+
+def crossfader_run(args):
+    """Plays the songs with a Crossfader, returns it and the start errors (ms)"""
+    custom_args = "--fake-frames {}".format(int(args.seconds * FPS))
+    # The frame output gives the seconds left of the songs
+    players = [
+        MPyg123Player(FAKE_PLAYER, performance_mode=False, custom_args=custom_args)
+        for _ in range(2)
+    ]
+    ends = {}  # player -> expected perf_counter time of the end of its song
+    errors = []
+    done = threading.Event()
+
+    def on_progress(context):
+        ends[context.player] = time.perf_counter() + context.seconds_left
+
+    def on_resume(context):
+        outgoing = players[0] if context.player is players[1] else players[1]
+        expected = ends[outgoing] - args.duration
+        errors.append((time.perf_counter() - expected) * 1000)
+
+    def on_end(context):
+        if context.player is crossfader.current:
+            done.set()
+
+    for player in players:
+        player.subscribe_event(MPyg321Events.PROGRESS, on_progress)
+        player.subscribe_event(MPyg321Events.USER_RESUME, on_resume)
+        player.subscribe_event(MPyg321Events.MUSIC_END, on_end)
+    crossfader = Crossfader(players[0], players[1], args.duration, volume=80)
+    for i in range(args.songs):
+        crossfader.enqueue("song{}.mp3".format(i))
+    crossfader.play()
+    done.wait(args.songs * args.seconds + 10)
+    crossfader.close()
+    for player in players:
+        player.quit()
+    return crossfader, errors
+
+
+def sleep_loop_run(args, player):
+    """Fades out and in with a sleep loop, returns the wakeup lateness (ms)"""
+    lateness = Histogram()
+    sent = 0
+    for start, end in ((80, 0), (0, 80)):
+        begin = time.perf_counter()
+        deadline = begin
+        while deadline - begin < args.duration:
+            deadline += 0.01
+            time.sleep(max(deadline - time.perf_counter(), 0))
+            lateness.observe((time.perf_counter() - deadline) * 1000)
+            t = min((deadline - begin) / args.duration, 1.0)
+            player.volume(round(start + (end - start) * t, 2))
+            sent += 1
+    return lateness, sent
+
+
+def print_jitter(name, snapshot):
+    print(
+        "{:<12} wakeup lateness p50 {:6.3f} ms  p99 {:6.3f} ms  max {:6.3f} ms".format(
+            name, snapshot["p50"], snapshot["p99"], snapshot["max"]
+        )
+    )
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+
+    crossfader, errors = crossfader_run(args)
+    stats = crossfader.scheduler.stats()
+    fades = crossfader.fades
+    print("{} crossfades of {} s".format(fades, args.duration))
+    print_jitter("scheduler", stats["jitter"])
+    print(
+        "{:<12} {} volume commands, {} evaluations coalesced, {:.1f} per ramp".format(
+            "", stats["sent"], stats["coalesced"], stats["sent"] / max(2 * fades, 1)
+        )
+    )
+    if errors:
+        print(
+            "{:<12} start error mean {:+.1f} ms, max {:+.1f} ms".format(
+                "", statistics.mean(errors), max(errors, key=abs)
+            )
+        )
+
+    player = MPyg123Player(FAKE_PLAYER)
+    player.play_song("song.mp3")
+    lateness, sent = sleep_loop_run(args, player)
+    player.quit()
+    print_jitter("sleep loop", lateness.snapshot())
+    print("{:<12} {} volume commands per ramp".format("", sent // 2))
+
+
+if __name__ == "__main__":
+    main()
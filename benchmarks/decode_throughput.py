@@ -0,0 +1,61 @@
+"""
+MPyg321 PCMDecoder throughput benchmark
+Decodes songs to raw samples one after the other with iter_chunks, and
+in parallel with decode_many, and reports how many times faster than
+real time it runs. It uses the fake mpg123 (benchmarks/fake_mpg123.py)
+by default, which writes samples without decoding anything: pass
+--player mpg123 and real files to measure the decoding itself.
+
+Usage: python benchmarks/decode_throughput.py [--files N] [--workers N]
+       [--player mpg123 song.mp3 ...]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.PCMDecoder import PCMDecoder  # noqa: E402
+
+FAKE_PLAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mpg123.py")
+
+
+def byte_count(samples):
+    """Summary computed in the decode_many workers (bytearray or array)"""
+    return getattr(samples, "nbytes", len(samples))
+
+
+def report(name, decoder, total_bytes, elapsed):
+    seconds = total_bytes / decoder.frame_size / decoder.rate
+    line = "{:<14} {:8.1f} s of audio in {:6.2f} s: {:7.1f}x real time, {:6.1f} MB/s"
+    speed = seconds / elapsed
+    print(line.format(name, seconds, elapsed, speed, total_bytes / elapsed / 1e6))
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("songs", nargs="*")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--player", default=FAKE_PLAYER)
+    args = parser.parse_args()
+    songs = args.songs or ["song{}.mp3".format(i) for i in range(args.files)]
+    decoder = PCMDecoder(args.player)
+
+    start = time.perf_counter()
+    total = sum(len(chunk) for song in songs for chunk in decoder.iter_chunks(song))
+    report("iter_chunks", decoder, total, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    total = 0
+    for _, size in decoder.decode_many(songs, byte_count, args.workers):
+        total += size
+    if decoder.errors:
+        print("errors:", decoder.errors)
+    report("decode_many", decoder, total, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
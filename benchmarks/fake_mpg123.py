@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Fake mpg123 remote control player
+Stand-in for "mpg123 -R" (or "mpg321 -R" when the program name contains
+"mpg321", see fake_mpg321.py) speaking the same protocol, without decoding
+anything nor opening any audio device, for tests and benchmarks on
+headless boxes.
+Use it as the player binary: MPyg123Player(player="benchmarks/fake_mpg123.py")
+
+Options are passed through custom_args, e.g. custom_args="--fake-fps 100":
+--fake-fps: "@F" frames emitted per second while playing (default 38.28)
+--fake-frames: number of frames of every song (default 2297, 60 seconds)
+--fake-latency: seconds before answering each command (default 0)
+--fake-startup: seconds before the "@R" greeting (default 0)
+--fake-load-time: extra seconds to answer LOAD/LOADPAUSED, as the time
+    to open a file and decode its first frames (default 0)
+--fake-script: file of "<seconds> <message>" lines, each message is sent
+    that many seconds after startup, e.g. "2.5 @E Corrupted file: x".
+    The "!exit <code>" message makes the player exit, as in a crash.
+Songs whose path contains "missing" fail with "@E Error opening stream".
+Named pipes (see play_stream) are read for real: the song lasts one frame
+per FRAME_BYTES bytes written to the pipe.
+With -s (see PCMDecoder), the samples of a 440 Hz sine lasting
+--fake-frames frames are written to stdout, as fast as possible, in the
+-e encoding (s16 or f32, silence for the others), -r rate and --mono or
+--stereo channels.
+"""
+import argparse
+import array
+import heapq
+import itertools
+import math
+import os
+import select
+import stat
+import sys
+import time
+
+FRAME_BYTES = 418  # MPEG 1 layer 3 frame at 128 kbit/s and 44.1 kHz
+
+
+class FakePlayer:
+    """State machine of the fake player"""
+
+    def __init__(self, flavor, fps, frames, latency, load_time=0.0):
+        self.flavor = flavor
+        self.fps = fps
+        self.frames = frames
+        self.latency = latency
+        self.load_time = load_time
+        self.frame = 0
+        self.playing = False
+        self.loaded = False
+        self.silenced = False
+        self.pitch_value = 0.0
+        self.next_frame_time = None
+        self.stream_fd = None  # named pipe being read
+        self.stream_bytes = 0
+        self._scheduled = []  # heap of (time, order, message)
+        self._order = itertools.count()
+
+    def send(self, message):
+        """Writes one protocol message"""
+        sys.stdout.write("@" + message + "\n")
+        sys.stdout.flush()
+
+    def reply(self, message, delay=0.0):
+        """Sends a command answer, after the configured latency and delay"""
+        if self.latency or delay:
+            self.schedule(time.monotonic() + self.latency + delay, "@" + message)
+        else:
+            self.send(message)
+
+    def schedule(self, when, message):
+        """Sends a raw message (or runs a "!" directive) at a given time"""
+        heapq.heappush(self._scheduled, (when, next(self._order), message))
+
+    def position(self):
+        """Frame progress message"""
+        left = self.available_frames() - self.frame
+        return "F {} {} {:.2f} {:.2f}".format(
+            self.frame, left, self.frame / self.fps, left / self.fps
+        )
+
+    def load(self, path, paused=False):
+        """Loads a song"""
+        if "missing" in path:
+            self.reply("E Error opening stream: {}".format(path))
+            return
+        self.close_stream()
+        try:
+            if stat.S_ISFIFO(os.stat(path).st_mode):
+                self.stream_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+                self.stream_bytes = 0
+                self.frames = None
+        except OSError:
+            pass
+        title = os.path.splitext(os.path.basename(path))[0]
+        delay = self.load_time
+        self.reply("I ID3v2.title:{}".format(title), delay)
+        self.reply("I ID3v2.artist:Fake Artist", delay)
+        self.reply("S 1.0 3 44100 Joint-Stereo 0 418 2 0 0 0 128 0 1", delay)
+        self.loaded = True
+        self.frame = 0
+        self.set_playing(not paused, delay)
+
+    def close_stream(self):
+        """Stops reading the named pipe, the song length is then known"""
+        if self.stream_fd is not None:
+            os.close(self.stream_fd)
+            self.stream_fd = None
+            self.frames = max(self.stream_bytes // FRAME_BYTES, 1)
+
+    def read_stream(self):
+        """Reads the available data of the named pipe"""
+        try:
+            data = os.read(self.stream_fd, 65536)
+        except BlockingIOError:
+            return
+        self.stream_bytes += len(data)
+        if not data:
+            self.close_stream()
+
+    def available_frames(self):
+        """Frames that can be played, None when unlimited"""
+        if self.stream_fd is not None:
+            return self.stream_bytes // FRAME_BYTES
+        return self.frames
+
+    def set_playing(self, playing, delay=0.0):
+        """Starts or pauses the frame output"""
+        self.playing = playing
+        start = time.monotonic() + self.latency + delay
+        self.next_frame_time = start if playing else None
+        self.reply("P 2" if playing else "P 1", delay)
+
+    def end_of_song(self):
+        """Reports the end of the song"""
+        self.playing = self.loaded = False
+        self.send("P 3" if self.flavor == "mpg321" else "P 0")
+
+    def jump(self, position):
+        """Jumps to a frame, "+N"/"-N" relative frames or "Ns" seconds"""
+        relative = position[:1] in ("+", "-")
+        try:
+            if position.endswith("s"):
+                frames = int(float(position[:-1]) * self.fps)
+            else:
+                frames = int(position)
+        except ValueError:
+            self.reply("E invalid arguments for JUMP: {}".format(position))
+            return
+        frame = self.frame + frames if relative else frames
+        self.frame = min(max(frame, 0), self.available_frames())
+        self.reply("J {}".format(self.frame))
+
+    def command(self, line):
+        """Runs a command, returns False on QUIT"""
+        name, _, args = line.strip().partition(" ")
+        name = name.upper()
+        if name == "":
+            return True
+        if name in ("QUIT", "Q"):
+            return False
+        if name in ("LOAD", "L"):
+            self.load(args)
+        elif name in ("LOADPAUSED", "LP"):
+            self.load(args, paused=True)
+        elif name in ("PAUSE", "P"):
+            if self.loaded:
+                self.set_playing(not self.playing)
+        elif name in ("STOP", "S"):
+            self.close_stream()
+            self.playing = self.loaded = False
+            self.reply("P 0")
+        elif name in ("JUMP", "J"):
+            self.jump(args)
+        elif name in ("VOLUME", "V") and self.flavor == "mpg123":
+            self.reply("V {:.6f}%".format(float(args)))
+        elif name in ("GAIN", "G") and self.flavor == "mpg321":
+            pass
+        elif name == "SILENCE" and self.flavor == "mpg123":
+            self.silenced = True
+            self.reply("silence")
+        elif name == "MUTE" and self.flavor == "mpg123":
+            self.reply("mute")
+        elif name == "UNMUTE" and self.flavor == "mpg123":
+            self.reply("unmute")
+        elif name == "SAMPLE" and self.flavor == "mpg123":
+            samples = self.frame * 1152
+            total = self.available_frames() * 1152
+            self.reply("SAMPLE {} {}".format(samples, total))
+        elif name == "PITCH" and self.flavor == "mpg123":
+            self.pitch(args)
+        elif name in ("EQ", "E") and self.flavor == "mpg123":
+            self.eq(args)
+        elif name == "SEQ" and self.flavor == "mpg123":
+            self.seq(args)
+        elif name == "RVA" and self.flavor == "mpg123":
+            self.reply("RVA {}".format(args.lower()))
+        elif name == "SCAN" and self.flavor == "mpg123":
+            self.reply("SCAN done" if self.loaded else "E No track loaded!")
+        elif name == "TAG" and self.flavor == "mpg123":
+            self.listing("T", ["ID3v2.title:Fake Title"])
+        elif name == "STATE" and self.flavor == "mpg123":
+            self.listing("STATE", ["frame {}".format(self.frame)])
+        else:
+            self.reply("E Unknown command: '{}'".format(name.lower()))
+        return True
+
+    def pitch(self, value):
+        """Sets or changes (+N/-N) the pitch"""
+        relative = value[:1] in ("+", "-")
+        self.pitch_value = (self.pitch_value if relative else 0) + float(value)
+        self.reply("PITCH {:.6f}".format(self.pitch_value))
+
+    def eq(self, args):
+        """Sets an equalizer band"""
+        try:
+            channel, band, value = args.split()
+            self.reply("{} : {} : {:.6f}".format(int(channel), int(band), float(value)))
+        except ValueError:
+            self.reply("E invalid arguments for equalizer: {}".format(args))
+
+    def seq(self, args):
+        """Sets the simple equalizer"""
+        try:
+            bass, mid, treble = (float(v) for v in args.split())
+            self.reply(
+                "bass: {:.6f} mid: {:.6f} treble: {:.6f}".format(bass, mid, treble)
+            )
+        except ValueError:
+            self.reply("E invalid arguments for SEQ: {}".format(args))
+
+    def listing(self, tag, lines):
+        """Sends a listing between "{" and "}" lines"""
+        self.reply(tag + " {")
+        for line in lines:
+            self.reply(tag + " " + line)
+        self.reply(tag + " }")
+
+    def tick(self):
+        """Emits the messages due since the last call"""
+        now = time.monotonic()
+        while self._scheduled and self._scheduled[0][0] <= now:
+            _, _, message = heapq.heappop(self._scheduled)
+            if message.startswith("!exit"):
+                sys.exit(int(message.split()[1]) if " " in message else 1)
+            sys.stdout.write(message + "\n")
+            sys.stdout.flush()
+        while self.playing and self.next_frame_time <= now:
+            if self.frame >= self.available_frames():
+                # Waiting for the stream data
+                self.next_frame_time = now + 1.0 / self.fps
+                break
+            if not self.silenced:
+                self.send(self.position())
+            self.frame += 1
+            self.next_frame_time += 1.0 / self.fps
+            if self.frames is not None and self.frame >= self.frames:
+                self.end_of_song()
+
+    def timeout(self):
+        """Seconds until the next message, None when idle"""
+        times = []
+        if self.playing:
+            times.append(self.next_frame_time)
+        if self._scheduled:
+            times.append(self._scheduled[0][0])
+        if not times:
+            return None
+        return max(min(times) - time.monotonic(), 0)
+
+
+def write_samples(path, frames, encoding, rate, channels):
+    """Writes the raw samples of a song to stdout, as "mpg123 -s" does"""
+    if "missing" in path:
+        sys.stderr.write("error: Cannot open file {}\n".format(path))
+        sys.exit(1)
+    sizes = {"s16": 2, "u16": 2, "s32": 4, "u32": 4, "s8": 1, "u8": 1, "f64": 8}
+    # One second of a 440 Hz sine
+    wave = [math.sin(2 * math.pi * 440 * i / rate) for i in range(rate)]
+    if encoding == "s16":
+        second = array.array("h", (int(v * 16000) for v in wave))
+    elif encoding == "f32":
+        second = array.array("f", (v * 0.5 for v in wave))
+    else:
+        second = bytes(sizes.get(encoding, 2) * rate)
+    # Same sample on every channel
+    size = second.itemsize if isinstance(second, array.array) else sizes[encoding]
+    second = bytes(second)
+    second = b"".join(
+        second[i : i + size] * channels for i in range(0, len(second), size)
+    )
+    remaining = len(second) * frames * 1152 // rate
+    out = sys.stdout.buffer
+    while remaining > 0:
+        out.write(second[:remaining])
+        remaining -= len(second)
+    out.flush()
+
+
+def main():
+    """Do the magic"""
+    flavor = "mpg321" if "mpg321" in os.path.basename(sys.argv[0]) else "mpg123"
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--version", action="store_true")
+    parser.add_argument("-R", "--remote", action="store_true")
+    parser.add_argument("--fake-fps", type=float, default=44100 / 1152)
+    parser.add_argument("--fake-frames", type=int, default=2297)
+    parser.add_argument("--fake-latency", type=float, default=0.0)
+    parser.add_argument("--fake-startup", type=float, default=0.0)
+    parser.add_argument("--fake-load-time", type=float, default=0.0)
+    parser.add_argument("--fake-script", default=None)
+    parser.add_argument("-s", "--stdout", action="store_true")
+    parser.add_argument("-e", "--encoding", default="s16")
+    parser.add_argument("-r", "--rate", type=int, default=44100)
+    parser.add_argument("-m", "--mono", action="store_true")
+    args, rest = parser.parse_known_args()
+    if args.version:
+        if flavor == "mpg321":
+            print("mpg321 version 0.3.2 (fake)")
+        else:
+            print("mpg123 1.31.2 (fake)")
+        return
+    if args.stdout:
+        channels = 1 if args.mono else 2
+        write_samples(rest[-1], args.fake_frames, args.encoding, args.rate, channels)
+        return
+
+    player = FakePlayer(
+        flavor, args.fake_fps, args.fake_frames, args.fake_latency, args.fake_load_time
+    )
+    start = time.monotonic()
+    if args.fake_script:
+        with open(args.fake_script) as f:
+            for line in f:
+                if line.strip() and not line.startswith("#"):
+                    delay, message = line.strip().split(" ", 1)
+                    player.schedule(start + float(delay), message)
+    time.sleep(args.fake_startup)
+    player.send("R MPG123 (ThOr) v10")
+    pending = b""
+    while True:
+        inputs = [0] if player.stream_fd is None else [0, player.stream_fd]
+        readable, _, _ = select.select(inputs, [], [], player.timeout())
+        if player.stream_fd is not None and player.stream_fd in readable:
+            player.read_stream()
+        if 0 in readable:
+            data = os.read(0, 4096)
+            if not data:
+                return
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if not player.command(line.decode("utf-8", "replace")):
+                    return
+        player.tick()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+fake_mpg123.py
\ No newline at end of file
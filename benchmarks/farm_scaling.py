@@ -0,0 +1,81 @@
+"""
+MPyg321 PlayerFarm scaling benchmark
+Runs zones of fake players (benchmarks/fake_mpg123.py) flooding "@F"
+frames with a PROGRESS callback, in this process (PlayerManager) and
+sharded over 1, 2, 4... worker processes (PlayerFarm). For each setup
+it reports the PROGRESS events received per second and the acknowledged
+VOLUME commands per second sent while the frames flow.
+The gain depends on the number of cores of the machine.
+
+Usage: python benchmarks/farm_scaling.py [--zones N] [--workers 1 2 4] [--fps N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.consts import MPyg321Events  # noqa: E402
+from mpyg321.PlayerFarm import PlayerFarm  # noqa: E402
+from mpyg321.PlayerManager import PlayerManager  # noqa: E402
+
+FAKE_PLAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mpg123.py")
+PLAYER_ARGS = "--fake-fps {} --fake-frames 100000000"
+
+
+def run(players, duration):
+    """Events and acknowledged commands per second over duration"""
+    events = [0]
+
+    def on_progress(context):
+        events[0] += 1
+
+    for player in players:
+        player.subscribe_event(MPyg321Events.PROGRESS, on_progress)
+    for future in [player.play_song("zone.mp3") for player in players]:
+        future.result(10)
+    time.sleep(0.5)  # let the frame output settle
+    events[0] = 0
+    commands = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        futures = [player.volume(commands % 100) for player in players]
+        for future in futures:
+            future.result(10)
+        commands += len(futures)
+    elapsed = time.perf_counter() - start
+    return events[0] / elapsed, commands / elapsed
+
+
+def report(name, results):
+    print("{:<18} {:>10.0f} {:>12.0f}".format(name, *results))
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--zones", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--fps", type=float, default=1000, help="frames per zone")
+    args = parser.parse_args()
+    kwargs = {
+        "player": FAKE_PLAYER,
+        "performance_mode": False,
+        "custom_args": PLAYER_ARGS.format(args.fps),
+    }
+
+    print("{} zones, {} cores".format(args.zones, os.cpu_count()))
+    print("{:<18} {:>10} {:>12}".format("setup", "events/s", "commands/s"))
+    with PlayerManager(**kwargs) as manager:
+        players = [manager.add_player() for _ in range(args.zones)]
+        report("PlayerManager", run(players, args.duration))
+    for workers in args.workers:
+        with PlayerFarm(workers=workers, **kwargs) as farm:
+            players = [farm.add_player() for _ in range(args.zones)]
+            report("PlayerFarm x{}".format(workers), run(players, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+MPyg321 reader hot path allocation benchmark
+Feeds the recorded mpg123 transcript (without its error line), one
+message at a time, to a player without reader thread (threaded=False)
+and measures with tracemalloc the memory allocated while each message is
+parsed and dispatched (peak above the memory in use before the message),
+summed per 10k messages, along with the time spent per 10k messages.
+It runs without any callback, then with a PROGRESS subscriber, for the
+current player ("after") and for a baseline player dispatching as before
+the precompiled dispatch table ("before"): an if/elif chain and an event
+context built for every event, subscribed or not. The baseline keeps the
+slotted contexts and the current parser, so it measures the dispatch and
+context creation changes alone.
+
+Usage: python benchmarks/hotpath_allocations.py [--messages N] [transcript]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.consts import MPyg321Events, PlayerPosition  # noqa: E402
+from mpyg321.EventContext import (  # noqa: E402
+    MPyg321EventContext,
+    MPyg321ProgressContext,
+)
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FAKE_PLAYER = os.path.join(BENCHMARKS_DIR, "fake_mpg123.py")
+DEFAULT_TRANSCRIPT = os.path.join(BENCHMARKS_DIR, "data", "mpg123_transcript.txt")
+
+
+def load_messages(path, count):
+    """count messages of the transcript, repeated as needed"""
+    with open(path, "rb") as f:
+        lines = [line for line in f.read().splitlines(True) if line[:2] != b"@E"]
+    return [lines[i % len(lines)] for i in range(count)]
+
+
+class BaselinePlayer(MPyg123Player):
+    """Player dispatching the actions with the former if/elif chain and
+    building the event contexts even without subscriber
+    """
+
+    def process_action(self, action, args):
+        if action == "music_stop":
+            self.on_music_stop_int()
+        elif action == "user_pause":
+            self.on_user_pause_int()
+        elif action == "user_start_or_resume":
+            self.on_user_start_or_resume_int()
+        elif action == "end_of_song":
+            self.on_end_of_song_int()
+        elif action == "progress":
+            self.on_progress_int(args)
+        elif action == "info":
+            self.on_info_int(args)
+        elif action == "stream_info":
+            self.on_stream_info_int(args)
+        elif action == "error":
+            self.on_error(args.decode("utf-8", "replace"))
+        elif action == "user_mute":
+            self.on_user_mute_int()
+        elif action == "user_unmute":
+            self.on_user_unmute_int()
+        else:
+            self.process_output_ext(action)
+
+    def on_progress_int(self, args):
+        try:
+            frame, frames_left, seconds, seconds_left = args.split()
+            position = PlayerPosition(
+                int(frame), int(frames_left), float(seconds), float(seconds_left)
+            )
+        except ValueError:
+            return
+        self.position = position
+        self._frame = position.frame
+        if self.track_info is not None and self.track_info.frames is None:
+            self.track_info.set_length(position)
+        self._trigger_event(
+            MPyg321Events.PROGRESS, MPyg321ProgressContext(self, position)
+        )
+        self.on_progress()
+
+    def _trigger_event(self, event_name, context=None):
+        if context is None:
+            context = MPyg321EventContext(self)
+        super()._trigger_event(event_name, context)
+
+
+def measure(player_class, messages, subscribed):
+    """Allocated bytes and seconds per 10k messages"""
+    player = player_class(FAKE_PLAYER, performance_mode=False, threaded=False)
+    if subscribed:
+        player.subscribe_event(MPyg321Events.PROGRESS, lambda context: None)
+    # Warm up the caches and lazily created attributes
+    for message in messages[:100]:
+        player.feed_output(message)
+
+    start = time.perf_counter()
+    for message in messages:
+        player.feed_output(message)
+    elapsed = time.perf_counter() - start
+
+    allocated = 0
+    tracemalloc.start()
+    for message in messages:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        player.feed_output(message)
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    player.player.terminate(force=True)
+    scale = 10000.0 / len(messages)
+    return allocated * scale, elapsed * scale
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("transcript", nargs="?", default=DEFAULT_TRANSCRIPT)
+    args = parser.parse_args()
+
+    messages = load_messages(args.transcript, args.messages)
+    print(
+        "{:<22}{:<8}{:>18}{:>14}".format("", "", "bytes / 10k msgs", "ms / 10k msgs")
+    )
+    versions = (("before", BaselinePlayer), ("after", MPyg123Player))
+    for name, subscribed in (("no subscriber", False), ("PROGRESS subscriber", True)):
+        for version, player_class in versions:
+            allocated, elapsed = measure(player_class, messages, subscribed)
+            print(
+                "{:<22}{:<8}{:>18,.0f}{:>14.2f}".format(
+                    name, version, allocated, elapsed * 1000
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+MPyg321 LoudnessAnalyzer benchmark
+Measures the loudness of songs with 1 and N worker processes, then
+again from the cache, and reports how many times faster than real time
+the analysis runs. It uses the fake mpg123 (benchmarks/fake_mpg123.py)
+writing one minute sines by default: pass --player mpg123 and real
+files to include the decoding.
+
+Usage: python benchmarks/loudness_analysis.py [--files N] [--workers N]
+       [--player mpg123 song.mp3 ...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.LoudnessAnalyzer import LoudnessAnalyzer  # noqa: E402
+
+FAKE_PLAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mpg123.py")
+FAKE_SONG_SECONDS = 2297 * 1152 / 44100
+
+
+def analyze(songs, player, workers, cache_path=None):
+    """Seconds taken to analyze songs"""
+    analyzer = LoudnessAnalyzer(cache_path, workers=workers, player=player)
+    start = time.perf_counter()
+    results = analyzer.analyze(songs)
+    elapsed = time.perf_counter() - start
+    if analyzer.errors:
+        print("errors:", analyzer.errors)
+    return elapsed, results
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("songs", nargs="*")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--player", default=FAKE_PLAYER)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        songs = args.songs
+        if not songs:
+            # The fake player only needs files to exist
+            songs = [
+                os.path.join(directory, "{}.mp3".format(i)) for i in range(args.files)
+            ]
+            for song in songs:
+                open(song, "w").close()
+        audio = FAKE_SONG_SECONDS * len(songs) if not args.songs else None
+        cache_path = os.path.join(directory, "loudness.json")
+        for name, workers, cache in (
+            ("1 worker", 1, None),
+            ("pool of {}".format(args.workers), args.workers, cache_path),
+            ("cached", args.workers, cache_path),
+        ):
+            elapsed, results = analyze(songs, args.player, workers, cache)
+            speed = " {:6.1f}x real time".format(audio / elapsed) if audio else ""
+            print("{:<12} {:7.3f} s{}".format(name, elapsed, speed))
+        for song, loudness in sorted(results.items())[:3]:
+            print("{}: {:.2f} LUFS".format(os.path.basename(song), loudness))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+MPyg321 PlayerManager scaling benchmark
+Plays a song on 1, 16, 64 and 256 fake players flooding "@F" frames
+(benchmarks/fake_mpg123.py) and reports the CPU usage of this process
+and its thread count, with one reader thread per player, with all the
+players multiplexed by a PlayerManager and with asyncio players on one
+event loop. The asyncio players must not add threads: the script exits
+with status 1 if they do.
+
+Usage: python benchmarks/manager_scaling.py [--counts 1 16 64 256] [--duration S]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.AsyncBasePlayer import use_pidfd_child_watcher  # noqa: E402
+from mpyg321.AsyncMPyg123Player import AsyncMPyg123Player  # noqa: E402
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+from mpyg321.PlayerManager import PlayerManager  # noqa: E402
+
+FAKE_PLAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mpg123.py")
+PLAYER_KWARGS = {
+    "player": FAKE_PLAYER,
+    "performance_mode": False,
+    "custom_args": "--fake-frames 1000000",
+}
+
+
+def measure(duration):
+    """Returns the CPU usage (%) of this process and its thread count"""
+    cpu, wall = time.process_time(), time.perf_counter()
+    time.sleep(duration)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    return 100 * cpu / wall, threading.active_count()
+
+
+def threaded(count, duration):
+    """One reader thread per player"""
+    players = [MPyg123Player(**PLAYER_KWARGS) for _ in range(count)]
+    for player in players:
+        player.play_song("sample.mp3")
+    result = measure(duration)
+    for player in players:
+        player.quit()
+    return result
+
+
+def managed(count, duration):
+    """All the players read by one PlayerManager thread"""
+    with PlayerManager(**PLAYER_KWARGS) as manager:
+        for _ in range(count):
+            manager.add_player().play_song("sample.mp3")
+        return measure(duration)
+
+
+def asynchronous(count, duration):
+    """All the players read by tasks of one event loop"""
+
+    async def run():
+        if not use_pidfd_child_watcher():
+            print("no pidfd child watcher: one thread per asyncio player")
+        players = [AsyncMPyg123Player(**PLAYER_KWARGS) for _ in range(count)]
+        for player in players:
+            await player.start()
+            await player.play_song("sample.mp3")
+        cpu, wall = time.process_time(), time.perf_counter()
+        await asyncio.sleep(duration)
+        cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+        threads = threading.active_count()
+        for player in players:
+            await player.quit()
+        return 100 * cpu / wall, threads
+
+    return asyncio.run(run())
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 16, 64, 256])
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("{:>8} {:>10} {:>8} {:>8}".format("players", "mode", "cpu %", "threads"))
+    modes = (("threaded", threaded), ("manager", managed), ("asyncio", asynchronous))
+    extra_threads = False
+    for count in args.counts:
+        for name, func in modes:
+            baseline = threading.active_count()
+            cpu, threads = func(count, args.duration)
+            print("{:>8} {:>10} {:>8.1f} {:>8}".format(count, name, cpu, threads))
+            if name == "asyncio" and threads > baseline:
+                extra_threads = True
+            time.sleep(1)
+    if extra_threads:
+        print("the asyncio players started threads (child watcher)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+MPyg321 parser benchmark
+Replays a recorded mpg123 remote control transcript (performance_mode=False,
+so mostly "@F" frame messages) through the former pexpect expect() parser
+and through MPygOutputParser, and prints the messages parsed per second.
+
+Usage: python benchmarks/parser_throughput.py [--repeat N] [transcript]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pexpect
+from pexpect.fdpexpect import fdspawn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.consts import mpg_outs, mpg_outs_ext  # noqa: E402
+from mpyg321.OutputParser import MPygOutputParser  # noqa: E402
+
+DEFAULT_TRANSCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "mpg123_transcript.txt"
+)
+READ_SIZE = 4096
+
+
+def expect_parser(path, outs):
+    """Former parser: one expect() over the list of mpg_codes per message"""
+    # The timeout entry has no code since consts stopped importing pexpect
+    mpg_codes = [
+        pexpect.TIMEOUT if v["mpg_code"] is None else v["mpg_code"] for v in outs
+    ]
+    with open(path, "rb") as f:
+        spawn = fdspawn(f.fileno(), maxread=READ_SIZE)
+        try:
+            while True:
+                spawn.expect(mpg_codes)
+        except pexpect.EOF:
+            pass
+
+
+def line_parser(path, outs):
+    """New parser: whole lines dispatched on their tag"""
+    parser = MPygOutputParser(outs)
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(READ_SIZE)
+            if not data:
+                break
+            for _ in parser.parse(data):
+                pass
+
+
+def measure(func, path, outs, messages):
+    """Returns the number of messages parsed per second by func"""
+    start = time.perf_counter()
+    func(path, outs)
+    return messages / (time.perf_counter() - start)
+
+
+def main():
+    """Do the magic"""
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("transcript", nargs="?", default=DEFAULT_TRANSCRIPT)
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    with open(args.transcript, "rb") as f:
+        transcript = f.read()
+    outs = mpg_outs + mpg_outs_ext["mpg123"]
+    with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as f:
+        f.write(transcript * args.repeat)
+    try:
+        messages = transcript.count(b"\n") * args.repeat
+        print("{} messages".format(messages))
+        for name, func in (("expect", expect_parser), ("line", line_parser)):
+            rate = measure(func, f.name, outs, messages)
+            print("{:>8}: {:>12.0f} messages/s".format(name, rate))
+    finally:
+        os.unlink(f.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+MPyg321 pool benchmark
+Measures the time between asking for a player and mpg123 reporting that
+the song plays ("@P 2"), with a cold player built on demand and with a
+player handed out by a PlayerPool.
+You need to add a "sample.mp3" file in the working directory
+
+Usage: python benchmarks/pool_latency.py [--runs N] [--player PATH] [song]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from threading import Event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+from mpyg321.PlayerPool import PlayerPool  # noqa: E402
+
+
+class TimedPlayer(MPyg123Player):
+    """Player signaling the first "@P 2" after each play"""
+
+    def __init__(self, *args, **kwargs):
+        self.started = Event()
+        super().__init__(*args, **kwargs)
+
+    def play(self):
+        self.started.clear()
+        super().play()
+
+    def on_user_start_or_resume_int(self):
+        super().on_user_start_or_resume_int()
+        self.started.set()
+
+
+def cold(song, player_cmd):
+    """Time to first "@P 2" when building the player on demand"""
+    start = time.perf_counter()
+    player = TimedPlayer(player_cmd)
+    player.play_song(song)
+    player.started.wait(10)
+    elapsed = time.perf_counter() - start
+    player.quit()
+    return elapsed
+
+
+def pooled(pool, song):
+    """Time to first "@P 2" when acquiring the player from the pool"""
+    start = time.perf_counter()
+    player = pool.acquire()
+    player.play_song(song)
+    player.started.wait(10)
+    elapsed = time.perf_counter() - start
+    pool.release(player)
+    return elapsed
+
+
+def report(name, samples):
+    """Prints the latency statistics in milliseconds"""
+    samples = sorted(s * 1000 for s in samples)
+    print(
+        "{:>7}: median {:8.2f} ms  min {:8.2f} ms  max {:8.2f} ms".format(
+            name, statistics.median(samples), samples[0], samples[-1]
+        )
+    )
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("song", nargs="?", default="sample.mp3")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--player", default=None, help="mpg123 binary")
+    args = parser.parse_args()
+
+    report("cold", [cold(args.song, args.player) for _ in range(args.runs)])
+    with PlayerPool(2, player_class=TimedPlayer, player=args.player) as pool:
+        time.sleep(0.5)
+        report("pooled", [pooled(pool, args.song) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
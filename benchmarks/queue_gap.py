@@ -0,0 +1,67 @@
+"""
+MPyg321 play queue gap benchmark
+Plays a queue of short songs on the fake mpg123 (benchmarks/fake_mpg123.py)
+and reports the gap between the end of each song and the start of the
+next one (TRACK_END gap_ms). It then checks that a song enqueued once the
+queue has ended is played by play_queue(), and exits with status 1 if not.
+
+Usage: python benchmarks/queue_gap.py [--songs N] [--frames N]
+"""
+import argparse
+import os
+import statistics
+import sys
+from threading import Event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.consts import MPyg321Events  # noqa: E402
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+
+FAKE_PLAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mpg123.py")
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=20)
+    args = parser.parse_args()
+
+    custom_args = "--fake-frames {}".format(args.frames)
+    player = MPyg123Player(FAKE_PLAYER, custom_args=custom_args)
+    gaps = []
+    ended = Event()
+
+    def on_track_end(context):
+        if context.next_song is None:
+            ended.set()
+        else:
+            gaps.append(context.gap_ms)
+
+    player.subscribe_event(MPyg321Events.TRACK_END, on_track_end)
+    for i in range(1, args.songs):
+        player.enqueue("song{}.mp3".format(i))
+    player.play_song("song0.mp3")
+    if not ended.wait(args.songs * args.frames / 38.28 + 10):
+        print("the queue did not end")
+        sys.exit(1)
+    print(
+        "{} gaps: mean {:.2f} ms, max {:.2f} ms".format(
+            len(gaps), statistics.mean(gaps), max(gaps)
+        )
+    )
+
+    # The queue has ended: a song enqueued now is still played
+    ended.clear()
+    player.enqueue("late.mp3")
+    played = player.play_queue() and ended.wait(args.frames / 38.28 + 10)
+    player.quit()
+    if not played or player.song_path != "late.mp3":
+        print("a song enqueued after the end of the queue was not played")
+        sys.exit(1)
+    print("song enqueued after the end of the queue: played")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+MPyg321 soak benchmark
+Simulates a long running player with its frame output enabled
+(performance_mode=False): "@F" messages at 38.28 frames per second are
+fed to a player without reader thread, in chunks cut in the middle of
+the lines as a pipe would. Every simulated hour also contains a line
+longer than the parser limit. For each simulated hour, it prints the
+resident memory of the process and the CPU time spent, which should
+both stay flat.
+With --live SECONDS, the fake mpg123 (benchmarks/fake_mpg123.py) sends
+the frames instead, as fast as it can, through the real reader thread.
+
+Usage: python benchmarks/soak.py [--hours 24] [--live SECONDS]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.consts import MPyg321Events  # noqa: E402
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+
+FAKE_PLAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mpg123.py")
+FPS = 44100 / 1152
+CHUNK_SIZE = 4093  # not a multiple of the line length
+
+
+def rss_kb():
+    """Resident memory of this process in kB (Linux only, None elsewhere)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def hour_of_output():
+    """One hour of frame output (as a song of one hour) split in chunks"""
+    frames = int(3600 * FPS)
+    lines = [
+        "@F {} {} {:.2f} {:.2f}\r\n".format(
+            frame, frames - frame, frame / FPS, (frames - frame) / FPS
+        )
+        for frame in range(frames)
+    ]
+    # A garbled line longer than the parser limit
+    lines.insert(frames // 2, "@I " + "x" * 100000 + "\r\n")
+    data = "".join(lines).encode()
+    return [data[i : i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+
+
+def report(*columns):
+    """Prints a row of the results"""
+    print(" ".join("{:>10}".format(column) for column in columns))
+
+
+def simulated(hours):
+    """Feeds hours of frame output to a player"""
+    player = MPyg123Player(FAKE_PLAYER, performance_mode=False, threaded=False)
+    player.subscribe_event(MPyg321Events.PROGRESS, lambda context: None)
+    chunks = hour_of_output()
+    report("hour", "rss_kb", "cpu_s", "overflows")
+    for hour in range(1, hours + 1):
+        start_cpu = time.process_time()
+        for chunk in chunks:
+            player.feed_output(chunk)
+        cpu = "{:.2f}".format(time.process_time() - start_cpu)
+        report(hour, rss_kb() or "-", cpu, player._parser.overflows)
+    player.player.terminate(force=True)
+
+
+def live(seconds):
+    """Reads the output of the fake player running as fast as possible"""
+    player = MPyg123Player(
+        FAKE_PLAYER,
+        performance_mode=False,
+        custom_args="--fake-fps 100000 --fake-frames 1000000000",
+    )
+    player.subscribe_event(MPyg321Events.PROGRESS, lambda context: None)
+    player.play_song("soak.mp3")
+    report("second", "rss_kb", "cpu_s", "frame")
+    for second in range(1, seconds + 1):
+        start_cpu = time.process_time()
+        time.sleep(1)
+        cpu = "{:.2f}".format(time.process_time() - start_cpu)
+        frame = player.position.frame if player.position else 0
+        report(second, rss_kb() or "-", cpu, frame)
+    player.quit()
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--live", type=int, default=None, metavar="SECONDS")
+    args = parser.parse_args()
+    if args.live:
+        live(args.live)
+    else:
+        simulated(args.hours)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+MPyg321 SoundBank latency benchmark
+Compares the time to start a short clip (command sent -> "@P 2" parsed)
+with play_song (LOAD) and with a SoundBank (PAUSE on a preloaded voice),
+against the fake mpg123 (benchmarks/fake_mpg123.py) simulating the time
+taken by LOAD to open and decode a file with --fake-load-time.
+It also triggers overlapping clips to count the stolen voices.
+
+Usage: python benchmarks/soundbank_latency.py [--runs N] [--load-time SECONDS]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+from mpyg321.SoundBank import SoundBank  # noqa: E402
+
+FAKE_PLAYER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mpg123.py")
+# Clips of 0.1 second
+CLIP_ARGS = "--fake-fps 100 --fake-frames 10 --fake-load-time {}"
+
+
+def summary(samples):
+    """Mean, median and max of samples (seconds) in milliseconds"""
+    samples = sorted(s * 1000 for s in samples)
+    return "mean {:7.2f} ms  p50 {:7.2f} ms  max {:7.2f} ms".format(
+        statistics.mean(samples), samples[len(samples) // 2], samples[-1]
+    )
+
+
+def play_song_latency(runs, load_time):
+    """Start latency of play_song"""
+    player = MPyg123Player(FAKE_PLAYER, custom_args=CLIP_ARGS.format(load_time))
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        player.play_song("click.mp3").result(5)
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.15)
+    player.quit()
+    return samples
+
+
+def soundbank_latency(runs, load_time):
+    """Start latency of SoundBank.trigger, once the voices are preloaded"""
+    with SoundBank(
+        max_voices=2, player=FAKE_PLAYER, custom_args=CLIP_ARGS.format(load_time)
+    ) as bank:
+        for future in bank.register("click", "click.mp3", voices=2):
+            future.result(5)
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            bank.trigger("click").result(5)
+            samples.append(time.perf_counter() - start)
+            # Leave time for the clip to end and its voice to be preloaded again
+            time.sleep(0.15 + load_time)
+        return samples
+
+
+def polyphony(triggers, voices):
+    """Number of voices stolen by triggers clips started at once"""
+    with SoundBank(
+        max_voices=voices, player=FAKE_PLAYER, custom_args=CLIP_ARGS.format(0)
+    ) as bank:
+        for future in bank.register("click", "click.mp3", voices=voices):
+            future.result(5)
+        for _ in range(triggers):
+            bank.trigger("click")
+        return bank.stolen
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--load-time", type=float, default=0.08)
+    args = parser.parse_args()
+
+    print("LOAD taking {:.0f} ms, {} runs".format(args.load_time * 1000, args.runs))
+    print("play_song          ", summary(play_song_latency(args.runs, args.load_time)))
+    print("SoundBank.trigger  ", summary(soundbank_latency(args.runs, args.load_time)))
+    print("8 clips on 4 voices: {} stolen".format(polyphony(8, 4)))
+
+
+if __name__ == "__main__":
+    main()
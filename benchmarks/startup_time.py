@@ -0,0 +1,94 @@
+"""
+MPyg321 import and startup time benchmark
+Measures, in fresh interpreters, the time to import mpyg321 (with
+python -X importtime) and whether pexpect gets imported, then the time
+to spawn a player and get its first command acknowledged, with the
+pexpect (pty) and pipe backends, against the fake mpg123
+(benchmarks/fake_mpg123.py).
+
+Usage: python benchmarks/startup_time.py [--runs N] [--player mpg123]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCHMARKS_DIR, "..")
+FAKE_PLAYER = os.path.join(BENCHMARKS_DIR, "fake_mpg123.py")
+
+# Run in a fresh interpreter: prints the spawn time (ms) and if pexpect is loaded
+SPAWN = """
+import sys, time
+start = time.perf_counter()
+from mpyg321.MPyg123Player import MPyg123Player
+imported = time.perf_counter()
+player = MPyg123Player({player!r}, backend={backend!r})
+player.volume(50).result(5)
+ready = time.perf_counter()
+player.quit()
+print((imported - start) * 1000, (ready - imported) * 1000, "pexpect" in sys.modules)
+"""
+
+
+def import_time(module):
+    """Cumulative import time (ms) of module in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    for line in output.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1000
+    return None
+
+
+def spawn_times(player, backend, runs):
+    """Import and spawn times (ms) of runs fresh interpreters"""
+    imports, spawns, loaded = [], [], False
+    code = SPAWN.format(player=player, backend=backend)
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        imports.append(float(output[0]))
+        spawns.append(float(output[1]))
+        loaded = output[2] == "True"
+    return imports, spawns, loaded
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--player", default=FAKE_PLAYER)
+    args = parser.parse_args()
+
+    for module in ("mpyg321.MPyg123Player", "pexpect"):
+        print("import {:<24} {:7.2f} ms".format(module, import_time(module)))
+    print()
+    header = ("backend", "import (ms)", "spawn (ms)", "pexpect")
+    print("{:<9}{:>14}{:>16}{:>10}".format(*header))
+    for backend in ("pexpect", "pipe"):
+        imports, spawns, loaded = spawn_times(args.player, backend, args.runs)
+        print(
+            "{:<9}{:>14.2f}{:>16.2f}{:>10}".format(
+                backend,
+                statistics.median(imports),
+                statistics.median(spawns),
+                "loaded" if loaded else "-",
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
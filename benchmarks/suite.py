@@ -0,0 +1,237 @@
+"""
+MPyg321 benchmark suite
+Runs the players against the fake mpg123 (benchmarks/fake_mpg123.py) and
+measures:
+- command round trip latency (PAUSE -> "@P 1", PAUSE -> "@P 2")
+- event dispatch latency (output read -> callback), inline and through
+  an EventDispatcher
+- parser throughput on the recorded transcript
+- memory used per player, in this process and in the player process
+The results are printed as JSON. With --baseline, the run is compared to
+a previous result and the script exits with status 1 when a metric is
+worse by more than --tolerance, so it can gate a deployment.
+
+Usage: python benchmarks/suite.py [--output results.json] [--baseline old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from threading import Event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.consts import MPyg321Events, mpg_outs, mpg_outs_ext  # noqa: E402
+from mpyg321.EventDispatcher import EventDispatcher  # noqa: E402
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+from mpyg321.OutputParser import MPygOutputParser  # noqa: E402
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FAKE_PLAYER = os.path.join(BENCHMARKS_DIR, "fake_mpg123.py")
+TRANSCRIPT = os.path.join(BENCHMARKS_DIR, "data", "mpg123_transcript.txt")
+
+# Metrics where a higher value is better, all the others are latencies/sizes
+HIGHER_IS_BETTER = ("parser.messages_per_s",)
+# Tail percentiles are too noisy to gate a deployment on
+NOT_GATED = (".p90", ".p99", ".max")
+
+
+class ProbePlayer(MPyg123Player):
+    """Player recording when each action is parsed"""
+
+    def __init__(self, *args, **kwargs):
+        self.parsed = {}
+        self.read_time = None
+        self.read_times = {}  # context -> time its output was read
+        super().__init__(*args, **kwargs)
+
+    def feed_output(self, data):
+        self.read_time = time.perf_counter()
+        super().feed_output(data)
+
+    def _trigger_event(self, event_name, context=None):
+        if context is not None:
+            self.read_times[context] = self.read_time
+        super()._trigger_event(event_name, context)
+
+    def process_action(self, action, args):
+        event = self.parsed.get(action)
+        if event is not None:
+            event.set()
+        super().process_action(action, args)
+
+    def wait_for(self, action, send, timeout=5):
+        """Runs send() and returns the seconds until action is parsed"""
+        event = self.parsed[action] = Event()
+        start = time.perf_counter()
+        send()
+        if not event.wait(timeout):
+            raise TimeoutError("No {} received".format(action))
+        return time.perf_counter() - start
+
+
+def summary(samples, scale=1000.0):
+    """Percentiles of samples (seconds), in milliseconds by default"""
+    samples = sorted(s * scale for s in samples)
+
+    def percentile(p):
+        return samples[min(int(p * len(samples)), len(samples) - 1)]
+
+    return {
+        "mean": statistics.mean(samples),
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": samples[-1],
+    }
+
+
+def roundtrip(runs):
+    """PAUSE -> "@P 1" and PAUSE -> "@P 2" latencies"""
+    player = ProbePlayer(FAKE_PLAYER)
+    player.wait_for("user_start_or_resume", lambda: player.play_song("a.mp3"))
+    pauses, resumes = [], []
+    for _ in range(runs):
+        pauses.append(player.wait_for("user_pause", player.pause))
+        resumes.append(player.wait_for("user_start_or_resume", player.resume))
+    player.quit()
+    return {"pause_ms": summary(pauses), "resume_ms": summary(resumes)}
+
+
+def dispatch(frames, dispatcher=None):
+    """Latency between reading a "@F" message and its PROGRESS callback"""
+    player = ProbePlayer(
+        FAKE_PLAYER,
+        performance_mode=False,
+        custom_args="--fake-fps 500 --fake-frames {}".format(frames),
+    )
+    player.set_event_dispatcher(dispatcher)
+    samples = []
+    done = Event()
+
+    @player.on(MPyg321Events.PROGRESS)
+    def on_progress(context):
+        read_time = player.read_times.pop(context)
+        samples.append(time.perf_counter() - read_time)
+        if context.frames_left <= 1:
+            done.set()
+
+    player.play_song("a.mp3")
+    done.wait(frames / 100.0)
+    player.quit()
+    if dispatcher is not None:
+        dispatcher.shutdown()
+    return summary(samples)
+
+
+def parser_throughput(repeat):
+    """Messages per second of MPygOutputParser on the recorded transcript"""
+    with open(TRANSCRIPT, "rb") as f:
+        data = f.read() * repeat
+    parser = MPygOutputParser(mpg_outs + mpg_outs_ext["mpg123"])
+    chunks = [data[i : i + 4096] for i in range(0, len(data), 4096)]
+    start = time.perf_counter()
+    for chunk in chunks:
+        for _ in parser.parse(chunk):
+            pass
+    return {"messages_per_s": data.count(b"\n") / (time.perf_counter() - start)}
+
+
+def rss_kb(pid):
+    """Resident memory of a process in kB (Linux only, None elsewhere)"""
+    try:
+        with open("/proc/{}/status".format(pid)) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def memory(count):
+    """Python memory per player and resident memory of a player process"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    players = [MPyg123Player(FAKE_PLAYER) for _ in range(count)]
+    python_bytes = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+    time.sleep(0.5)
+    process_kb = [rss_kb(p.player.pid) for p in players]
+    for player in players:
+        player.quit()
+    result = {"python_bytes_per_player": python_bytes}
+    if None not in process_kb:
+        result["process_rss_kb_per_player"] = statistics.mean(process_kb)
+    return result
+
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + "."))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+    return flat
+
+
+def regressions(results, baseline, tolerance):
+    """Metrics worse than the baseline by more than tolerance (ratio)"""
+    current, previous = flatten(results), flatten(baseline)
+    worse = []
+    for name, value in sorted(current.items()):
+        old = previous.get(name)
+        if name.startswith("meta.") or name.endswith(NOT_GATED) or not old:
+            continue
+        ratio = value / old
+        if name in HIGHER_IS_BETTER:
+            ratio = 1 / ratio if ratio else float("inf")
+        if ratio > 1 + tolerance:
+            worse.append({"metric": name, "baseline": old, "current": value})
+    return worse
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "time": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "roundtrip": roundtrip(args.runs),
+        "dispatch": {
+            "inline_ms": dispatch(args.runs * 10),
+            "dispatcher_ms": dispatch(args.runs * 10, EventDispatcher()),
+        },
+        "parser": parser_throughput(args.runs),
+        "memory": memory(max(args.runs // 5, 1)),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            worse = regressions(results, json.load(f), args.tolerance)
+        for regression in worse:
+            print("Regression: {}".format(json.dumps(regression)), file=sys.stderr)
+        sys.exit(1 if worse else 0)
+
+
+if __name__ == "__main__":
+    main()
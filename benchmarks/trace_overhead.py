@@ -0,0 +1,92 @@
+"""
+MPyg321 tracing overhead benchmark
+Feeds the recorded mpg123 transcript, one message at a time, to a player
+without reader thread (threaded=False) with a PROGRESS subscriber, with
+tracing disabled and enabled, and reports the time per message, the
+spans recorded and the cost of each span once the ring buffer is full.
+The cost of Tracer.record alone is measured too. With --output the last
+65536 spans are written as Chrome Trace Event JSON, to open in
+https://ui.perfetto.dev
+
+Usage: python benchmarks/trace_overhead.py [--messages N] [--output FILE]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mpyg321.consts import MPyg321Events  # noqa: E402
+from mpyg321.MPyg123Player import MPyg123Player  # noqa: E402
+from mpyg321.Tracer import Tracer  # noqa: E402
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FAKE_PLAYER = os.path.join(BENCHMARKS_DIR, "fake_mpg123.py")
+TRANSCRIPT = os.path.join(BENCHMARKS_DIR, "data", "mpg123_transcript.txt")
+
+
+def load_messages(count):
+    """count messages of the transcript, repeated as needed"""
+    with open(TRANSCRIPT, "rb") as f:
+        lines = [line for line in f.read().splitlines(True) if line[:2] != b"@E"]
+    return [lines[i % len(lines)] for i in range(count)]
+
+
+def feed(player, messages):
+    """Nanoseconds per message"""
+    start = time.perf_counter_ns()
+    for message in messages:
+        player.feed_output(message)
+    return (time.perf_counter_ns() - start) / len(messages)
+
+
+def record_cost(count):
+    """Nanoseconds per Tracer.record call, once the ring buffer is full"""
+    tracer = Tracer()
+    record = tracer.record
+    for _ in range(tracer.capacity):
+        record("message", "progress", 1, 0, 0)
+    start = time.perf_counter_ns()
+    for _ in range(count):
+        record("message", "progress", 1, 0, 0)
+    return (time.perf_counter_ns() - start) / count
+
+
+def main():
+    """Do the magic"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    messages = load_messages(args.messages)
+    player = MPyg123Player(FAKE_PLAYER, performance_mode=False, threaded=False)
+    player.subscribe_event(MPyg321Events.PROGRESS, lambda context: None)
+    feed(player, messages[:1000])  # warm up
+
+    disabled = min(feed(player, messages) for _ in range(3))
+    tracer = player.enable_tracing(Tracer(), "player")
+    # Filled once: the spans then replace the oldest ones without allocating more
+    while len(tracer.spans()) < tracer.capacity:
+        feed(player, messages[:1000])
+    before = tracer.recorded()
+    enabled = min(feed(player, messages) for _ in range(3))
+    per_message = (tracer.recorded() - before) / 3 / len(messages)
+    print("tracing disabled {:8.0f} ns / message".format(disabled))
+    print(
+        "tracing enabled  {:8.0f} ns / message, {:.2f} spans / message".format(
+            enabled, per_message
+        )
+    )
+    overhead = (enabled - disabled) / per_message
+    print("                 {:8.0f} ns / span".format(overhead))
+    print("Tracer.record    {:8.0f} ns".format(record_cost(args.messages)))
+    if args.output:
+        tracer.dump(args.output)
+        print("trace written to", args.output)
+    player.player.terminate(force=True)
+
+
+if __name__ == "__main__":
+    main()
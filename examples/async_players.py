@@ -0,0 +1,40 @@
+"""
+MPyg321 asyncio example
+Playing the same song in several players driven by one event loop
+You need to add a "sample.mp3" file in the working directory
+
+In this example, you can replace AsyncMPyg123Player by AsyncMPyg321Player
+according to the player you installed on your machine (mpg321/mpg123)
+"""
+import asyncio
+
+from mpyg321.AsyncMPyg123Player import AsyncMPyg123Player
+from mpyg321.consts import MPyg321Events
+
+
+async def play_for_a_while(player):
+    """Plays, pauses and resumes the song"""
+    await player.play_song("sample.mp3")
+    await asyncio.sleep(5)
+    await player.pause()
+    await asyncio.sleep(2)
+    await player.resume()
+    await asyncio.sleep(5)
+    await player.stop()
+
+
+async def main():
+    """Do the magic"""
+    players = [await AsyncMPyg123Player().start() for _ in range(3)]
+    for index, player in enumerate(players):
+
+        @player.on(MPyg321Events.ANY_STOP)
+        async def on_any_stop(context, index=index):
+            print("Player {} has stopped".format(index))
+
+    await asyncio.gather(*(play_for_a_while(p) for p in players))
+    await asyncio.gather(*(p.quit() for p in players))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
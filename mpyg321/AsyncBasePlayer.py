@@ -0,0 +1,452 @@
+"""
+Mpyg AsyncBasePlayer base class
+This class is the asyncio counterpart of BasePlayer.
+The player process is spawned with asyncio.create_subprocess_exec
+and its output is read by a task running on the event loop, so
+many players can be driven from a single loop without any thread.
+Before Python 3.12, asyncio waits for each child process with a thread
+of its ThreadedChildWatcher: call use_pidfd_child_watcher() to install a
+PidfdChildWatcher instead where Linux supports it.
+All the asyncio players implement this base class and add their
+specific feature.
+"""
+
+import asyncio
+import inspect
+import os
+import shlex
+import shutil
+import sys
+import threading
+import time
+from functools import partial
+
+from .consts import *
+from .EventContext import *
+from .MpygError import *
+from .OutputParser import MPygOutputParser
+from .PersistentCache import file_identity, version_cache
+
+
+def use_pidfd_child_watcher():
+    """Makes asyncio wait for child processes with pidfds, without a thread
+    per process, on Python 3.9 to 3.11 and Linux 5.3+. Call it from a
+    coroutine of the main thread before starting the players: it replaces
+    the default ThreadedChildWatcher of the event loop policy, for the
+    whole process, and attaches the watcher to the running loop. A watcher
+    you set is kept, and Python 3.12+ already uses pidfds.
+    Returns True when pidfds are used.
+    """
+    if sys.version_info >= (3, 12):
+        return True
+    if not hasattr(asyncio, "PidfdChildWatcher") or not hasattr(os, "pidfd_open"):
+        return False
+    if threading.current_thread() is not threading.main_thread():
+        # The watcher is shared: only the main thread loop may own it
+        return False
+    policy = asyncio.get_event_loop_policy()
+    watcher = policy.get_child_watcher()
+    if not isinstance(watcher, asyncio.PidfdChildWatcher):
+        if not isinstance(watcher, asyncio.ThreadedChildWatcher):
+            return False
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+        except OSError:
+            # Kernel older than 5.3
+            return False
+        watcher = asyncio.PidfdChildWatcher()
+        policy.set_child_watcher(watcher)
+    if not watcher.is_active():
+        # New, or attached to the closed loop of a previous asyncio.run()
+        watcher.attach_loop(asyncio.get_running_loop())
+    return True
+
+
+class AsyncBasePlayer:
+    """Base class for asyncio players"""
+
+    process = None
+    status = None
+    output_processor = None
+    song_path = ""
+    loop = False
+    performance_mode = True
+    suitable_versions = []  # mpg123 and/or mpg321 - set inside subclass
+    default_player = None  # mpg123 or mpg321 - set inside subclass
+    player_version = None  # defined inside check_player
+    version_cache = version_cache  # "--version" outputs keyed by binary identity
+    mpg_outs = []
+    position = None  # last PlayerPosition parsed from the frame output
+    progress_rate = None  # max PROGRESS events per second, None for all
+    progress_whole_seconds = False  # only emit PROGRESS when the second changes
+    _progress_time = 0.0
+    _progress_second = None
+    read_size = 4096  # max bytes read from the player output at once
+    max_line_length = 4096  # longer output lines are dropped by the parser
+    _dispatch = {}  # action -> internal callback, built by process_output
+    _events = {}
+
+    def __init__(
+        self, player=None, audiodevice=None, performance_mode=True, custom_args=""
+    ):
+        """Stores the player settings, the process is spawned by start()"""
+        self._events = {e: [] for e in MPyg321Events}
+        self._player_cmd = player if player is not None else self.default_player
+        self._audiodevice = audiodevice
+        self._custom_args = custom_args
+        self.performance_mode = performance_mode
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.status != PlayerStatus.QUITTED:
+            await self.quit()
+
+    async def start(self):
+        """Spawns the player and starts the output reader task"""
+        await self.set_player(self._player_cmd, self._audiodevice, self._custom_args)
+        self.output_processor = asyncio.ensure_future(self.process_output())
+        return self
+
+    async def check_player(self, player, refresh=False):
+        """Gets the player
+        The "--version" output is cached per binary (see version_cache),
+        refresh forces a new probe.
+        """
+        binary = shutil.which(str(player))
+        # The invoked path is part of the key as the output may depend on it
+        key = binary + "|" + file_identity(binary) if binary else None
+        output = None
+        if key is not None and not refresh:
+            output = self.version_cache.get(key)
+        if output is None:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    str(player),
+                    "--version",
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+                output, _ = await process.communicate()
+            except OSError:
+                process = None
+            # Like subprocess.check_output, a failing probe is not accepted
+            if process is None or process.returncode != 0:
+                raise MPygPlayerNotFoundError(
+                    """No suitable player found: you might need to install
+                    mpg123"""
+                )
+            output = str(output)
+            if key is not None:
+                self.version_cache.set(key, output)
+        for version in self.suitable_versions:
+            if version in output:
+                self.player_version = version
+        if self.player_version is None:
+            raise MPygPlayerNotFoundError(
+                """No suitable player found: you might be using the wrong \
+player (AsyncMPyg321Player or AsyncMPyg123Player)"""
+            )
+
+    async def set_player(self, player, audiodevice, custom_args):
+        """Sets the player"""
+        await self.check_player(player)
+        args = shlex.split(custom_args)
+        if audiodevice:
+            args += ["--audiodevice", audiodevice]
+        args += ["-R", "mpyg"]
+        self.process = await asyncio.create_subprocess_exec(
+            str(player),
+            *args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self.status = PlayerStatus.INSTANCIATED
+        # Setting extended mpg_outs for version specific behaviors
+        self.mpg_outs = mpg_outs.copy()
+        self.mpg_outs.extend(mpg_outs_ext[self.player_version])
+
+    def on(self, event_name):
+        """Decorator to register event callbacks (functions or coroutines)."""
+
+        def decorator(func):
+            self.subscribe_event(event_name, func)
+            return func
+
+        return decorator
+
+    def subscribe_event(self, event_name, callback):
+        if event_name not in self._events:
+            raise MPygUnknownEventNameError(
+                f"Subscribed callback to a non existing event {event_name}."
+            )
+        self._events[event_name].append(callback)
+
+    async def _trigger_event(self, event_name, context=None):
+        """Trigger all callbacks associated with an event.
+        Callbacks run on the reader task: a failing callback is reported
+        to the event loop exception handler instead of stopping the reader.
+        """
+        callbacks = self._events.get(event_name)
+        if not callbacks:
+            return
+        if context is None:
+            context = MPyg321EventContext(self)
+        for callback in callbacks:
+            try:
+                result = callback(context)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                asyncio.get_event_loop().call_exception_handler(
+                    {
+                        "message": "Error while executing event callback",
+                        "exception": MPygEventListenerError(str(e)),
+                        "task": self.output_processor,
+                    }
+                )
+
+    async def process_output(self):
+        """Parses the output until the player process exits"""
+        parser = MPygOutputParser(self.mpg_outs, self.max_line_length)
+        parse_line = parser.parse_line
+        self._dispatch = self._build_dispatch()
+        while True:
+            data = await self.process.stdout.read(self.read_size)
+            if not data:
+                break
+            for line in parser.feed(data):
+                action, args = parse_line(line)
+                if action is not None:
+                    await self.process_action(action, args)
+
+    def _action_handlers(self):
+        """Internal callbacks of the actions, called with the message arguments
+        Subclasses add their version specific actions.
+        """
+        return {
+            "music_stop": self.on_music_stop_int,
+            "user_pause": self.on_user_pause_int,
+            "user_start_or_resume": self.on_user_start_or_resume_int,
+            "end_of_song": self.on_end_of_song_int,
+            "progress": self.on_progress_int,
+            "error": self.on_error_int,
+        }
+
+    def _build_dispatch(self):
+        """Precompiles the action -> bound internal callback table of mpg_outs
+        Actions without internal callback go to process_output_ext.
+        """
+        handlers = self._action_handlers()
+        dispatch = {}
+        for mpg_out in self.mpg_outs:
+            action = mpg_out["action"]
+            if action is None:
+                continue
+            handler = handlers.get(action)
+            if handler is None:
+                handler = partial(self._process_output_ext_args, action)
+            dispatch[action] = handler
+        return dispatch
+
+    async def process_action(self, action, args):
+        """Runs the internal callback of a parsed output"""
+        handler = self._dispatch.get(action)
+        if handler is None:
+            await self.process_output_ext(action)
+        else:
+            await handler(args)
+
+    async def _process_output_ext_args(self, action, args):
+        await self.process_output_ext(action)
+
+    async def process_output_ext(self, action):
+        """Processes the output for version specific behavior
+        Called with the name of the parsed actions without internal callback
+        (see _action_handlers), such as "silence" or "volume", which used to
+        be passed as None. The actions with an internal callback (the mute
+        replies included) do not come here: add yours to _action_handlers.
+        """
+        pass
+
+    async def _send(self, command):
+        """Writes a command to the player"""
+        self.process.stdin.write((command + "\n").encode("utf-8"))
+        await self.process.stdin.drain()
+
+    async def play_song(self, path, loop=False):
+        """Plays the song"""
+        self.loop = loop
+        self.set_song(path)
+        await self.play()
+
+    async def play(self):
+        """Starts playing the song"""
+        await self._send("LOAD " + self.song_path)
+        self.status = PlayerStatus.PLAYING
+
+    async def pause(self):
+        """Pauses the player"""
+        if self.status == PlayerStatus.PLAYING:
+            await self._send("PAUSE")
+            self.status = PlayerStatus.PAUSED
+
+    async def toggle_pause(self):
+        """Pause if playing, else resume if paused"""
+        if self.status == PlayerStatus.PLAYING:
+            await self.pause()
+        elif self.status == PlayerStatus.PAUSED:
+            await self.resume()
+
+    async def resume(self):
+        """Resume the player"""
+        if self.status == PlayerStatus.PAUSED:
+            await self._send("PAUSE")
+            self.status = PlayerStatus.PLAYING
+            await self._trigger_event(MPyg321Events.USER_RESUME)
+            await self.on_user_resume()
+
+    async def stop(self):
+        """Stops the player"""
+        await self._send("STOP")
+        self.status = PlayerStatus.STOPPING
+
+    async def quit(self):
+        """Quits the player and waits for the process to exit"""
+        await self._send("QUIT")
+        self.status = PlayerStatus.QUITTED
+        await self.process.wait()
+        if self.output_processor is not None:
+            await self.output_processor
+
+    async def jump(self, pos):
+        """Jump to position"""
+        await self._send("JUMP " + str(pos))
+
+    async def on_error(self, output):
+        """Process errors encountered by the player
+        Unlike BasePlayer, errors are only reported through the ERROR event:
+        raising here would stop the output reader task.
+        """
+        action = "unknown_error"
+        for mpg_error in mpg_errors:
+            if mpg_error["message"] in output:
+                action = mpg_error["action"]
+                break
+        context = MPyg321ErrorContext(self, action, output)
+        await self._trigger_event(MPyg321Events.ERROR, context)
+
+    def set_song(self, path):
+        """song_path setter"""
+        self.song_path = path
+
+    def set_loop(self, loop):
+        """loop setter"""
+        self.loop = loop
+
+    def set_progress_throttle(self, max_rate=None, whole_seconds=False):
+        """Limits the PROGRESS events emitted from the frame output
+        Parameters:
+        max_rate (float): max number of events per second, None for no limit
+        whole_seconds (bool): only emit an event when the elapsed second changes
+        The position attribute is updated for every frame whatever the throttle.
+        """
+        self.progress_rate = max_rate
+        self.progress_whole_seconds = whole_seconds
+
+    # # # Internal Callbacks # # #
+    async def on_error_int(self, args):
+        """Internal callback when the player reports an error"""
+        await self.on_error(args.decode("utf-8", "replace"))
+
+    async def on_music_stop_int(self, args=None):
+        """Internal callback when the music is stopped"""
+        if self.status == PlayerStatus.STOPPING:
+            await self.on_user_stop_int()
+            self.status = PlayerStatus.STOPPED
+        else:
+            await self.on_end_of_song_int()
+
+    async def on_user_stop_int(self):
+        """Internal callback when the user stops the music."""
+        await self._trigger_event(MPyg321Events.ANY_STOP)
+        await self.on_any_stop()
+        await self._trigger_event(MPyg321Events.USER_STOP)
+        await self.on_user_stop()
+
+    async def on_user_pause_int(self, args=None):
+        """Internal callback when user pauses the music"""
+        await self._trigger_event(MPyg321Events.ANY_STOP)
+        await self.on_any_stop()
+        await self._trigger_event(MPyg321Events.USER_PAUSE)
+        await self.on_user_pause()
+
+    async def on_user_start_or_resume_int(self, args=None):
+        """Internal callback when user resumes the music"""
+        self.status = PlayerStatus.PLAYING
+
+    async def on_end_of_song_int(self, args=None):
+        """Internal callback when the song ends"""
+        if self.loop:
+            await self.play()
+        else:
+            # The music doesn't stop if it is looped
+            self.status = PlayerStatus.STOPPED
+            await self._trigger_event(MPyg321Events.ANY_STOP)
+            await self.on_any_stop()
+        await self._trigger_event(MPyg321Events.MUSIC_END)
+        await self.on_music_end()
+
+    async def on_progress_int(self, args):
+        """Internal callback when a frame has been decoded"""
+        try:
+            frame, frames_left, seconds, seconds_left = args.split()
+            position = PlayerPosition(
+                int(frame), int(frames_left), float(seconds), float(seconds_left)
+            )
+        except ValueError:
+            # Malformed frame message
+            return
+        self.position = position
+        if self.progress_whole_seconds:
+            second = int(position.seconds)
+            if second == self._progress_second:
+                return
+            self._progress_second = second
+        if self.progress_rate:
+            now = time.monotonic()
+            if now - self._progress_time < 1.0 / self.progress_rate:
+                return
+            self._progress_time = now
+        if self._events[MPyg321Events.PROGRESS]:
+            await self._trigger_event(
+                MPyg321Events.PROGRESS, MPyg321ProgressContext(self, position)
+            )
+        await self.on_progress()
+
+    # # # Public Callbacks # # #
+    async def on_any_stop(self):
+        """Callback when the music stops for any reason"""
+        pass
+
+    async def on_user_pause(self):
+        """Callback when user pauses the music"""
+        pass
+
+    async def on_user_resume(self):
+        """Callback when user resumes the music"""
+        pass
+
+    async def on_user_stop(self):
+        """Callback when user stops music"""
+        pass
+
+    async def on_music_end(self):
+        """Callback when music ends"""
+        pass
+
+    async def on_progress(self):
+        """Callback when the playing position changes (see set_progress_throttle)"""
+        pass
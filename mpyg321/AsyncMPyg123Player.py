@@ -0,0 +1,87 @@
+from .AsyncBasePlayer import AsyncBasePlayer
+from .consts import MPyg321Events, PlayerStatus
+
+
+class AsyncMPyg123Player(AsyncBasePlayer):
+    """Asyncio player for mpg123"""
+
+    def __init__(
+        self,
+        player=None,
+        audiodevice=None,
+        performance_mode=True,
+        custom_args="",
+        rva_mix=False,
+    ):
+        self.suitable_versions = ["mpg123"]
+        self.default_player = "mpg123"
+        custom_args += " --rva-mix " if rva_mix else ""
+        super().__init__(player, audiodevice, performance_mode, custom_args)
+        self._is_muted = False
+
+    async def start(self):
+        """Spawns the player and silences it in performance mode"""
+        await super().start()
+        if self.performance_mode:
+            await self.silence_mpyg_output()
+        return self
+
+    def _action_handlers(self):
+        """Adds the mpg123 specific actions to the dispatch table"""
+        handlers = super()._action_handlers()
+        handlers["user_mute"] = self.on_user_mute_int
+        handlers["user_unmute"] = self.on_user_unmute_int
+        return handlers
+
+    async def on_user_mute_int(self, args=None):
+        """Internal callback when the player is muted"""
+        self._is_muted = True
+        await self.on_user_mute()
+        await self._trigger_event(MPyg321Events.USER_MUTE)
+
+    async def on_user_unmute_int(self, args=None):
+        """Internal callback when the player is unmuted"""
+        self._is_muted = False
+        await self._trigger_event(MPyg321Events.USER_UNMUTE)
+        await self.on_user_unmute()
+
+    async def load_list(self, entry, filepath):
+        """Load an entry in a list
+        Parameters:
+        entry (int): index of the song in the list - first is 0
+        filepath: URL/Path to the list
+        """
+        await self._send("LOADLIST {} {}".format(entry, filepath))
+        self.status = PlayerStatus.PLAYING
+
+    async def silence_mpyg_output(self):
+        """Improves performance by silencing the mpg123 process frame output"""
+        await self._send("SILENCE")
+
+    async def mute(self):
+        """Mutes the player"""
+        await self._send("MUTE")
+
+    async def unmute(self):
+        """Unmutes the player"""
+        await self._send("UNMUTE")
+
+    async def toggle_mute(self):
+        """Mute or UnMute if playing"""
+        if self._is_muted:
+            await self.unmute()
+        else:
+            await self.mute()
+
+    async def volume(self, percent):
+        """Adjust player's volume"""
+        await self._send("VOLUME {}".format(percent))
+
+    # # # Public Callbacks # # #
+    async def on_user_mute(self):
+        """Callback when user mutes player"""
+        pass
+
+    async def on_user_unmute(self):
+        """Callback when user unmutes player"""
+        pass
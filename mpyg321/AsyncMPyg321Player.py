@@ -0,0 +1,16 @@
+from .AsyncBasePlayer import AsyncBasePlayer
+
+
+class AsyncMPyg321Player(AsyncBasePlayer):
+    """Asyncio player for legacy mpg321"""
+
+    def __init__(
+        self, player=None, audiodevice=None, performance_mode=True, custom_args=""
+    ):
+        self.suitable_versions = ["mpg321"]
+        self.default_player = "mpg321"
+        super().__init__(player, audiodevice, performance_mode, custom_args)
+
+    async def volume(self, percent):
+        """Adjust player's volume"""
+        await self._send("GAIN {}".format(percent))
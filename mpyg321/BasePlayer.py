@@ -6,21 +6,37 @@ All the players implement this base class and add their
 specific feature.
 """
 
+import inspect
+import shlex
+import shutil
 import subprocess
-from threading import Thread
-
-import pexpect
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import partial
+from threading import Lock, RLock, Thread
 
+from . import PipeProcess
 from .consts import *
 from .EventContext import *
+from .Metrics import Histogram, PlayerMetrics
+from .Metrics import registry as default_registry
 from .MpygError import *
+from .OutputParser import MPygOutputParser
+from .PersistentCache import file_identity, version_cache
+from .PlayQueue import PlayQueue
+from .StreamFeeder import StreamFeeder
+from .Tracer import Tracer
+from .TrackInfo import TrackInfo
 
 
 class BasePlayer:
     """Base class for players"""
 
     player = None
-    status = None
+    status = None  # last status acknowledged by the player
+    requested_status = None  # status once the pending commands are acknowledged
     output_processor = None
     song_path = ""
     loop = False
@@ -28,27 +44,95 @@ class BasePlayer:
     suitable_versions = []  # mpg123 and/or mpg321 - set inside subclass
     default_player = None  # mpg123 or mpg321 - set inside subclass
     player_version = None  # defined inside check_player
+    version_cache = version_cache  # "--version" outputs keyed by binary identity
     mpg_outs = []
+    position = None  # last PlayerPosition parsed from the frame output
+    track_info = None  # TrackInfo of the loaded song
+    _volume = None  # last volume set, see snapshot()
+    _frame = None  # last frame reported by the frame output or a jump
+    _frame_time = None  # monotonic time of _frame while it advances unreported
+    default_frame_rate = 44100 / 1152  # frames per second before the "@S" message
+    _feeder = None  # StreamFeeder of the song started by play_stream
+    progress_rate = None  # max PROGRESS events per second, None for all
+    progress_whole_seconds = False  # only emit PROGRESS when the second changes
+    _progress_time = 0.0
+    _progress_second = None
+    dispatcher = None  # EventDispatcher running the callbacks, None for inline
+    queue = None  # PlayQueue of the songs played after the current one
+    _track_end = None  # (song, end time) until the next song starts
+    read_size = 4096  # max bytes read from the player output at once
+    max_line_length = 4096  # longer output lines are dropped by the parser
+    command_timeout = None  # seconds before failing an unacknowledged command
+    timeout_check = 1.0  # max seconds between two checks of the command timeouts
+    command_latency = {}  # command name -> Histogram of round trips (ms)
+    watchdog = False  # respawn the player process when it dies, see set_watchdog
+    max_restarts = 3  # max respawns within restart_window seconds
+    restart_window = 60.0
+    recovery_time = None  # Histogram of the crash to resume times (ms)
+    metrics = None  # PlayerMetrics when enabled, see enable_metrics
+    tracer = None  # Tracer recording the player spans, see enable_tracing
+    _trace_track = 0  # track of the player in the tracer
+    loudness = None  # LoudnessAnalyzer whose gains are applied at each load
+    max_volume = 100  # upper bound of the volume once a gain is applied
+    _gain = 0.0  # loudness gain (dB) applied to the loaded song
+    _batch = None  # (command lines, futures) buffered by batch()
+    backend = "pexpect"  # process transport: "pexpect" (pty) or "pipe"
+    _timeout_error = PipeProcess.TIMEOUT  # raised by reads without output
+    _eof_error = PipeProcess.EOF  # raised by reads once the output is closed
     _events = {}
 
     def __init__(
-        self, player=None, audiodevice=None, performance_mode=True, custom_args=""
+        self,
+        player=None,
+        audiodevice=None,
+        performance_mode=True,
+        custom_args="",
+        threaded=True,
+        backend="pexpect",
     ):
-        """Builds the player and creates the callbacks"""
+        """Builds the player and creates the callbacks
+        When threaded is False, no output reader thread is started and the
+        output must be passed to feed_output (see PlayerManager).
+        backend is "pexpect" (the player runs in a pseudo terminal) or
+        "pipe" (plain pipes, without importing pexpect, see PipeProcess).
+        """
+        if backend not in ("pexpect", "pipe"):
+            raise MPygError("Unknown backend {}".format(backend))
+        self.backend = backend
         self._events = {e: [] for e in MPyg321Events}
+        self.queue = PlayQueue()
+        self.command_latency = {}
+        self._pending_commands = {}  # reply action -> deque of pending commands
+        self._commands_lock = Lock()
+        self._send_lock = RLock()  # held by the thread batching commands
+        self.recovery_time = Histogram()
+        self._restarts = deque()  # times of the last respawns
         self.set_player(player, audiodevice, custom_args)
-        self.output_processor = Thread(target=self.process_output)
-        self.output_processor.daemon = True
         self.performance_mode = performance_mode
-        self.output_processor.start()
+        if threaded:
+            self.output_processor = Thread(target=self.process_output)
+            self.output_processor.daemon = True
+            self.output_processor.start()
 
-    def check_player(self, player):
-        """Gets the player"""
+    def check_player(self, player, refresh=False):
+        """Gets the player
+        The "--version" output is cached per binary (see version_cache),
+        refresh forces a new probe.
+        """
         try:
             cmd = str(player)
-            output = subprocess.check_output([cmd, "--version"])
+            binary = shutil.which(cmd)
+            # The invoked path is part of the key as the output may depend on it
+            key = binary + "|" + file_identity(binary) if binary else None
+            output = None
+            if key is not None and not refresh:
+                output = self.version_cache.get(key)
+            if output is None:
+                output = str(subprocess.check_output([cmd, "--version"]))
+                if key is not None:
+                    self.version_cache.set(key, output)
             for version in self.suitable_versions:
-                if version in str(output):
+                if version in output:
                     self.player_version = version
             if self.player_version is None:
                 raise MPygPlayerNotFoundError(
@@ -65,16 +149,42 @@ player (Mpyg321Player or Mpyg123Player)"""
         """Sets the player"""
         if player is None:
             player = self.default_player
+        self._player_args = (player, audiodevice, custom_args)
         self.check_player(player)
-        args = " " + custom_args if custom_args != "" else ""
-        args += " --audiodevice " + audiodevice if audiodevice else ""
-        args += " -R mpyg"
-        self.player = pexpect.spawn(str(player) + " " + args)
-        self.player.delaybeforesend = None
-        self.status = PlayerStatus.INSTANCIATED
+        args = shlex.split(custom_args)
+        if audiodevice:
+            args += ["--audiodevice", audiodevice]
+        args += ["-R", "mpyg"]
+        self.player = self._spawn(str(player), args)
+        self.status = self.requested_status = PlayerStatus.INSTANCIATED
         # Setting extended mpg_outs for version specific behaviors
         self.mpg_outs = mpg_outs.copy()
         self.mpg_outs.extend(mpg_outs_ext[self.player_version])
+        self._parser = MPygOutputParser(self.mpg_outs, self.max_line_length)
+        self._dispatch = self._build_dispatch()
+
+    def _spawn(self, command, args):
+        """Starts the player process with the backend
+        pexpect is only imported by the players using it.
+        """
+        if self.backend == "pipe":
+            try:
+                return PipeProcess.PipeProcess([command] + args)
+            except OSError as e:
+                raise MPygPlayerNotFoundError(
+                    "Could not start {}: {}".format(command, e)
+                )
+        import pexpect
+
+        self._timeout_error = pexpect.TIMEOUT
+        self._eof_error = pexpect.EOF
+        try:
+            # Without echo, the commands sent are not mixed with the player output
+            process = pexpect.spawn(command, args, echo=False)
+        except pexpect.ExceptionPexpect as e:
+            raise MPygPlayerNotFoundError("Could not start {}: {}".format(command, e))
+        process.delaybeforesend = None
+        return process
 
     def on(self, event_name):
         """Decorator to register event callbacks."""
@@ -96,115 +206,623 @@ player (Mpyg321Player or Mpyg123Player)"""
             )
         self._events[event_name].append(callback)
 
+    def set_event_dispatcher(self, dispatcher):
+        """Runs the event callbacks through an EventDispatcher
+        By default (dispatcher=None) they run on the output reader thread.
+        """
+        self.dispatcher = dispatcher
+
     def _trigger_event(self, event_name, context=None):
         """Trigger all callbacks associated with an event."""
+        callbacks = self._events.get(event_name)
+        if not callbacks:
+            return
         if context is None:
             context = MPyg321EventContext(self)
-        if event_name in self._events:
-            for callback in self._events[event_name]:
+        metrics = self.metrics
+        tracer = self.tracer
+        if metrics is None and tracer is None:
+            if self.dispatcher is not None:
+                key = (id(self), event_name)
+                self.dispatcher.submit(key, list(callbacks), context)
+                return
+            for callback in callbacks:
                 try:
                     callback(context)
                 except Exception:
                     raise MPygEventListenerError(
                         "Error while executiong event callback"
                     )
+            return
+        event_start = time.perf_counter_ns()
+        if self.dispatcher is not None:
+            # The callback spans are recorded by the dispatcher workers
+            self.dispatcher.submit((id(self), event_name), list(callbacks), context)
+            callbacks = ()
+        for callback in callbacks:
+            start = time.perf_counter_ns()
+            try:
+                callback(context)
+            except Exception:
+                raise MPygEventListenerError("Error while executiong event callback")
+            end = time.perf_counter_ns()
+            if metrics is not None:
+                metrics.callback(event_name, (end - start) / 1e6)
+            if tracer is not None:
+                tracer.record("callback", callback, self._trace_track, start, end)
+        if tracer is not None:
+            end = time.perf_counter_ns()
+            tracer.record("event", event_name, self._trace_track, event_start, end)
 
     def process_output(self):
         """Parses the output"""
-        mpg_codes = [v["mpg_code"] for v in self.mpg_outs]
         while True:
-            index = self.player.expect(mpg_codes)
-            action = self.mpg_outs[index]["action"]
-            if action == "music_stop":
-                self.on_music_stop_int()
-            elif action == "user_pause":
-                self.on_user_pause_int()
-            elif action == "user_start_or_resume":
-                self.on_user_start_or_resume_int()
-            elif action == "end_of_song":
-                self.on_end_of_song_int()
-            elif action == "error":
-                self.on_error()
-            else:
-                self.process_output_ext(action)
+            # Wake up regularly to fail the commands not acknowledged in time,
+            # also those sent, or a timeout set, while the reader is waiting
+            timeout = self.timeout_check
+            if self.command_timeout is not None:
+                timeout = min(timeout, self.command_timeout)
+            player = self.player
+            try:
+                data = player.read_nonblocking(self.read_size, timeout=timeout)
+            except self._timeout_error:
+                self._expire_commands()
+                continue
+            except self._eof_error:
+                if player is not self.player or self.on_player_exit_int():
+                    # Respawned, the new process is read from now on
+                    continue
+                return
+            self.feed_output(data)
+
+    def feed_output(self, data):
+        """Processes a chunk of the player output"""
+        metrics = self.metrics
+        tracer = self.tracer
+        if metrics is None and tracer is None:
+            self._feed_output(data, None, None)
+            return
+        start = time.perf_counter_ns()
+        try:
+            self._feed_output(data, metrics, tracer)
+        finally:
+            end = time.perf_counter_ns()
+            if metrics is not None:
+                metrics.reader_lag.observe((end - start) / 1e6)
+            if tracer is not None:
+                tracer.record("read", "read", self._trace_track, start, end)
+
+    def _feed_output(self, data, metrics, tracer):
+        pending = self._pending_commands
+        if pending and self.command_timeout is not None:
+            self._expire_commands()
+        process_action = self.process_action
+        parse_line = self._parser.parse_line
+        for line in self._parser.feed(data):
+            if tracer is not None:
+                start = time.perf_counter_ns()
+            action, args = parse_line(line)
+            if metrics is not None:
+                metrics.message(action)
+            if action is not None:
+                if action in pending:
+                    self._resolve_command(action, args)
+                process_action(action, args)
+            if tracer is not None:
+                tracer.record(
+                    "message",
+                    action or "unknown",
+                    self._trace_track,
+                    start,
+                    time.perf_counter_ns(),
+                )
+
+    def _action_handlers(self):
+        """Internal callbacks of the actions, called with the message arguments
+        Subclasses add their version specific actions.
+        """
+        return {
+            "music_stop": self.on_music_stop_int,
+            "user_pause": self.on_user_pause_int,
+            "user_start_or_resume": self.on_user_start_or_resume_int,
+            "end_of_song": self.on_end_of_song_int,
+            "progress": self.on_progress_int,
+            "info": self.on_info_int,
+            "stream_info": self.on_stream_info_int,
+            "jump": self.on_jump_int,
+            "error": self.on_error_int,
+        }
+
+    def _build_dispatch(self):
+        """Precompiles the action -> bound internal callback table of mpg_outs
+        Actions without internal callback go to process_output_ext.
+        Internal callbacks overridden without the args parameter (as they
+        were before it was added) are called without arguments.
+        """
+        handlers = self._action_handlers()
+        dispatch = {}
+        for mpg_out in self.mpg_outs:
+            action = mpg_out["action"]
+            if action is None:
+                continue
+            handler = handlers.get(action)
+            if handler is None:
+                handler = partial(self._process_output_ext_args, action)
+            elif not _takes_argument(handler):
+                handler = partial(_call_without_args, handler)
+            dispatch[action] = handler
+        return dispatch
+
+    def process_action(self, action, args):
+        """Runs the internal callback of a parsed output"""
+        handler = self._dispatch.get(action)
+        if handler is None:
+            self.process_output_ext(action)
+        else:
+            handler(args)
+
+    def _process_output_ext_args(self, action, args):
+        self.process_output_ext(action)
 
     def process_output_ext(self, action):
-        """Processes the output for version specific behavior"""
+        """Processes the output for version specific behavior
+        Called with the name of the parsed actions without internal callback
+        (see _action_handlers), such as "silence" or "volume", which used to
+        be passed as None. The actions with an internal callback (the mute
+        replies included) do not come here: add yours to _action_handlers.
+        """
         pass
 
+    def _send_command(self, command, reply=None):
+        """Sends a command to the player
+        Returns a Future resolved with the arguments of the reply action
+        once it is parsed, right away for commands without reply.
+        It fails with the player error, with MPygCommandTimeoutError
+        after command_timeout seconds, or with MPygPlayerCrashedError when
+        the player process has crashed and was not respawned.
+        Inside batch(), the command is only written when the batch ends.
+        """
+        tracer = self.tracer
+        start = time.perf_counter_ns() if tracer is not None else 0
+        future = Future()
+        if self.player.closed:
+            future.set_exception(
+                MPygPlayerCrashedError("The player process has exited")
+            )
+            return future
+        name = command.split(" ", 1)[0]
+        if self.metrics is not None:
+            self.metrics.command(name)
+        with self._send_lock:
+            if reply is None:
+                future.set_result(None)
+            else:
+                with self._commands_lock:
+                    pending = self._pending_commands.setdefault(reply, deque())
+                    pending.append((future, name, time.perf_counter()))
+            if self._batch is None:
+                self.player.sendline(command)
+            else:
+                self._batch[0].append(command)
+                self._batch[1].append(future)
+        if tracer is not None:
+            # Includes the wait for the batch of another thread
+            tracer.record(
+                "command", command, self._trace_track, start, time.perf_counter_ns()
+            )
+        return future
+
+    @contextmanager
+    def batch(self):
+        """Sends the commands of the with block in a single write
+        Yields the list of the futures of the commands, in order:
+
+            with player.batch() as futures:
+                player.play_song(path)
+                player.jump(500)
+                player.volume(40)
+            results = [f.result() for f in futures]
+
+        The commands of other threads wait for the end of the batch, so
+        do not wait for a future inside the block. Nested batches are
+        sent with the outermost one.
+        """
+        with self._send_lock:
+            if self._batch is not None:
+                yield self._batch[1]
+                return
+            self._batch = ([], [])
+            try:
+                yield self._batch[1]
+            finally:
+                lines, _ = self._batch
+                self._batch = None
+                if lines:
+                    self._write_lines(lines)
+
+    def _write_lines(self, lines):
+        """Writes command lines at once, looping on partial writes"""
+        tracer = self.tracer
+        start = time.perf_counter_ns() if tracer is not None else 0
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        while data:
+            data = data[self.player.send(data) :]
+        if tracer is not None:
+            end = time.perf_counter_ns()
+            tracer.record("write", "batch", self._trace_track, start, end)
+
+    def _resolve_command(self, action, args):
+        """Resolves the oldest command waiting for action"""
+        with self._commands_lock:
+            pending = self._pending_commands.get(action)
+            if not pending:
+                return
+            future, name, start = pending.popleft()
+            if not pending:
+                del self._pending_commands[action]
+        latency = self.command_latency.get(name)
+        if latency is None:
+            latency = self.command_latency[name] = Histogram()
+        latency.observe((time.perf_counter() - start) * 1000)
+        future.set_result(args.decode("utf-8", "replace"))
+
+    def _fail_command(self, error):
+        """Fails the oldest command waiting for an acknowledgement"""
+        with self._commands_lock:
+            if not self._pending_commands:
+                return
+            action = min(
+                self._pending_commands,
+                key=lambda a: self._pending_commands[a][0][2],
+            )
+            pending = self._pending_commands[action]
+            future, _, _ = pending.popleft()
+            if not pending:
+                del self._pending_commands[action]
+        future.set_exception(error)
+
+    def _fail_all_commands(self, error):
+        """Fails all the commands waiting for an acknowledgement"""
+        with self._commands_lock:
+            pending, self._pending_commands = self._pending_commands, {}
+        for commands in pending.values():
+            for future, _, _ in commands:
+                future.set_exception(error)
+
+    def _expire_commands(self):
+        """Fails the commands waiting for more than command_timeout"""
+        if self.command_timeout is None:
+            return
+        expired = []
+        deadline = time.perf_counter() - self.command_timeout
+        with self._commands_lock:
+            for action in list(self._pending_commands):
+                pending = self._pending_commands[action]
+                while pending and pending[0][2] < deadline:
+                    expired.append(pending.popleft())
+                if not pending:
+                    del self._pending_commands[action]
+        for future, name, _ in expired:
+            future.set_exception(
+                MPygCommandTimeoutError(
+                    "{} not acknowledged after {}s".format(name, self.command_timeout)
+                )
+            )
+
+    def set_command_timeout(self, timeout):
+        """Fails the command futures not acknowledged after timeout seconds"""
+        self.command_timeout = timeout
+
+    def enable_metrics(self, registry=None, name=None):
+        """Records the player metrics in registry (Metrics.registry by default)
+        The metrics are labeled with name, the id of the player by default.
+        Dump them with registry.dump() (Prometheus text format).
+        """
+        self.disable_metrics()
+        if registry is None:
+            registry = default_registry
+        self.metrics = PlayerMetrics(self, registry, name or str(id(self)))
+
+    def disable_metrics(self):
+        """Stops recording the player metrics and removes them from the registry"""
+        metrics, self.metrics = self.metrics, None
+        if metrics is not None:
+            metrics.remove()
+
+    def enable_tracing(self, tracer=None, name=None):
+        """Records the spans of the player (commands, output messages, events
+        and callbacks) in tracer, a new Tracer by default, and returns it.
+        Share a tracer between players to see them on the same timeline,
+        each on a track named name (the id of the player by default).
+        Export the trace with tracer.dump(path).
+        """
+        if tracer is None:
+            tracer = Tracer()
+        self._trace_track = tracer.track(name or str(id(self)))
+        self.tracer = tracer
+        return tracer
+
+    def disable_tracing(self):
+        """Stops recording spans, the ones recorded stay in the tracer"""
+        self.tracer = None
+
+    def set_watchdog(self, enabled=True, max_restarts=3, restart_window=60.0):
+        """Respawns the player process when it exits unexpectedly
+        The new process gets the same arguments, settings (see
+        _reapply_settings) and song, resumed at its last known frame.
+        At most max_restarts respawns happen within restart_window seconds,
+        after that the player stays in the CRASHED status.
+        """
+        self.watchdog = enabled
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+
+    def respawn(self, state=None, since=None):
+        """Spawns a new player process with the arguments of the previous one
+        and restores state (the current snapshot() by default).
+        Returns the future of the restore. The PLAYER_RECOVERED event is
+        emitted once it is resolved, since being the crash time used to
+        compute the recovery time.
+        """
+        if state is None:
+            state = self.snapshot()
+        if since is None:
+            since = time.perf_counter()
+        if self.player.isalive():
+            self.player.terminate(force=True)
+        self.set_player(*self._player_args)
+        self._reapply_settings()
+        future = self.restore(state)
+        future.add_done_callback(partial(self._on_restored, since))
+        return future
+
+    def _reapply_settings(self):
+        """Applies the settings of the previous process to a respawned one
+        Volume, song and queue are restored from the snapshot, subclasses
+        reapply their own settings.
+        """
+        pass
+
+    def _may_restart(self):
+        """Whether a respawn is allowed by max_restarts"""
+        now = time.monotonic()
+        while self._restarts and self._restarts[0] < now - self.restart_window:
+            self._restarts.popleft()
+        if len(self._restarts) >= self.max_restarts:
+            return False
+        self._restarts.append(now)
+        return True
+
+    def _on_restored(self, since, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        recovery_ms = (time.perf_counter() - since) * 1000
+        self.recovery_time.observe(recovery_ms)
+        self._trigger_event(
+            MPyg321Events.PLAYER_RECOVERED, MPyg321RecoveryContext(self, recovery_ms)
+        )
+
     def play_song(self, path, loop=False):
         """Plays the song"""
+        self._track_end = None
         self.loop = loop
         self.set_song(path)
-        self.play()
+        return self.play()
 
     def play(self):
-        """Starts playing the song"""
-        self.player.sendline("LOAD " + self.song_path)
-        self.status = PlayerStatus.PLAYING
+        """Starts playing the song, returns a future resolved by the @P 2 reply"""
+        return self._load("LOAD", PlayerStatus.PLAYING, "user_start_or_resume")
+
+    def _load(self, command, status, reply):
+        """Sends a load command for song_path, the player has status once
+        the reply is parsed. With set_loudness, the volume carrying the gain
+        of the song is sent in the same write.
+        """
+        if self._feeder is not None and self._feeder.path != self.song_path:
+            self._cancel_stream()
+        self.requested_status = status
+        self.position = None
+        self._frame = self._frame_time = None
+        self.track_info = TrackInfo(self.song_path)
+        if self.loudness is None:
+            return self._send_command(command + " " + self.song_path, reply)
+        gain = None
+        if self._feeder is None:
+            gain = self.loudness.gain(self.song_path)
+        with self.batch():
+            self._set_gain(gain or 0.0)
+            return self._send_command(command + " " + self.song_path, reply)
+
+    def play_stream(self, source, chunk_size=65536):
+        """Plays MP3 data from memory, without temporary file
+        source is bytes-like, a file object or an iterable of bytes-like
+        chunks. It is written to a named pipe loaded by the player (see
+        StreamFeeder) and the song emits the same events as a file.
+        Returns a future resolved by the @P 2 reply.
+        """
+        # The writer thread and pipe of a previous stream are released first
+        self._cancel_stream()
+        feeder = StreamFeeder(source, chunk_size)
+        self._feeder = feeder
+        # A pipe cannot be loaded twice
+        future = self.play_song(feeder.path, loop=False)
+        feeder.start()
+        return future
+
+    def _cancel_stream(self):
+        """Stops feeding the stream started by play_stream"""
+        if self._feeder is not None:
+            self._feeder.cancel()
+            self._feeder = None
+
+    def enqueue(self, path):
+        """Adds a song at the end of the queue"""
+        self.queue.enqueue(path)
+
+    def play_queue(self):
+        """Plays the next song of the queue, returns False at the end of the queue"""
+        path = self.queue.next_song()
+        if path is None:
+            return False
+        self.set_song(path)
+        self.play()
+        return True
 
     def pause(self):
-        """Pauses the player"""
-        if self.status == PlayerStatus.PLAYING:
-            self.player.sendline("PAUSE")
-            self.status = PlayerStatus.PAUSED
+        """Pauses the player, returns a future resolved by the @P 1 reply"""
+        if self.requested_status == PlayerStatus.PLAYING:
+            self.requested_status = PlayerStatus.PAUSED
+            return self._send_command("PAUSE", "user_pause")
+        return self._done()
 
     def toggle_pause(self):
         """Pause if playing, else resume if paused"""
-        if self.status == PlayerStatus.PLAYING:
-            self.pause()
-        elif self.status == PlayerStatus.PAUSED:
-            self.resume()            
+        if self.requested_status == PlayerStatus.PLAYING:
+            return self.pause()
+        elif self.requested_status == PlayerStatus.PAUSED:
+            return self.resume()
+        return self._done()
 
     def resume(self):
-        """Resume the player"""
-        if self.status == PlayerStatus.PAUSED:
-            self.player.sendline("PAUSE")
-            self.status = PlayerStatus.PLAYING
+        """Resume the player, returns a future resolved by the @P 2 reply"""
+        if self.requested_status == PlayerStatus.PAUSED:
+            self.requested_status = PlayerStatus.PLAYING
+            future = self._send_command("PAUSE", "user_start_or_resume")
             self._trigger_event(MPyg321Events.USER_RESUME)
             self.on_user_resume()
+            return future
+        return self._done()
 
     def stop(self):
-        """Stops the player"""
-        self.player.sendline("STOP")
-        self.status = PlayerStatus.STOPPING
+        """Stops the player, returns a future resolved by the @P 0 reply"""
+        self.requested_status = PlayerStatus.STOPPED
+        self._cancel_stream()
+        return self._send_command("STOP", "music_stop")
 
     def quit(self):
-        """Quits the player"""
-        self.player.sendline("QUIT")
-        self.status = PlayerStatus.QUITTED
+        """Quits the player, nothing is sent once its process has crashed"""
+        self.status = self.requested_status = PlayerStatus.QUITTED
+        self._cancel_stream()
+        if self.player.closed:
+            return self._done()
+        return self._send_command("QUIT")
 
     def jump(self, pos):
-        """Jump to position"""
-        self.player.sendline("JUMP " + str(pos))
+        """Jump to position, returns a future resolved by the @J reply"""
+        return self._send_command("JUMP " + str(pos), "jump")
+
+    def reset(self, timeout=1.0):
+        """Gives the player the state of a new one, e.g. before handing it
+        to another user: the callbacks are removed, the song is stopped
+        (waiting up to timeout seconds for the acknowledgement), and the
+        queue, loop, event dispatcher, metrics, tracing, loudness gains,
+        progress throttle, watchdog, command timeout and volume are reset.
+        Returns False when the player could not be reset, it should then
+        be quit. Subclasses reset their own state.
+        """
+        # Removed first: the stop is not reported to the previous user
+        self._events = {e: [] for e in MPyg321Events}
+        self.loop = False
+        self.queue = PlayQueue()
+        self._track_end = None
+        try:
+            if self.requested_status in (PlayerStatus.PLAYING, PlayerStatus.PAUSED):
+                # Acknowledged before it can be mistaken for the end of the
+                # next song played
+                self.stop().result(timeout)
+            self.set_event_dispatcher(None)
+            self.disable_metrics()
+            self.disable_tracing()
+            self.set_progress_throttle(None, False)
+            self.set_watchdog(False)
+            self.set_command_timeout(None)
+            self.set_loudness(None)
+            if self._volume is not None and self._volume != 100:
+                self.volume(100)
+            self._volume = None
+        except Exception:
+            return False
+        return True
 
-    def on_error(self):
-        """Process errors encountered by the player"""
-        output = self.player.readline().decode("utf-8")
+    def snapshot(self):
+        """Returns the state of the player as a JSON serializable dictionary
+        The frame is the last one reported by the frame output or by a jump,
+        advanced by the time played since when the frame output is silenced
+        (performance mode), see current_frame.
+        A song that has ended (the player is STOPPED) is not recorded.
+        """
+        # Streams cannot be loaded again
+        loaded = self._feeder is None and self.status in (
+            PlayerStatus.PLAYING,
+            PlayerStatus.PAUSED,
+        )
+        return {
+            "song": self.song_path if loaded else None,
+            "frame": self.current_frame() if loaded else None,
+            "paused": self.status == PlayerStatus.PAUSED,
+            "loop": self.loop,
+            "volume": self._volume,
+            "queue": self.queue.to_dict(),
+        }
 
-        # Check error in list of errors
+    def current_frame(self):
+        """Returns the frame being played, None when no song is loaded
+        Without frame output, it is estimated from the last frame reported
+        (by a jump, a pause or the start of the song) and the time played
+        since, at the frame rate of the stream. A pitch change is ignored.
+        """
+        frame, since = self._frame, self._frame_time
+        if frame is None or since is None:
+            return frame
+        rate = None
+        if self.track_info is not None:
+            rate = self.track_info.frame_rate
+        elapsed = time.monotonic() - since
+        return int(frame + elapsed * (rate or self.default_frame_rate))
+
+    def restore(self, state):
+        """Restores a snapshot()
+        Returns a future resolved once the song is loaded at its frame,
+        right away when no song was playing.
+        """
+        self.queue = PlayQueue.from_dict(state.get("queue", {}))
+        self.loop = state.get("loop", False)
+        if state.get("volume") is not None:
+            self.volume(state["volume"])
+        if not state.get("song"):
+            return self._done()
+        # The commands are queued at once, the player runs them in order
+        future = self.play_song(state["song"], self.loop)
+        if state.get("frame"):
+            future = self.jump(state["frame"])
+        if state.get("paused"):
+            future = self.pause()
+        return future
+
+    @staticmethod
+    def _done(result=None):
+        """Future of a command that did not need to be sent"""
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def on_error(self, output):
+        """Process errors encountered by the player
+        The error fails the oldest pending command and is reported through
+        the ERROR event. It is not raised: the output reader goes on.
+        """
+        # Check error in list of errors, some other error may have occurred
+        action = "unknown_error"
         for mpg_error in mpg_errors:
             if mpg_error["message"] in output:
                 action = mpg_error["action"]
-                context = MPyg321ErrorContext(self, action, output)
-                self._trigger_event(MPyg321Events.ERROR, context)
-                if action == "generic_error":
-                    raise MPygError(output)
-                if action == "file_error":
-                    raise MPygFileError(output)
-                if action == "command_error":
-                    raise MPygCommandError(output)
-                if action == "argument_error":
-                    raise MPygArgumentError(output)
-                if action == "eq_error":
-                    raise MPygEQError
-                if action == "seek_error":
-                    raise MPygSeekError
-
-        # Some other error occurred
-        context = MPyg321ErrorContext(self, "unknown_error", output)
+                break
+        error = mpg_error_types[action](output)
+        if self.metrics is not None:
+            self.metrics.error(action)
+        self._fail_command(error)
+        context = MPyg321ErrorContext(self, action, output)
         self._trigger_event(MPyg321Events.ERROR, context)
-        raise MPygError(output)
 
     def set_song(self, path):
         """song_path setter"""
@@ -214,12 +832,89 @@ player (Mpyg321Player or Mpyg123Player)"""
         """loop setter"""
         self.loop = loop
 
+    def set_loudness(self, analyzer):
+        """Applies the gains cached by a LoudnessAnalyzer to the songs loaded
+        from then on, by scaling the volume (see max_volume). Songs not
+        analyzed yet play without gain. None stops applying the gains.
+        """
+        self.loudness = analyzer
+        if analyzer is None:
+            self._set_gain(0.0)
+
+    def _set_gain(self, gain):
+        """Sets the volume again when the loudness gain changes"""
+        if gain == self._gain:
+            return
+        self._gain = gain
+        self.volume(100 if self._volume is None else self._volume)
+
+    def _output_volume(self, percent):
+        """Volume sent to the player: percent with the loudness gain applied"""
+        if not self._gain:
+            return percent
+        return min(round(percent * 10 ** (self._gain / 20), 2), self.max_volume)
+
+    def set_progress_throttle(self, max_rate=None, whole_seconds=False):
+        """Limits the PROGRESS events emitted from the frame output
+        Parameters:
+        max_rate (float): max number of events per second, None for no limit
+        whole_seconds (bool): only emit an event when the elapsed second changes
+        The position attribute is updated for every frame whatever the throttle.
+        """
+        self.progress_rate = max_rate
+        self.progress_whole_seconds = whole_seconds
+
+    def _set_status(self, status):
+        """Sets the status acknowledged by the player, and the requested one
+        unless another state change is still waiting for its reply
+        """
+        self.status = status
+        pending = self._pending_commands
+        if not any(reply in pending for reply in _STATE_REPLIES):
+            self.requested_status = status
+
     # # # Internal Callbacks # # #
-    def on_music_stop_int(self):
+    def on_error_int(self, args):
+        """Internal callback when the player reports an error"""
+        self.on_error(args.decode("utf-8", "replace"))
+
+    def on_player_exit_int(self):
+        """Internal callback when the output of the player process is closed
+        Returns True when a new process has been spawned by the watchdog.
+        """
+        if self.status == PlayerStatus.QUITTED:
+            return False
+        crash_time = time.perf_counter()
+        state = self.snapshot()
+        try:
+            self.player.close(force=True)
+        except Exception:
+            pass
+        self.status = self.requested_status = PlayerStatus.CRASHED
+        self._fail_all_commands(
+            MPygPlayerCrashedError("The player process has exited")
+        )
+        self._trigger_event(
+            MPyg321Events.PLAYER_CRASHED,
+            MPyg321CrashContext(
+                self, self.player.exitstatus, self.player.signalstatus
+            ),
+        )
+        if not self.watchdog or not self._may_restart():
+            return False
+        try:
+            self.respawn(state, crash_time)
+        except MPygError:
+            self.status = self.requested_status = PlayerStatus.CRASHED
+            return False
+        return True
+
+    def on_music_stop_int(self, args=None):
         """Internal callback when the music is stopped"""
-        if self.status == PlayerStatus.STOPPING:
+        if self.requested_status == PlayerStatus.STOPPED:
             self.on_user_stop_int()
-            self.status = PlayerStatus.STOPPED
+            self._set_status(PlayerStatus.STOPPED)
+            self._frame_time = None
         else:
             self.on_end_of_song_int()
 
@@ -230,28 +925,115 @@ player (Mpyg321Player or Mpyg123Player)"""
         self._trigger_event(MPyg321Events.USER_STOP)
         self.on_user_stop()
 
-    def on_user_pause_int(self):
+    def on_user_pause_int(self, args=None):
         """Internal callback when user pauses the music"""
+        self._set_status(PlayerStatus.PAUSED)
+        self._frame = self.current_frame()
+        self._frame_time = None
         self._trigger_event(MPyg321Events.ANY_STOP)
         self.on_any_stop()
         self._trigger_event(MPyg321Events.USER_PAUSE)
         self.on_user_pause()
 
-    def on_user_start_or_resume_int(self):
+    def on_user_start_or_resume_int(self, args=None):
         """Internal callback when user resumes the music"""
-        self.status = PlayerStatus.PLAYING
+        self._set_status(PlayerStatus.PLAYING)
+        # The frame advances from here, until a frame message reports it
+        if self._frame is None:
+            self._frame = 0
+        self._frame_time = time.monotonic()
+        if self._track_end is not None:
+            song, end_time = self._track_end
+            self._track_end = None
+            gap_ms = (time.perf_counter() - end_time) * 1000
+            self._trigger_event(
+                MPyg321Events.TRACK_END,
+                MPyg321TrackEndContext(self, song, self.song_path, gap_ms),
+            )
 
-    def on_end_of_song_int(self):
+    def on_end_of_song_int(self, args=None):
         """Internal callback when the song ends"""
+        end_time = time.perf_counter()
+        song = self.song_path
         if self.loop:
+            self._track_end = (song, end_time)
             self.play()
+        elif self.play_queue():
+            # Loaded right away from the reader thread to keep the gap short
+            self._track_end = (song, end_time)
         else:
-            # The music doesn't stop if it is looped
+            # The music doesn't stop if it is looped or if the queue goes on
+            self._set_status(PlayerStatus.STOPPED)
+            self._frame_time = None
             self._trigger_event(MPyg321Events.ANY_STOP)
             self.on_any_stop()
+            self._trigger_event(
+                MPyg321Events.TRACK_END,
+                MPyg321TrackEndContext(self, song, None, None),
+            )
         self._trigger_event(MPyg321Events.MUSIC_END)
         self.on_music_end()
 
+    def on_info_int(self, args):
+        """Internal callback when a tag of the song is received"""
+        if self.track_info is None:
+            self.track_info = TrackInfo(self.song_path)
+        self.track_info.parse_info(args.decode("utf-8", "replace"))
+
+    def on_stream_info_int(self, args):
+        """Internal callback when the stream information is received
+        This is the last message sent when a song is loaded: the track info
+        is complete except its exact length, set by the first frame message.
+        """
+        if self.track_info is None:
+            self.track_info = TrackInfo(self.song_path)
+        self.track_info.parse_stream(args.decode("utf-8", "replace"))
+        if self._events[MPyg321Events.TRACK_INFO]:
+            self._trigger_event(
+                MPyg321Events.TRACK_INFO,
+                MPyg321TrackInfoContext(self, self.track_info),
+            )
+
+    def on_jump_int(self, args):
+        """Internal callback when the player acknowledges a jump"""
+        try:
+            self._frame = int(args)
+        except ValueError:
+            return
+        if self.status == PlayerStatus.PLAYING:
+            self._frame_time = time.monotonic()
+
+    def on_progress_int(self, args):
+        """Internal callback when a frame has been decoded"""
+        try:
+            frame, frames_left, seconds, seconds_left = args.split()
+            position = PlayerPosition(
+                int(frame), int(frames_left), float(seconds), float(seconds_left)
+            )
+        except ValueError:
+            # Malformed frame message
+            return
+        self.position = position
+        self._frame = position.frame
+        self._frame_time = None
+        if self.track_info is not None and self.track_info.frames is None:
+            self.track_info.set_length(position)
+        if self.progress_whole_seconds:
+            second = int(position.seconds)
+            if second == self._progress_second:
+                return
+            self._progress_second = second
+        if self.progress_rate:
+            now = time.monotonic()
+            if now - self._progress_time < 1.0 / self.progress_rate:
+                return
+            self._progress_time = now
+        if self._events[MPyg321Events.PROGRESS]:
+            self._trigger_event(
+                MPyg321Events.PROGRESS, MPyg321ProgressContext(self, position)
+            )
+        self.on_progress()
+
     # # # Public Callbacks # # #
     def on_any_stop(self):
         """Callback when the music stops for any reason"""
@@ -272,3 +1054,27 @@ player (Mpyg321Player or Mpyg123Player)"""
     def on_music_end(self):
         """Callback when music ends"""
         pass
+
+    def on_progress(self):
+        """Callback when the playing position changes (see set_progress_throttle)"""
+        pass
+
+
+# Replies of the commands changing the play state
+_STATE_REPLIES = ("user_pause", "user_start_or_resume", "music_stop")
+
+
+def _takes_argument(function):
+    """Whether function can be called with one positional argument"""
+    try:
+        inspect.signature(function).bind(None)
+    except TypeError:
+        return False
+    except ValueError:
+        # No signature (builtins), assumed to take the arguments
+        pass
+    return True
+
+
+def _call_without_args(function, args):
+    function()
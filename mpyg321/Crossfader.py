@@ -0,0 +1,116 @@
+"""
+Mpyg Crossfader class
+Plays a queue of songs on two players, each song fading into the next.
+The end of the playing song is known from the frame output ("@F",
+seconds left), so the players need performance_mode=False. lookahead
+seconds before the fade, the next song is loaded paused and silent on
+the idle player, then the RampScheduler timer thread starts it (a
+single PAUSE command) duration seconds before the end of the current
+song and runs the equal power crossfade.
+"""
+
+import time
+from functools import partial
+from threading import Lock
+
+from .consts import MPyg321Events
+from .PlayQueue import PlayQueue
+from .RampScheduler import RampScheduler
+
+
+class Crossfader:
+    """Crossfades a queue of songs across two players"""
+
+    lookahead = 2.0  # seconds before the fade at which the next song is loaded
+
+    def __init__(self, player_a, player_b, duration=3.0, scheduler=None, volume=None):
+        """duration is the length of the fades (seconds), volume the one the
+        songs fade in to (that of the playing player by default)
+        """
+        self.players = (player_a, player_b)
+        self.duration = duration
+        self.volume = volume
+        self.scheduler = scheduler or RampScheduler()
+        self._own_scheduler = scheduler is None
+        self.queue = PlayQueue()
+        self.current = player_a  # player of the song being played
+        self.fades = 0  # crossfades started
+        self._next = None  # next song, once loaded on the idle player
+        self._fade = None  # future of the last crossfade
+        self._lock = Lock()
+        for player in self.players:
+            player.subscribe_event(MPyg321Events.PROGRESS, self._on_progress)
+
+    def enqueue(self, path):
+        """Adds a song at the end of the queue"""
+        self.queue.enqueue(path)
+
+    def play(self, path=None):
+        """Plays path, or the next song of the queue, on the current player
+        Returns its future, None at the end of the queue.
+        """
+        if path is None:
+            path = self.queue.next_song()
+            if path is None:
+                return None
+        with self._lock:
+            self._next = None
+        return self.current.play_song(path)
+
+    def _other(self, player):
+        return self.players[1] if player is self.players[0] else self.players[0]
+
+    def _on_progress(self, context):
+        """Loads the next song and schedules the crossfade near the end"""
+        player = context.player
+        seconds_left = context.seconds_left
+        if player is not self.current or seconds_left > self.duration + self.lookahead:
+            return
+        with self._lock:
+            if self._next is not None or player is not self.current:
+                return
+            if self._fade is not None and not self._fade.done():
+                # The idle player is still being stopped by the last fade
+                return
+            if self.queue.peek() is None:
+                return
+            path = self._next = self.queue.next_song()
+        incoming = self._other(player)
+        loaded = None
+        with incoming.batch():
+            incoming.volume(0)
+            if hasattr(incoming, "load_paused"):
+                loaded = incoming.load_paused(path)
+        start = time.perf_counter() + max(seconds_left - self.duration, 0.0)
+        self.scheduler.call_at(
+            start, partial(self._start, player, incoming, path, loaded)
+        )
+
+    def _start(self, outgoing, incoming, path, loaded):
+        """Starts the incoming song and the crossfade, on the timer thread"""
+        if loaded is not None and loaded.done() and loaded.exception() is None:
+            incoming.resume()
+            path = None
+        self.fades += 1
+        fade = self.scheduler.crossfade(
+            outgoing, incoming, self.duration, self.volume, path
+        )
+        with self._lock:
+            self._fade = fade
+            self.current = incoming
+            self._next = None
+
+    def close(self):
+        """Unsubscribes from the players, and closes the scheduler it created"""
+        for player in self.players:
+            callbacks = player._events[MPyg321Events.PROGRESS]
+            if self._on_progress in callbacks:
+                callbacks.remove(self._on_progress)
+        if self._own_scheduler:
+            self.scheduler.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
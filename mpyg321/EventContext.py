@@ -1,6 +1,8 @@
 class MPyg321EventContext:
     """Base class for all events"""
 
+    __slots__ = ("player",)
+
     def __init__(self, player) -> None:
         self.player = player
 
@@ -8,7 +10,73 @@ class MPyg321EventContext:
 class MPyg321ErrorContext(MPyg321EventContext):
     """Context for error events"""
 
+    __slots__ = ("error_type", "error_message")
+
     def __init__(self, player, error_type, error_message) -> None:
         super().__init__(player)
         self.error_type = error_type
         self.error_message = error_message
+
+
+class MPyg321ProgressContext(MPyg321EventContext):
+    """Context for progress events"""
+
+    __slots__ = ("position", "frame", "frames_left", "seconds", "seconds_left")
+
+    def __init__(self, player, position) -> None:
+        super().__init__(player)
+        self.position = position
+        self.frame = position.frame
+        self.frames_left = position.frames_left
+        self.seconds = position.seconds
+        self.seconds_left = position.seconds_left
+
+
+class MPyg321TrackEndContext(MPyg321EventContext):
+    """Context for track end events
+    gap_ms is the time between the end of song and the start of next_song,
+    both are None when nothing is played next.
+    """
+
+    __slots__ = ("song", "next_song", "gap_ms")
+
+    def __init__(self, player, song, next_song, gap_ms) -> None:
+        super().__init__(player)
+        self.song = song
+        self.next_song = next_song
+        self.gap_ms = gap_ms
+
+
+class MPyg321TrackInfoContext(MPyg321EventContext):
+    """Context for track info events"""
+
+    __slots__ = ("track_info",)
+
+    def __init__(self, player, track_info) -> None:
+        super().__init__(player)
+        self.track_info = track_info
+
+
+class MPyg321CrashContext(MPyg321EventContext):
+    """Context for player crash events
+    exit_status and signal_status are those of the player process.
+    """
+
+    __slots__ = ("exit_status", "signal_status")
+
+    def __init__(self, player, exit_status, signal_status) -> None:
+        super().__init__(player)
+        self.exit_status = exit_status
+        self.signal_status = signal_status
+
+
+class MPyg321RecoveryContext(MPyg321EventContext):
+    """Context for player recovery events
+    recovery_ms is the time between the crash and the song being resumed.
+    """
+
+    __slots__ = ("recovery_ms",)
+
+    def __init__(self, player, recovery_ms) -> None:
+        super().__init__(player)
+        self.recovery_ms = recovery_ms
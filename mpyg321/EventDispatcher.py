@@ -0,0 +1,168 @@
+"""
+Mpyg EventDispatcher class
+Runs the event callbacks on a pool of worker threads instead of the
+player output reader thread, so a slow callback never delays the
+parsing of the player output.
+Events are queued per (player, event) key: callbacks of the same key
+run one after the other in the order the events were triggered, while
+different keys run concurrently. The number of queued events is bounded
+and a BackpressurePolicy decides what happens when the bound is reached.
+With BLOCK, an event triggered by a callback of the dispatcher while the
+queue is full runs inline on that worker: waiting for the pool it
+belongs to could deadlock.
+"""
+
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, local
+
+from .consts import BackpressurePolicy
+from .MpygError import MPygError, MPygEventListenerError
+
+
+class EventDispatcher:
+    """Bounded event queue consumed by a thread pool"""
+
+    def __init__(
+        self, max_workers=4, maxsize=1024, policy=BackpressurePolicy.BLOCK
+    ):
+        """maxsize (at least 1) is the number of events queued at most"""
+        if maxsize < 1:
+            raise MPygError("The event queue size must be at least 1")
+        self.maxsize = maxsize
+        self.policy = policy
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="mpyg-events"
+        )
+        self._pending = {}  # key -> deque of [sequence, callbacks, context]
+        self._active = set()  # keys with a _run scheduled or running
+        self._sequence = itertools.count()
+        self._condition = Condition()
+        self._worker = local()  # its running attribute is set on the workers
+        # Counters
+        self.depth = 0
+        self.max_depth = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.last_error = None
+
+    def submit(self, key, callbacks, context):
+        """Queues the callbacks of an event, they are called with context"""
+        with self._condition:
+            if (
+                self.depth < self.maxsize
+                or self.policy != BackpressurePolicy.BLOCK
+                or not getattr(self._worker, "running", False)
+            ):
+                self._queue(key, callbacks, context)
+                return
+        # Triggered by a callback while the queue is full: waiting for a
+        # worker of its own pool could deadlock, this worker runs them
+        self._call(callbacks, context)
+        with self._condition:
+            self.dispatched += 1
+
+    def _queue(self, key, callbacks, context):
+        """Queues an event, applying the policy when the queue is full
+        Called with the condition held.
+        """
+        queue = self._pending.get(key)
+        if self.depth >= self.maxsize:
+            if self.policy == BackpressurePolicy.BLOCK:
+                while self.depth >= self.maxsize:
+                    self._condition.wait()
+                queue = self._pending.get(key)
+            elif self.policy == BackpressurePolicy.COALESCE and queue:
+                # Only the latest context of this event will be dispatched
+                queue[-1][2] = context
+                self.coalesced += 1
+                return
+            else:
+                self._drop_oldest()
+        if queue is None:
+            queue = self._pending[key] = deque()
+        queue.append([next(self._sequence), callbacks, context])
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        if key not in self._active:
+            self._active.add(key)
+            self._executor.submit(self._run, key)
+
+    def _drop_oldest(self):
+        """Drops the oldest queued event"""
+        oldest = None
+        for key, queue in self._pending.items():
+            if not queue:
+                continue
+            if oldest is None or queue[0][0] < self._pending[oldest][0][0]:
+                oldest = key
+        if oldest is not None:
+            self._pending[oldest].popleft()
+            self.depth -= 1
+            self.dropped += 1
+
+    def _run(self, key):
+        """Runs the callbacks of the first queued event of key"""
+        with self._condition:
+            queue = self._pending[key]
+            if not queue:
+                # Its events have been dropped in the meantime
+                del self._pending[key]
+                self._active.discard(key)
+                return
+            _, callbacks, context = queue.popleft()
+            self.depth -= 1
+            self._condition.notify_all()
+        self._worker.running = True
+        self._call(callbacks, context)
+        with self._condition:
+            self.dispatched += 1
+            if queue:
+                # Resubmitted rather than looped to share the workers between keys
+                self._executor.submit(self._run, key)
+            else:
+                del self._pending[key]
+                self._active.discard(key)
+                self._condition.notify_all()
+
+    def _call(self, callbacks, context):
+        """Calls the callbacks of an event, counting their errors"""
+        tracer = getattr(context.player, "tracer", None)
+        for callback in callbacks:
+            start = time.perf_counter_ns() if tracer is not None else 0
+            try:
+                callback(context)
+            except Exception as e:
+                with self._condition:
+                    self.errors += 1
+                    self.last_error = MPygEventListenerError(
+                        "Error while executing event callback: {}".format(e)
+                    )
+            if tracer is not None:
+                end = time.perf_counter_ns()
+                track = context.player._trace_track
+                tracer.record("callback", callback, track, start, end)
+
+    def stats(self):
+        """Returns the counters of the dispatcher"""
+        with self._condition:
+            return {
+                "depth": self.depth,
+                "max_depth": self.max_depth,
+                "dispatched": self.dispatched,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+            }
+
+    def shutdown(self, wait=True):
+        """Stops the workers, once the queued events are dispatched if wait"""
+        if wait:
+            with self._condition:
+                while self._active:
+                    self._condition.wait()
+        self._executor.shutdown(wait=wait)
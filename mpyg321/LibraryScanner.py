@@ -0,0 +1,182 @@
+"""
+Mpyg LibraryScanner class
+Reads the tags, stream information and length of many songs by loading
+them into several players running in parallel, in test mode ("-t": the
+songs are decoded without being played). The results are cached per
+file identity (path, size, mtime and inode) in a PersistentCache, so
+rescanning a library only loads the new or modified files.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+from threading import Event, Lock
+
+from .consts import MPyg321Events, PlayerStatus
+from .MPyg123Player import MPyg123Player
+from .MpygError import MPygError
+from .PersistentCache import PersistentCache, file_identity
+from .TrackInfo import TrackInfo
+
+DEFAULT_EXTENSIONS = (".mp3", ".mp2", ".mp1", ".mpga")
+
+
+class LibraryScanner:
+    """Extracts the TrackInfo of songs with a pool of players"""
+
+    timeout = 5.0  # seconds to wait for a song to be loaded
+    save_every = 100  # number of new entries written to the cache at once
+
+    def __init__(
+        self,
+        workers=4,
+        cache_path=None,
+        extensions=DEFAULT_EXTENSIONS,
+        player_class=MPyg123Player,
+        **player_kwargs
+    ):
+        """Players are built as player_class(**player_kwargs), in test mode
+        and with the frame output enabled by default
+        """
+        self.workers = workers
+        self.cache = PersistentCache(cache_path)
+        self.extensions = tuple(extensions)
+        self.player_class = player_class
+        player_kwargs.setdefault("performance_mode", False)
+        player_kwargs.setdefault("custom_args", "-t")
+        self.player_kwargs = player_kwargs
+        self.errors = {}  # path -> error of the last scan
+        self._idle = Queue()
+        self._players = []
+        self._lock = Lock()
+
+    def iter_files(self, paths):
+        """Yields the songs of paths, directories are walked recursively"""
+        if isinstance(paths, str):
+            paths = [paths]
+        for path in paths:
+            if not os.path.isdir(path):
+                yield path
+                continue
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(self.extensions):
+                        yield os.path.join(root, name)
+
+    def scan(self, paths, callback=None):
+        """Returns {path: TrackInfo} for the songs of paths
+        Songs that could not be read are left out and stored in errors.
+        callback(path, track_info) is called for each song, track_info
+        being None on error.
+        """
+        self.errors = {}
+        results = {}
+        new_entries = {}
+        to_scan = []
+        for path in self.iter_files(paths):
+            try:
+                key = file_identity(path)
+            except OSError as e:
+                self._report(path, None, e, callback)
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[path] = TrackInfo.from_dict(cached)
+                if callback is not None:
+                    callback(path, results[path])
+            else:
+                to_scan.append((path, key))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                (path, key, executor.submit(self._scan_file, path))
+                for path, key in to_scan
+            ]
+            for path, key, future in futures:
+                try:
+                    info = future.result()
+                except Exception as e:
+                    self._report(path, None, e, callback)
+                    continue
+                results[path] = info
+                new_entries[key] = info.to_dict()
+                if len(new_entries) >= self.save_every:
+                    self.cache.update(new_entries)
+                    new_entries = {}
+                if callback is not None:
+                    callback(path, info)
+        if new_entries:
+            self.cache.update(new_entries)
+        return results
+
+    def _report(self, path, info, error, callback):
+        self.errors[path] = error
+        if callback is not None:
+            callback(path, info)
+
+    def _scan_file(self, path):
+        """Loads a song into an idle player and waits for its length"""
+        player = self._acquire()
+        try:
+            player.scan_done.clear()
+            player.play_song(path).result(self.timeout)
+            if not player.scan_done.wait(self.timeout):
+                raise MPygError("No frame decoded from " + path)
+            return player.track_info
+        except Exception:
+            # The player may be in any state, it is not reused
+            self._discard(player)
+            player = None
+            raise
+        finally:
+            if player is not None:
+                self._release(player)
+
+    def _acquire(self):
+        """Returns an idle player, spawning one if needed"""
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        player = self.player_class(**self.player_kwargs)
+        player.scan_done = Event()
+        player.subscribe_event(
+            MPyg321Events.PROGRESS, lambda context: context.player.scan_done.set()
+        )
+        with self._lock:
+            self._players.append(player)
+        return player
+
+    def _release(self, player):
+        """Stops the song of a player and makes it available again"""
+        if player.status == PlayerStatus.PLAYING:
+            try:
+                player.stop().result(self.timeout)
+            except Exception:
+                self._discard(player)
+                return
+        self._idle.put(player)
+
+    def _discard(self, player):
+        """Quits a player"""
+        with self._lock:
+            if player in self._players:
+                self._players.remove(player)
+        if player.player.isalive():
+            player.quit()
+
+    def close(self):
+        """Quits all the players"""
+        with self._lock:
+            players, self._players = self._players, []
+        for player in players:
+            if player.player.isalive():
+                player.quit()
+        self._idle = Queue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,192 @@
+"""
+Mpyg LoudnessAnalyzer class
+Measures the integrated loudness of songs as ITU-R BS.1770 (EBU R128)
+does: K-weighting filter, mean square over 400 ms blocks overlapping by
+75%, absolute gate at -70 LUFS and relative gate 10 LU below the level
+of the blocks above it. The samples come from a PCMDecoder and the songs
+are analyzed in parallel in a pool of processes.
+The results are cached per file identity (path, size, mtime and inode)
+in a PersistentCache, so a song is analyzed once. Players given the
+analyzer (see BasePlayer.set_loudness) turn the cached loudness into a
+volume gain each time they load a song.
+"""
+
+import array
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+from .MpygError import MPygError
+from .PCMDecoder import PCMDecoder
+from .PersistentCache import PersistentCache, file_identity
+
+_MISSING = object()
+
+
+def k_weighting(rate):
+    """Coefficients (b0, b1, b2, a1, a2) of the high shelf stage and (a1, a2)
+    of the high pass stage (b = 1, -2, 1) of the K-weighting filter at rate
+    """
+    # High shelf, +4 dB above 1.5 kHz
+    k = math.tan(math.pi * 1681.974450955533 / rate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh**0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = (
+        (vh + vb * k / q + k * k) / a0,
+        2 * (k * k - vh) / a0,
+        (vh - vb * k / q + k * k) / a0,
+        2 * (k * k - 1) / a0,
+        (1 - k / q + k * k) / a0,
+    )
+    # High pass at 38 Hz
+    k = math.tan(math.pi * 38.13547087602444 / rate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    high_pass = (2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0)
+    return shelf, high_pass
+
+
+class LoudnessMeter:
+    """Integrated loudness of interleaved float samples, fed chunk by chunk"""
+
+    def __init__(self, rate, channels):
+        self.channels = channels
+        self.shelf, self.high_pass = k_weighting(rate)
+        self.step = rate // 10  # frames of the 100 ms sub-blocks
+        # Per channel: filters memory, sum and count of the sub-block
+        self._states = [(0.0,) * 6 + (0.0, 0) for _ in range(channels)]
+        self._sums = [[] for _ in range(channels)]  # sum of squares per sub-block
+
+    def feed(self, samples):
+        """Filters a chunk of samples (array of floats, interleaved)"""
+        b0, b1, b2, a1, a2 = self.shelf
+        c1, c2 = self.high_pass
+        step = self.step
+        for channel in range(self.channels):
+            x1, x2, y1, y2, z1, z2, total, count = self._states[channel]
+            append = self._sums[channel].append
+            for x in samples[channel :: self.channels]:
+                y = b0 * x + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+                z = y - 2.0 * y1 + y2 - c1 * z1 - c2 * z2
+                x2, x1, y2, y1, z2, z1 = x1, x, y1, y, z1, z
+                total += z * z
+                count += 1
+                if count == step:
+                    append(total)
+                    total, count = 0.0, 0
+            self._states[channel] = (x1, x2, y1, y2, z1, z2, total, count)
+
+    def loudness(self):
+        """Integrated loudness (LUFS), None when everything is gated out"""
+        sub_blocks = [sum(sums) / self.step for sums in zip(*self._sums)]
+        # 400 ms blocks made of 4 sub-blocks, one every 100 ms
+        blocks = [
+            sum(sub_blocks[i : i + 4]) / 4 for i in range(len(sub_blocks) - 3)
+        ]
+        # Absolute gate: -70 LUFS
+        threshold = 10 ** ((-70 + 0.691) / 10)
+        blocks = [power for power in blocks if power > threshold]
+        if not blocks:
+            return None
+        # Relative gate: 10 LU below the level of the remaining blocks
+        threshold = sum(blocks) / len(blocks) * 10 ** (-10 / 10)
+        blocks = [power for power in blocks if power > threshold]
+        return -0.691 + 10 * math.log10(sum(blocks) / len(blocks))
+
+
+def measure_loudness(decoder, path):
+    """Integrated loudness of a song decoded by a PCMDecoder in "f32" """
+    meter = LoudnessMeter(decoder.rate, decoder.channels)
+    samples = array.array("f")
+    for chunk in decoder.iter_chunks(path):
+        del samples[:]
+        samples.frombytes(chunk)
+        meter.feed(samples)
+    return meter.loudness()
+
+
+class LoudnessAnalyzer:
+    """Measures and caches the loudness of songs with a pool of processes"""
+
+    save_every = 100  # number of new entries written to the cache at once
+
+    def __init__(
+        self, cache_path=None, target=-18.0, workers=None, rate=22050, **decoder_kwargs
+    ):
+        """Songs are decoded at rate (Hz) by PCMDecoder(**decoder_kwargs)
+        target is the loudness (LUFS) the gains bring the songs to,
+        -18 LUFS being the ReplayGain 2.0 reference level.
+        """
+        self.decoder = PCMDecoder(rate=rate, encoding="f32", **decoder_kwargs)
+        self.cache = PersistentCache(cache_path)
+        self.target = target
+        self.workers = workers
+        self.errors = {}  # path -> error of the last analysis
+
+    def _key(self, path):
+        try:
+            return file_identity(path)
+        except OSError:
+            return None
+
+    def loudness(self, path, default=None):
+        """Cached loudness (LUFS) of a song, None for a silent one, default
+        when it has not been analyzed
+        """
+        key = self._key(path)
+        if key is None:
+            return default
+        return self.cache.get(key, default)
+
+    def gain(self, path):
+        """Gain (dB) bringing a song to the target loudness, None when unknown"""
+        loudness = self.loudness(path)
+        if loudness is None:
+            return None
+        return self.target - loudness
+
+    def analyze(self, paths, callback=None, force=False):
+        """Measures the songs not cached yet (or all of them with force)
+        Returns a {path: loudness} dictionary, callback(path, loudness) is
+        called as the results come in. Songs that fail are left out and
+        their error stored in errors.
+        """
+        self.errors = {}
+        results = {}
+        todo = []
+        for path in paths:
+            key = self._key(path)
+            if key is None:
+                self.errors[path] = MPygError("Cannot read {}".format(path))
+                continue
+            loudness = _MISSING if force else self.cache.get(key, _MISSING)
+            if loudness is _MISSING:
+                todo.append((path, key))
+                continue
+            results[path] = loudness
+            if callback is not None:
+                callback(path, loudness)
+        if not todo:
+            return results
+        new_entries = {}
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                (path, key, executor.submit(measure_loudness, self.decoder, path))
+                for path, key in todo
+            ]
+            for path, key, future in futures:
+                try:
+                    loudness = future.result()
+                except MPygError as e:
+                    self.errors[path] = e
+                    continue
+                results[path] = new_entries[key] = loudness
+                if len(new_entries) >= self.save_every:
+                    self.cache.update(new_entries)
+                    new_entries = {}
+                if callback is not None:
+                    callback(path, loudness)
+        if new_entries:
+            self.cache.update(new_entries)
+        return results
@@ -1,6 +1,7 @@
+from functools import partial
+
 from .BasePlayer import BasePlayer
 from .consts import MPyg321Events, PlayerStatus
-from .EventContext import MPyg321EventContext
 
 
 class MPyg123Player(BasePlayer):
@@ -13,25 +14,52 @@ class MPyg123Player(BasePlayer):
         performance_mode=True,
         custom_args="",
         rva_mix=False,
+        threaded=True,
+        backend="pexpect",
     ):
         self.suitable_versions = ["mpg123"]
         self.default_player = "mpg123"
         custom_args += " --rva-mix " if rva_mix else ""
-        super().__init__(player, audiodevice, performance_mode, custom_args)
+        self._listings = {}  # reply -> lines of the TAG/STATE listing being read
+        super().__init__(
+            player, audiodevice, performance_mode, custom_args, threaded, backend
+        )
         if performance_mode:
             self.silence_mpyg_output()
         self._is_muted = False            
+        self._tuned = False  # pitch, equalizer or RVA changed
+
+    def _action_handlers(self):
+        """Adds the mpg123 specific actions to the dispatch table"""
+        handlers = super()._action_handlers()
+        handlers["user_mute"] = self.on_user_mute_int
+        handlers["user_unmute"] = self.on_user_unmute_int
+        handlers["tag_line"] = partial(self.on_listing_line_int, "tag")
+        handlers["state_line"] = partial(self.on_listing_line_int, "state")
+        return handlers
+
+    def on_user_mute_int(self, args=None):
+        """Internal callback when the player is muted"""
+        self._is_muted = True
+        self.on_user_mute()
+        self._trigger_event(MPyg321Events.USER_MUTE)
+
+    def on_user_unmute_int(self, args=None):
+        """Internal callback when the player is unmuted"""
+        self._is_muted = False
+        self._trigger_event(MPyg321Events.USER_UNMUTE)
+        self.on_user_unmute()
 
-    def process_output_ext(self, action):
-        """Processes specific output for mpg123 player"""
-        if action == "user_mute":
-            self._is_muted = True
-            self.on_user_mute()
-            self._trigger_event(MPyg321Events.USER_MUTE, MPyg321EventContext(self))
-        elif action == "user_unmute":
-            self._is_muted = False
-            self._trigger_event(MPyg321Events.USER_UNMUTE, MPyg321EventContext(self))
-            self.on_user_unmute()
+    def on_listing_line_int(self, reply, args):
+        """Internal callback collecting the lines of a TAG or STATE listing
+        The command is resolved with the lines once "}" is received.
+        """
+        if args == b"{":
+            self._listings[reply] = []
+        elif args == b"}":
+            self._resolve_command(reply, b"\n".join(self._listings.pop(reply, [])))
+        else:
+            self._listings.setdefault(reply, []).append(args)
 
     def load_list(self, entry, filepath):
         """Load an entry in a list
@@ -39,31 +67,120 @@ class MPyg123Player(BasePlayer):
         entry (int): index of the song in the list - first is 0
         filepath: URL/Path to the list
         """
-        self.player.sendline("LOADLIST {} {}".format(entry, filepath))
-        self.status = PlayerStatus.PLAYING
+        self.requested_status = PlayerStatus.PLAYING
+        return self._send_command(
+            "LOADLIST {} {}".format(entry, filepath), "user_start_or_resume"
+        )
+
+    def load_paused(self, path):
+        """Loads a song without playing it, resume() then starts it at once
+        Returns a future resolved by the @P 1 reply.
+        """
+        self._track_end = None
+        self.set_song(path)
+        return self._load("LOADPAUSED", PlayerStatus.PAUSED, "user_pause")
 
     def silence_mpyg_output(self):
         """Improves performance by silencing the mpg123 process frame output"""
-        self.player.sendline("SILENCE")
+        return self._send_command("SILENCE", "silence")
 
     def mute(self):
         """Mutes the player"""
-        self.player.sendline("MUTE")
+        return self._send_command("MUTE", "user_mute")
 
     def unmute(self):
         """Unmutes the player"""
-        self.player.sendline("UNMUTE")
+        return self._send_command("UNMUTE", "user_unmute")
 
     def toggle_mute(self):
         """Mute or UnMute if playing"""
         if self._is_muted:
-            self.unmute()
-        else:
-            self.mute()
+            return self.unmute()
+        return self.mute()
 
     def volume(self, percent):
         """Adjust player's volume"""
-        self.player.sendline("VOLUME {}".format(percent))
+        self._volume = percent
+        volume = self._output_volume(percent)
+        return self._send_command("VOLUME {}".format(volume), "volume")
+
+    def pitch(self, value):
+        """Changes the playback speed, e.g. 0.05 for 5% faster than normal
+        A string such as "+0.01" or "-0.01" changes it relatively.
+        Returns a future resolved with the new pitch.
+        """
+        self._tuned = True
+        return self._send_command("PITCH {}".format(value), "pitch")
+
+    def eq(self, channel, band, value):
+        """Sets the gain of an equalizer band
+        Parameters:
+        channel (int): 1 for left, 2 for right, 3 for both
+        band (int): frequency band, from 0 to 31
+        value (float): linear gain, 1.0 leaves the band unchanged
+        """
+        self._tuned = True
+        return self._send_command("EQ {} {} {}".format(channel, band, value), "eq")
+
+    def seq(self, bass, mid, treble):
+        """Sets the simple 3 bands equalizer (linear gains, 1.0 is neutral)"""
+        self._tuned = True
+        return self._send_command("SEQ {} {} {}".format(bass, mid, treble), "seq")
+
+    def rva(self, mode):
+        """Sets the volume adjustment from the tags (off, mix or album)"""
+        self._tuned = True
+        return self._send_command("RVA {}".format(mode), "rva")
+
+    def scan(self):
+        """Scans the loaded file to build an accurate seek index"""
+        return self._send_command("SCAN", "scan")
+
+    def sample(self):
+        """Returns a future resolved with the sample position and total samples"""
+        return self._send_command("SAMPLE", "sample")
+
+    def tag(self):
+        """Returns a future resolved with the tag listing of the loaded song
+        (the "@T" lines, one per line)
+        """
+        return self._send_command("TAG", "tag")
+
+    def state(self):
+        """Returns a future resolved with the player state listing
+        (the "@STATE" lines, one per line)
+        """
+        return self._send_command("STATE", "state")
+
+    def _reapply_settings(self):
+        """Silences the respawned process in performance mode"""
+        self._is_muted = False
+        self._tuned = False
+        if self.performance_mode:
+            self.silence_mpyg_output()
+
+    def reset(self, timeout=1.0):
+        """Resets the player (see BasePlayer.reset), unmuted
+        Returns False once the pitch, equalizer or RVA mode was changed, as
+        the previous values are unknown.
+        """
+        if not super().reset(timeout) or self._tuned:
+            return False
+        if self._is_muted:
+            self.unmute()
+        return True
+
+    def snapshot(self):
+        """Returns the state of the player, mute state included"""
+        state = super().snapshot()
+        state["muted"] = self._is_muted
+        return state
+
+    def restore(self, state):
+        """Restores a snapshot(), mute state included"""
+        if state.get("muted", False) != self._is_muted:
+            self.toggle_mute()
+        return super().restore(state)
 
     # # # Public Callbacks # # #
     def on_user_mute(self):
@@ -6,11 +6,19 @@ class MPyg321Player(BasePlayer):
     """Player for legacy mpg321"""
 
     def __init__(
-        self, player=None, audiodevice=None, performance_mode=True, custom_args=""
+        self,
+        player=None,
+        audiodevice=None,
+        performance_mode=True,
+        custom_args="",
+        threaded=True,
+        backend="pexpect",
     ):
         self.suitable_versions = ["mpg321"]
         self.default_player = "mpg321"
-        super().__init__(player, audiodevice, performance_mode, custom_args)
+        super().__init__(
+            player, audiodevice, performance_mode, custom_args, threaded, backend
+        )
 
     def process_output_ext(self, action):
         """
@@ -23,4 +31,7 @@ class MPyg321Player(BasePlayer):
 
     def volume(self, percent):
         """Adjust player's volume"""
-        self.player.sendline("GAIN {}".format(percent))
+        self._volume = percent
+        # mpg321 does not acknowledge GAIN
+        volume = round(self._output_volume(percent))
+        return self._send_command("GAIN {}".format(volume))
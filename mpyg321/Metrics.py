@@ -0,0 +1,345 @@
+"""
+Mpyg metrics classes
+Lightweight histogram used to record latencies (in milliseconds)
+without keeping every sample, and an in-process registry of labeled
+counters, gauges and histograms dumped in the Prometheus text format.
+"""
+
+import bisect
+import weakref
+from threading import Lock
+
+# Upper bounds (ms) of the latency buckets, the last bucket is unbounded
+DEFAULT_BUCKETS = (
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+)
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._lock = Lock()
+
+    def observe(self, value):
+        """Records one value"""
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p (0-1) percentile"""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = p * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if seen >= rank:
+                    return min(bound, self.max)
+            return self.max
+
+    def snapshot(self):
+        """Returns the histogram as a dictionary"""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "buckets": dict(zip(self.buckets + (float("inf"),), self.counts)),
+        }
+
+
+class Counter:
+    """Value that only goes up"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """Value set directly, or read from a function when collected"""
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Reads the value from function() on each collection"""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+
+class MetricFamily:
+    """Metric with labels, holding one child metric per label values"""
+
+    def __init__(self, name, help, kind, labelnames, factory):
+        self.name = name
+        self.help = help
+        self.kind = kind  # "counter", "gauge" or "histogram"
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = Lock()
+
+    def labels(self, *values):
+        """Child metric of the label values, created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def remove(self, *values):
+        """Removes the child metric of the label values"""
+        with self._lock:
+            self._children.pop(values, None)
+
+    def remove_matching(self, **labels):
+        """Removes the child metrics with the given label values"""
+        positions = [(self.labelnames.index(k), v) for k, v in labels.items()]
+        with self._lock:
+            for values in list(self._children):
+                if all(values[i] == v for i, v in positions):
+                    del self._children[values]
+
+    def children(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(n, _escape(v)) for n, v in pairs) + "}"
+
+
+def _escape(value):
+    value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return value.replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value is None:
+        return "NaN"
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Metric families of the process, dumped in the Prometheus text format"""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = Lock()
+
+    def _family(self, name, help, kind, labelnames, factory):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = MetricFamily(name, help, kind, labelnames, factory)
+                self._families[name] = family
+            return family
+
+    def counter(self, name, help, labelnames=()):
+        """Returns the counter family name, created on first use"""
+        return self._family(name, help, "counter", labelnames, Counter)
+
+    def gauge(self, name, help, labelnames=()):
+        """Returns the gauge family name, created on first use"""
+        return self._family(name, help, "gauge", labelnames, Gauge)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Returns the histogram family name, created on first use"""
+        return self._family(
+            name, help, "histogram", labelnames, lambda: Histogram(buckets)
+        )
+
+    def families(self):
+        with self._lock:
+            return list(self._families.values())
+
+    def dump(self):
+        """Returns all the metrics in the Prometheus text format"""
+        lines = []
+        for family in self.families():
+            lines.append("# HELP {} {}".format(family.name, family.help))
+            lines.append("# TYPE {} {}".format(family.name, family.kind))
+            for values, metric in family.children():
+                if family.kind == "histogram":
+                    lines.extend(self._histogram_lines(family, values, metric))
+                    continue
+                value = metric.get() if family.kind == "gauge" else metric.value
+                lines.append(
+                    "{}{} {}".format(
+                        family.name,
+                        _format_labels(family.labelnames, values),
+                        _format_value(value),
+                    )
+                )
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram_lines(family, values, histogram):
+        """Cumulative buckets, sum and count lines of a histogram"""
+        name, labelnames = family.name, family.labelnames
+        cumulative = 0
+        bounds = histogram.buckets + (float("inf"),)
+        for bound, count in zip(bounds, list(histogram.counts)):
+            cumulative += count
+            labels = _format_labels(labelnames, values, [("le", _format_value(bound))])
+            yield "{}_bucket{} {}".format(name, labels, cumulative)
+        labels = _format_labels(labelnames, values)
+        yield "{}_sum{} {}".format(name, labels, _format_value(histogram.sum))
+        yield "{}_count{} {}".format(name, labels, histogram.count)
+
+
+# Registry used by the players unless another one is given to enable_metrics
+registry = MetricsRegistry()
+
+
+class PlayerMetrics:
+    """Metrics of one player, labeled with its name
+    The children metrics are resolved once so that recording a value costs
+    a dictionary lookup at most.
+    """
+
+    def __init__(self, player, registry, name):
+        self.name = name
+        self.registry = registry
+        self._messages = registry.counter(
+            "mpyg321_messages_total",
+            "Messages parsed from the player output, by action",
+            ("player", "action"),
+        )
+        self._commands = registry.counter(
+            "mpyg321_commands_total",
+            "Commands sent to the player",
+            ("player", "command"),
+        )
+        self._errors = registry.counter(
+            "mpyg321_errors_total",
+            "Errors reported by the player, by mpg_errors action",
+            ("player", "error"),
+        )
+        self._callbacks = registry.histogram(
+            "mpyg321_callback_duration_ms",
+            "Duration of the event callbacks run inline (ms)",
+            ("player", "event"),
+        )
+        self.reader_lag = registry.histogram(
+            "mpyg321_reader_lag_ms",
+            "Time spent by the reader loop on each chunk of output (ms)",
+            ("player",),
+        ).labels(name)
+        self._message_children = {}
+        self._command_children = {}
+        # Gauges are read from the player when the metrics are collected
+        player_ref = weakref.ref(player)
+
+        def read(attribute):
+            def function():
+                player = player_ref()
+                return None if player is None else attribute(player)
+
+            return function
+
+        gauges = (
+            (
+                "mpyg321_status",
+                "Status of the player (see PlayerStatus)",
+                read(lambda p: p.status),
+            ),
+            (
+                "mpyg321_volume",
+                "Last volume set (percent)",
+                read(lambda p: p._volume),
+            ),
+            (
+                "mpyg321_position_seconds",
+                "Position in the song from the frame output",
+                read(lambda p: p.position.seconds if p.position else None),
+            ),
+        )
+        for gauge_name, help, function in gauges:
+            gauge = registry.gauge(gauge_name, help, ("player",))
+            gauge.labels(name).set_function(function)
+
+    def message(self, action):
+        """Counts a parsed message"""
+        child = self._message_children.get(action)
+        if child is None:
+            child = self._message_children[action] = self._messages.labels(
+                self.name, action or "unknown"
+            )
+        child.inc()
+
+    def command(self, command):
+        """Counts a sent command"""
+        child = self._command_children.get(command)
+        if child is None:
+            child = self._command_children[command] = self._commands.labels(
+                self.name, command
+            )
+        child.inc()
+
+    def error(self, action):
+        """Counts an error"""
+        self._errors.labels(self.name, action).inc()
+
+    def callback(self, event, duration_ms):
+        """Records the duration of an event callback"""
+        self._callbacks.labels(self.name, event.value).observe(duration_ms)
+
+    def remove(self):
+        """Removes the metrics of the player from the registry"""
+        for family in self.registry.families():
+            if "player" in family.labelnames:
+                family.remove_matching(player=self.name)
@@ -35,6 +35,24 @@ class MPygSeekError(MPygError):
     pass
 
 
+class MPygCommandTimeoutError(MPygError):
+    """Errors encountered when the player does not acknowledge a command in time"""
+
+    pass
+
+
+class MPygPlayerCrashedError(MPygError):
+    """Errors encountered when the player process exits unexpectedly"""
+
+    pass
+
+
+class MPygWorkerError(MPygError):
+    """Errors encountered when a worker process of a PlayerFarm exits"""
+
+    pass
+
+
 class MPygPlayerNotFoundError(MPygError):
     """Errors encountered when no suitable player is found"""
 
@@ -51,3 +69,15 @@ class MPygEventListenerError(MPygError):
     """Errors encountered when an event listener throws an exception"""
 
     pass
+
+
+# Error class raised for each action of consts.mpg_errors
+mpg_error_types = {
+    "generic_error": MPygError,
+    "file_error": MPygFileError,
+    "command_error": MPygCommandError,
+    "argument_error": MPygArgumentError,
+    "eq_error": MPygEQError,
+    "seek_error": MPygSeekError,
+    "unknown_error": MPygError,
+}
@@ -0,0 +1,88 @@
+"""
+Mpyg output parser
+Tokenizes the remote control output of mpg123/mpg321 line by line.
+Every message is dispatched on its tag (the first word, e.g. "@P" or "@F")
+through a table built once from mpg_outs, so parsing a line costs one
+partition and one or two dictionary lookups, whatever the number of
+known messages.
+Lines are assembled incrementally: each chunk is scanned once and only
+the trailing partial line is kept, up to max_line_length bytes, so the
+memory used does not depend on how long the player runs. Longer lines
+are dropped and counted in overflows.
+"""
+
+
+class MPygOutputParser:
+    """Line oriented parser for the player remote control output"""
+
+    max_line_length = 4096  # longer lines are dropped and counted in overflows
+
+    def __init__(self, mpg_outs, max_line_length=None):
+        """Builds the dispatch table from the "tag" of each mpg_out"""
+        self._table = {}
+        self._pending = b""
+        self._discarding = False  # inside a line longer than max_line_length
+        self.overflows = 0
+        if max_line_length is not None:
+            self.max_line_length = max_line_length
+        for mpg_out in mpg_outs:
+            if mpg_out.get("tag") is None:
+                continue
+            tag, _, state = mpg_out["tag"].encode().partition(b" ")
+            if state:
+                # Messages such as "@P 0" are dispatched on their first argument
+                self._table.setdefault(tag, {})[state] = mpg_out["action"]
+            else:
+                self._table[tag] = mpg_out["action"]
+
+    def feed(self, data):
+        """Returns the complete lines of data
+        The trailing partial line is kept until the next call. Lines longer
+        than max_line_length are dropped whole, however the output is split
+        in chunks.
+        """
+        # Only copy the data when needed: pty output ends its lines with \r\n
+        if b"\r" in data:
+            data = data.replace(b"\r", b"")
+        size = len(data)
+        if self._pending:
+            data = self._pending + data
+        lines = data.split(b"\n")
+        pending = lines.pop()
+        if self._discarding:
+            if not lines:
+                return lines
+            # End of the overlong line
+            del lines[0]
+            self._discarding = False
+        max_line_length = self.max_line_length
+        if lines and len(lines[0]) > max_line_length:
+            # Possibly made longer by the pending data
+            del lines[0]
+            self.overflows += 1
+        if size > max_line_length:
+            # Only then can the other complete lines be too long
+            count = len(lines)
+            lines = [line for line in lines if len(line) <= max_line_length]
+            self.overflows += count - len(lines)
+        if len(pending) > max_line_length:
+            self.overflows += 1
+            self._discarding = True
+            pending = b""
+        self._pending = pending
+        return lines
+
+    def parse_line(self, line):
+        """Returns the (action, arguments) tuple of a line
+        action is None for unknown or ignored messages.
+        """
+        tag, _, args = line.partition(b" ")
+        action = self._table.get(tag)
+        if action.__class__ is dict:
+            action = action.get(args.partition(b" ")[0])
+        return action, args
+
+    def parse(self, data):
+        """Yields the (action, arguments) tuple of each complete line of data"""
+        for line in self.feed(data):
+            yield self.parse_line(line)
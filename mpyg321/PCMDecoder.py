@@ -0,0 +1,183 @@
+"""
+Mpyg PCMDecoder class
+Decodes songs to raw PCM for analysis (waveforms, peak/RMS, silence
+detection) without playing them: mpg123 writes the samples to a pipe
+("-s") with a fixed encoding ("-e"), rate ("-r") and channel count, as
+fast as it can decode, and needs no audio device.
+The samples are read in fixed-size chunks, as bytearrays or, when numpy
+is installed, as arrays sharing the memory of the chunks. Many files are
+decoded in parallel by decode_many with a pool of processes.
+"""
+
+import shlex
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from .MpygError import MPygError, MPygFileError, MPygPlayerNotFoundError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# mpg123 output encodings -> (numpy dtype, bytes per sample)
+ENCODINGS = {
+    "s16": ("int16", 2),
+    "u16": ("uint16", 2),
+    "s32": ("int32", 4),
+    "u32": ("uint32", 4),
+    "s8": ("int8", 1),
+    "u8": ("uint8", 1),
+    "f32": ("float32", 4),
+    "f64": ("float64", 8),
+}
+
+
+class PCMDecoder:
+    """Decodes songs to raw PCM samples with mpg123"""
+
+    def __init__(
+        self,
+        player=None,
+        rate=44100,
+        channels=2,
+        encoding="s16",
+        chunk_frames=65536,
+        custom_args="",
+    ):
+        """Samples are resampled to rate and mixed to channels (1 or 2)
+        chunk_frames is the number of sample frames (one sample for each
+        channel) of the chunks, custom_args are added to the mpg123 ones.
+        """
+        if encoding not in ENCODINGS:
+            raise MPygError("Unknown encoding {}".format(encoding))
+        if channels not in (1, 2):
+            raise MPygError("Only 1 or 2 channels can be decoded")
+        self.player = player or "mpg123"
+        self.rate = rate
+        self.channels = channels
+        self.encoding = encoding
+        self.chunk_frames = chunk_frames
+        self.custom_args = custom_args
+        self.errors = {}  # path -> error of the last decode_many
+
+    @property
+    def dtype(self):
+        return ENCODINGS[self.encoding][0]
+
+    @property
+    def frame_size(self):
+        """Bytes of one sample frame"""
+        return ENCODINGS[self.encoding][1] * self.channels
+
+    def command(self, path):
+        """Arguments of the mpg123 process decoding path"""
+        binary = shutil.which(str(self.player))
+        if binary is None:
+            raise MPygPlayerNotFoundError(
+                "No suitable player found: you might need to install mpg123"
+            )
+        return [binary] + shlex.split(self.custom_args) + [
+            "-q",
+            "-s",
+            "-e",
+            self.encoding,
+            "-r",
+            str(self.rate),
+            "--mono" if self.channels == 1 else "--stereo",
+            "--",
+            path,
+        ]
+
+    def iter_chunks(self, path):
+        """Yields the samples of path in bytearrays of chunk_frames frames
+        (the last one may be shorter). Each chunk is a new bytearray that
+        the caller can keep.
+        """
+        process = subprocess.Popen(
+            self.command(path),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        chunk_size = self.chunk_frames * self.frame_size
+        try:
+            while True:
+                chunk = bytearray(chunk_size)
+                view = memoryview(chunk)
+                filled = 0
+                while filled < chunk_size:
+                    read = process.stdout.readinto(view[filled:])
+                    if not read:
+                        break
+                    filled += read
+                view.release()
+                if filled < chunk_size:
+                    # End of the output, cut to whole frames
+                    del chunk[filled - filled % self.frame_size :]
+                    if chunk:
+                        yield chunk
+                    break
+                yield chunk
+            error = process.stderr.read()
+            if process.wait() != 0:
+                message = error.decode("utf-8", "replace").strip()
+                raise MPygFileError(message or "Could not decode {}".format(path))
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+    def iter_arrays(self, path):
+        """Yields the samples of path in numpy arrays of shape (frames, channels)
+        The arrays share the memory of the chunks, nothing is copied.
+        """
+        if numpy is None:
+            raise MPygError("numpy is needed to decode to arrays")
+        for chunk in self.iter_chunks(path):
+            yield numpy.frombuffer(chunk, dtype=self.dtype).reshape(-1, self.channels)
+
+    def decode(self, path):
+        """Returns all the samples of path, in a numpy array of shape
+        (frames, channels), or in a bytearray without numpy
+        """
+        if numpy is None:
+            samples = bytearray()
+            for chunk in self.iter_chunks(path):
+                samples += chunk
+            return samples
+        arrays = list(self.iter_arrays(path))
+        if not arrays:
+            return numpy.empty((0, self.channels), dtype=self.dtype)
+        return numpy.concatenate(arrays)
+
+    def decode_many(self, paths, function=None, workers=None):
+        """Decodes paths in parallel with a pool of workers processes
+        Yields (path, result) in the order of paths, result being
+        function(samples) computed in the worker process (samples as
+        returned by decode), or the samples when function is None.
+        function must be picklable (defined at module level): returning a
+        summary rather than the samples avoids sending them back.
+        Files that fail are skipped and their error stored in errors.
+        """
+        self.errors = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                (path, executor.submit(_decode_job, self, path, function))
+                for path in paths
+            ]
+            for path, future in futures:
+                try:
+                    yield path, future.result()
+                except MPygError as e:
+                    self.errors[path] = e
+
+
+def _decode_job(decoder, path, function):
+    """Job of the decode_many worker processes"""
+    samples = decoder.decode(path)
+    return samples if function is None else function(samples)
@@ -0,0 +1,88 @@
+"""
+Mpyg PersistentCache class
+Small key/value cache kept in memory and optionally persisted to a
+JSON file, so that short-lived processes can share the results of
+expensive probes. Entries are usually keyed by file_identity, which
+changes whenever the file is replaced or modified.
+"""
+
+import json
+import os
+from threading import Lock
+
+
+def file_identity(path):
+    """Returns a key identifying a file: resolved path, size, mtime and inode"""
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    return "{}:{}:{}:{}".format(path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class PersistentCache:
+    """In-memory cache, saved to path after each change when path is set"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._data = None
+        self._lock = Lock()
+
+    def _load(self):
+        """Loads the cache file once, a missing or corrupted file is ignored"""
+        if self._data is None:
+            self._data = {}
+            if self.path:
+                try:
+                    with open(self.path, "r") as f:
+                        self._data = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._data
+
+    def _save(self):
+        """Atomically writes the cache file"""
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+            with open(tmp_path, "w") as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def get(self, key, default=None):
+        """Returns the cached value of key"""
+        with self._lock:
+            return self._load().get(key, default)
+
+    def set(self, key, value):
+        """Caches value for key"""
+        with self._lock:
+            self._load()[key] = value
+            self._save()
+
+    def update(self, values):
+        """Caches several values at once, saving the file only once"""
+        with self._lock:
+            self._load().update(values)
+            self._save()
+
+    def pop(self, key, default=None):
+        """Removes key from the cache"""
+        with self._lock:
+            value = self._load().pop(key, default)
+            self._save()
+            return value
+
+    def clear(self):
+        """Empties the cache"""
+        with self._lock:
+            self._data = {}
+            self._save()
+
+
+# Cache of the "--version" output of the player binaries, shared by all players,
+# keyed by the invoked path and the file_identity of the binary
+version_cache = PersistentCache(os.environ.get("MPYG321_VERSION_CACHE"))
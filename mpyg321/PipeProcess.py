@@ -0,0 +1,117 @@
+"""
+Mpyg PipeProcess class
+Runs the player process with plain subprocess pipes instead of a pexpect
+pseudo terminal: no pty is allocated and pexpect is not even imported,
+which makes short-lived programs start faster. It exposes the part of
+the pexpect.spawn interface the players use (send, sendline,
+read_nonblocking, isalive, terminate, close...), raising the TIMEOUT and
+EOF exceptions of this module from read_nonblocking.
+The player must flush its output after each message, as "mpg123 -R"
+does, since a pipe is not line buffered as a terminal is.
+"""
+
+import os
+import select
+import subprocess
+import time
+
+
+class TIMEOUT(Exception):
+    """No output was read before the timeout"""
+
+
+class EOF(Exception):
+    """The output of the process is closed"""
+
+
+class PipeProcess:
+    """Player process whose input and output are pipes"""
+
+    def __init__(self, args):
+        """args is the command line of the player, as a list"""
+        self._process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        self.pid = self._process.pid
+        self.child_fd = self._process.stdout.fileno()
+        self._stdin_fd = self._process.stdin.fileno()
+        os.set_blocking(self.child_fd, False)
+        self._poll = select.poll()
+        self._poll.register(self.child_fd, select.POLLIN)
+        self.closed = False
+
+    def send(self, data):
+        """Writes str or bytes to the player, returns the number of bytes written"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return os.write(self._stdin_fd, data)
+
+    def sendline(self, line=""):
+        """Writes a line to the player"""
+        data = (line + "\n").encode("utf-8")
+        written = 0
+        while written < len(data):
+            written += os.write(self._stdin_fd, data[written:])
+        return written
+
+    def read_nonblocking(self, size=1, timeout=None):
+        """Reads at most size bytes, waiting up to timeout seconds (None
+        for ever) for some output
+        """
+        try:
+            data = os.read(self.child_fd, size)
+        except BlockingIOError:
+            if timeout == 0:
+                raise TIMEOUT("No output from the player")
+            if not self._poll.poll(None if timeout is None else timeout * 1000):
+                raise TIMEOUT("No output from the player")
+            data = os.read(self.child_fd, size)
+        except OSError:
+            # Closed by close() from another thread
+            data = b""
+        if not data:
+            raise EOF("The player output is closed")
+        return data
+
+    @property
+    def exitstatus(self):
+        """Exit code of the process, None while it runs or if it was killed"""
+        code = self._process.returncode
+        return code if code is not None and code >= 0 else None
+
+    @property
+    def signalstatus(self):
+        """Signal that killed the process, None otherwise"""
+        code = self._process.returncode
+        return -code if code is not None and code < 0 else None
+
+    def isalive(self):
+        return self._process.poll() is None
+
+    def terminate(self, force=False):
+        """Asks the process to exit, kills it with force
+        Returns True once it has exited.
+        """
+        if not self.isalive():
+            return True
+        self._process.terminate()
+        deadline = time.monotonic() + 0.1
+        while self.isalive() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        if force and self.isalive():
+            self._process.kill()
+            self._process.wait()
+        return not self.isalive()
+
+    def close(self, force=True):
+        """Closes the pipes and terminates the process"""
+        if self.closed:
+            return
+        self.closed = True
+        self._process.stdin.close()
+        self.terminate(force)
+        self._process.stdout.close()
@@ -0,0 +1,127 @@
+"""
+Mpyg PlayQueue class
+In-memory list of songs played one after the other by a player.
+The player pulls the next song from the queue on its output reader
+thread as soon as the current one ends, so no user callback sits
+between the end of a song and the LOAD of the next one.
+"""
+
+import random
+from threading import RLock
+
+from .consts import RepeatMode
+
+
+class PlayQueue:
+    """Queue of songs with repeat modes"""
+
+    def __init__(self, songs=None, repeat=RepeatMode.NONE):
+        self.songs = list(songs or [])
+        self.index = -1  # index of the current song, -1 before the first one
+        self.repeat = repeat
+        self._lock = RLock()
+
+    def __len__(self):
+        return len(self.songs)
+
+    @property
+    def current(self):
+        """Path of the current song (the last one once the queue has ended),
+        None if the queue has not started
+        """
+        with self._lock:
+            if 0 <= self.index < len(self.songs):
+                return self.songs[self.index]
+            return None
+
+    def enqueue(self, path):
+        """Adds a song at the end of the queue"""
+        with self._lock:
+            self.songs.append(path)
+
+    def insert(self, position, path):
+        """Inserts a song before position"""
+        with self._lock:
+            if position < 0:
+                position = max(len(self.songs) + position, 0)
+            self.songs.insert(position, path)
+            if position <= self.index:
+                self.index += 1
+
+    def remove(self, position):
+        """Removes the song at position and returns its path"""
+        with self._lock:
+            path = self.songs.pop(position)
+            if position < 0:
+                position += len(self.songs) + 1
+            if position < self.index:
+                self.index -= 1
+            elif position == self.index:
+                # The following song becomes the next one
+                self.index -= 1
+            return path
+
+    def clear(self):
+        """Removes all the songs"""
+        with self._lock:
+            self.songs = []
+            self.index = -1
+
+    def shuffle(self):
+        """Shuffles the songs that have not been played yet"""
+        with self._lock:
+            upcoming = self.songs[self.index + 1 :]
+            random.shuffle(upcoming)
+            self.songs[self.index + 1 :] = upcoming
+
+    def set_repeat(self, repeat):
+        """repeat setter (see RepeatMode)"""
+        self.repeat = repeat
+
+    def peek(self):
+        """Returns the path of the next song without moving to it"""
+        with self._lock:
+            index = self._next_index()
+            return None if index is None else self.songs[index]
+
+    def next_song(self):
+        """Moves to the next song and returns its path, None at the end
+        The queue stays on its last song, so songs enqueued after the end
+        are played next.
+        """
+        with self._lock:
+            index = self._next_index()
+            if index is None:
+                self.index = len(self.songs) - 1
+                return None
+            self.index = index
+            return self.songs[index]
+
+    def _next_index(self):
+        """Index of the next song according to the repeat mode"""
+        if not self.songs:
+            return None
+        if self.repeat == RepeatMode.ONE and 0 <= self.index < len(self.songs):
+            return self.index
+        if self.index + 1 < len(self.songs):
+            return self.index + 1
+        if self.repeat == RepeatMode.ALL:
+            return 0
+        return None
+
+    def to_dict(self):
+        """Returns the queue as a JSON serializable dictionary"""
+        with self._lock:
+            return {
+                "songs": list(self.songs),
+                "index": self.index,
+                "repeat": self.repeat.value,
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a queue from to_dict()"""
+        queue = cls(data.get("songs"), RepeatMode(data.get("repeat", "none")))
+        # Snapshots may have been taken past the end
+        queue.index = min(data.get("index", -1), len(queue.songs) - 1)
+        return queue
@@ -0,0 +1,529 @@
+"""
+Mpyg PlayerFarm class
+Shards players across worker processes, so that parsing their output
+and running their internal callbacks is spread over several cores
+instead of sharing the GIL of one process. Each worker runs its group
+of players on a PlayerManager and shares nothing with the others.
+The farm hands out FarmPlayer proxies: their methods run in the worker
+and return a Future of the result, and the events they subscribe to
+are forwarded over the pipe of the worker and run on the farm receiver
+thread. Only the subscribed events cross the pipe.
+"""
+
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from multiprocessing.connection import wait
+from threading import Condition, Lock, RLock, Thread
+
+from . import EventContext
+from .consts import MPyg321Events
+from .MPyg123Player import MPyg123Player
+from .MpygError import (
+    MPygError,
+    MPygEventListenerError,
+    MPygUnknownEventNameError,
+    MPygWorkerError,
+)
+from .PlayerManager import PlayerManager
+
+# Player methods available on FarmPlayer, any other one goes through call()
+PROXIED_METHODS = (
+    "play_song",
+    "play",
+    "pause",
+    "toggle_pause",
+    "resume",
+    "stop",
+    "quit",
+    "jump",
+    "volume",
+    "mute",
+    "unmute",
+    "toggle_mute",
+    "load_paused",
+    "load_list",
+    "pitch",
+    "eq",
+    "seq",
+    "rva",
+    "scan",
+    "sample",
+    "tag",
+    "state",
+    "enqueue",
+    "play_queue",
+    "set_song",
+    "set_loop",
+    "set_progress_throttle",
+    "set_command_timeout",
+    "set_watchdog",
+    "silence_mpyg_output",
+    "snapshot",
+    "restore",
+)
+
+
+@lru_cache(maxsize=None)
+def _context_fields(context_class):
+    """Slots of an event context class, but its player"""
+    fields = []
+    for cls in reversed(context_class.__mro__):
+        fields.extend(f for f in cls.__dict__.get("__slots__", ()) if f != "player")
+    return tuple(fields)
+
+
+class _Worker:
+    """Runs the players of a worker process and answers the farm
+    Results and events are queued in an outbox, sent by a thread as one
+    list per write: under load, many events share one message.
+    """
+
+    def __init__(self, conn, player_class, player_kwargs):
+        self.conn = conn
+        self.manager = PlayerManager(player_class, **player_kwargs).start()
+        self.players = {}  # player id -> player
+        self._outbox = []
+        self._outbox_ready = Condition()
+        self._closed = False
+        self._sender = Thread(target=self._send_outbox)
+        self._sender.daemon = True
+        self._sender.start()
+
+    def run(self):
+        """Runs the requests of the farm until it closes the worker"""
+        handlers = {
+            "add": self._add,
+            "remove": self._remove,
+            "subscribe": self._subscribe,
+            "calls": self._calls,
+        }
+        try:
+            while True:
+                try:
+                    message = self.conn.recv()
+                except EOFError:
+                    break
+                if message[0] == "close":
+                    break
+                handlers[message[0]](*message[1:])
+        finally:
+            self.manager.close()
+            with self._outbox_ready:
+                self._closed = True
+                self._outbox_ready.notify()
+            self._sender.join()
+            self.conn.close()
+
+    def send(self, message):
+        """Queues a message to the farm"""
+        with self._outbox_ready:
+            self._outbox.append(message)
+            if len(self._outbox) == 1:
+                self._outbox_ready.notify()
+
+    def _send_outbox(self):
+        """Sends the queued messages until the worker is closed"""
+        while True:
+            with self._outbox_ready:
+                while not self._outbox and not self._closed:
+                    self._outbox_ready.wait()
+                messages, self._outbox = self._outbox, []
+            if not messages:
+                return
+            try:
+                self.conn.send(messages)
+            except OSError:
+                # The farm is gone
+                return
+            except Exception:
+                # A result or an error that cannot be pickled
+                for message in messages:
+                    self._send_one(message)
+
+    def _send_one(self, message):
+        try:
+            self.conn.send([message])
+        except OSError:
+            pass
+        except Exception as e:
+            if message[0] == "result":
+                error = MPygError("{}: {}".format(type(e).__name__, e))
+                self.conn.send([("result", message[1], False, error)])
+
+    def _reply(self, call_id, ok, value):
+        self.send(("result", call_id, ok, value))
+
+    def _add(self, player_id, call_id, player_kwargs):
+        try:
+            self.players[player_id] = self.manager.add_player(**player_kwargs)
+        except Exception as e:
+            self._reply(call_id, False, e)
+            return
+        self._reply(call_id, True, None)
+
+    def _remove(self, player_id, quit):
+        player = self.players.pop(player_id, None)
+        if player is not None:
+            self.manager.remove_player(player, quit)
+
+    def _subscribe(self, player_id, event_value):
+        event = MPyg321Events(event_value)
+        player = self.players.get(player_id)
+        if player is not None:
+            player.subscribe_event(event, partial(self._forward, player_id, event))
+
+    def _forward(self, player_id, event, context):
+        """Sends an event with the fields of its context to the farm"""
+        cls = context.__class__
+        values = tuple(getattr(context, f) for f in _context_fields(cls))
+        self.send(("event", player_id, event.value, cls.__name__, values))
+
+    def _calls(self, calls):
+        """Runs (player id, call id, method, args, kwargs) calls
+        Consecutive calls to the same player are sent in one batch().
+        """
+        for player_id, group in itertools.groupby(calls, key=lambda c: c[0]):
+            group = list(group)
+            player = self.players.get(player_id)
+            if player is None:
+                for call in group:
+                    error = MPygError("No player {} in this worker".format(player_id))
+                    self._reply(call[1], False, error)
+                continue
+            if len(group) == 1:
+                self._call(player, *group[0][1:])
+                continue
+            with player.batch():
+                for call in group:
+                    self._call(player, *call[1:])
+
+    def _call(self, player, call_id, method, args, kwargs):
+        """Runs a call, a method None reads the attribute args[0]"""
+        try:
+            if method is None:
+                result = getattr(player, args[0])
+            else:
+                result = getattr(player, method)(*args, **kwargs)
+        except Exception as e:
+            self._reply(call_id, False, e)
+            return
+        if isinstance(result, Future):
+            result.add_done_callback(partial(self._on_done, call_id))
+        else:
+            self._reply(call_id, True, result)
+
+    def _on_done(self, call_id, future):
+        if future.cancelled():
+            self._reply(call_id, False, MPygError("Command cancelled"))
+        elif future.exception() is not None:
+            self._reply(call_id, False, future.exception())
+        else:
+            self._reply(call_id, True, future.result())
+
+
+def _run_worker(conn, player_class, player_kwargs):
+    """Entry point of the worker processes"""
+    _Worker(conn, player_class, player_kwargs).run()
+
+
+class FarmPlayer:
+    """Proxy of a player running in a worker of a PlayerFarm
+    Its methods run in the worker and return a Future of their result.
+    """
+
+    def __init__(self, farm, worker, player_id, ready):
+        self.farm = farm
+        self.worker = worker  # index of the worker process running the player
+        self.id = player_id
+        self.ready = ready  # Future resolved once the player is started
+        self._events = {e: [] for e in MPyg321Events}
+        self._batch = None  # (calls, futures) buffered by batch()
+        self._batch_lock = RLock()
+
+    def call(self, method, *args, **kwargs):
+        """Calls a method of the player, returns a Future of its result
+        The Future of a method returning a Future gets its result.
+        """
+        return self._call(method, args, kwargs)
+
+    def get(self, attribute):
+        """Returns a Future of an attribute of the player (status, position...)"""
+        return self._call(None, (attribute,), {})
+
+    def _call(self, method, args, kwargs):
+        call_id, future = self.farm._new_call(self.worker)
+        call = (self.id, call_id, method, args, kwargs)
+        with self._batch_lock:
+            if self._batch is None:
+                self.farm._submit(self.worker, ("calls", [call]), [call_id])
+            else:
+                self._batch[0].append(call)
+                self._batch[1].append(future)
+        return future
+
+    @contextmanager
+    def batch(self):
+        """Sends the calls of the with block to the worker in one message
+        They run inside player.batch(), see BasePlayer.batch. Yields the
+        list of their futures.
+        """
+        with self._batch_lock:
+            if self._batch is not None:
+                yield self._batch[1]
+                return
+            self._batch = ([], [])
+            try:
+                yield self._batch[1]
+            finally:
+                calls, _ = self._batch
+                self._batch = None
+                if calls:
+                    call_ids = [call[1] for call in calls]
+                    self.farm._submit(self.worker, ("calls", calls), call_ids)
+
+    def on(self, event_name):
+        """Decorator to register event callbacks."""
+
+        def decorator(func):
+            self.subscribe_event(event_name, func)
+            return func
+
+        return decorator
+
+    def subscribe_event(self, event_name, callback):
+        """Registers a callback, the worker forwards the event from then on"""
+        if event_name not in self._events:
+            raise MPygUnknownEventNameError(
+                f"Subscribed callback to a non existing event {event_name}."
+            )
+        callbacks = self._events[event_name]
+        callbacks.append(callback)
+        if len(callbacks) == 1:
+            self.farm._submit(self.worker, ("subscribe", self.id, event_name.value))
+
+
+def _proxy_method(name):
+    def method(self, *args, **kwargs):
+        return self._call(name, args, kwargs)
+
+    method.__name__ = name
+    method.__doc__ = "Calls {}() in the worker, returns a Future".format(name)
+    return method
+
+
+for _name in PROXIED_METHODS:
+    setattr(FarmPlayer, _name, _proxy_method(_name))
+
+
+class PlayerFarm:
+    """Players sharded across worker processes"""
+
+    join_timeout = 5.0  # seconds to wait for a worker to quit its players
+
+    def __init__(
+        self,
+        workers=None,
+        player_class=MPyg123Player,
+        start_method=None,
+        **player_kwargs,
+    ):
+        """Starts workers processes (one per CPU by default), running players
+        of player_class built with player_kwargs
+        start_method is the multiprocessing one ("fork", "spawn"...), the
+        platform default when None.
+        """
+        context = multiprocessing.get_context(start_method)
+        self.players = []
+        self.dispatcher = None  # EventDispatcher running the callbacks
+        self.errors = 0  # callbacks that raised, when run inline
+        self.last_error = None
+        self._proxies = {}  # player id -> FarmPlayer
+        self._calls = {}  # call id -> (Future, worker)
+        self._ids = itertools.count()
+        self._lock = Lock()
+        self._conns = []
+        self._processes = []
+        self._send_locks = []
+        self._loads = []  # number of players of each worker
+        for _ in range(workers or os.cpu_count() or 1):
+            conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_run_worker,
+                args=(child_conn, player_class, player_kwargs),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._conns.append(conn)
+            self._processes.append(process)
+            self._send_locks.append(Lock())
+            self._loads.append(0)
+        self._receiver = Thread(target=self._receive)
+        self._receiver.daemon = True
+        self._receiver.start()
+
+    def __len__(self):
+        return len(self.players)
+
+    def __iter__(self):
+        return iter(list(self.players))
+
+    def add_player(self, worker=None, **player_kwargs):
+        """Starts a player on a worker, the least loaded one by default
+        player_kwargs override the ones of the farm. Returns its FarmPlayer,
+        whose ready future fails when the player cannot be started.
+        """
+        with self._lock:
+            if worker is None:
+                worker = min(range(len(self._loads)), key=self._loads.__getitem__)
+            player_id = next(self._ids)
+        call_id, ready = self._new_call(worker)
+        proxy = FarmPlayer(self, worker, player_id, ready)
+        with self._lock:
+            self.players.append(proxy)
+            self._proxies[player_id] = proxy
+            self._loads[worker] += 1
+        self._submit(worker, ("add", player_id, call_id, player_kwargs), [call_id])
+        return proxy
+
+    def remove_player(self, proxy, quit=True):
+        """Stops a player, quitting it by default"""
+        with self._lock:
+            if self._proxies.pop(proxy.id, None) is None:
+                return
+            self.players.remove(proxy)
+            self._loads[proxy.worker] -= 1
+        self._submit(proxy.worker, ("remove", proxy.id, quit))
+
+    def call_all(self, method, *args, **kwargs):
+        """Calls a method of all the players, with one message per worker
+        Returns the list of the futures, in the order of players.
+        """
+        calls = [[] for _ in self._conns]
+        futures = []
+        for proxy in self:
+            call_id, future = self._new_call(proxy.worker)
+            calls[proxy.worker].append((proxy.id, call_id, method, args, kwargs))
+            futures.append(future)
+        for worker, worker_calls in enumerate(calls):
+            if worker_calls:
+                call_ids = [call[1] for call in worker_calls]
+                self._submit(worker, ("calls", worker_calls), call_ids)
+        return futures
+
+    def set_event_dispatcher(self, dispatcher):
+        """Runs the event callbacks through an EventDispatcher
+        By default (dispatcher=None) they run on the farm receiver thread.
+        """
+        self.dispatcher = dispatcher
+
+    def _new_call(self, worker):
+        """Registers the Future of a call to a worker"""
+        future = Future()
+        with self._lock:
+            call_id = next(self._ids)
+            self._calls[call_id] = (future, worker)
+        return call_id, future
+
+    def _submit(self, worker, message, call_ids=()):
+        """Sends a message to a worker, failing its calls if it cannot be sent"""
+        try:
+            with self._send_locks[worker]:
+                self._conns[worker].send(message)
+        except (OSError, ValueError):
+            error = MPygWorkerError("Worker {} exited".format(worker))
+            self._fail_calls(call_ids, error)
+        except Exception as e:
+            # Arguments that cannot be pickled
+            self._fail_calls(call_ids, e)
+
+    def _fail_calls(self, call_ids, error):
+        with self._lock:
+            futures = [self._calls.pop(i, (None, None))[0] for i in call_ids]
+        for future in futures:
+            if future is not None:
+                future.set_exception(error)
+
+    def _receive(self):
+        """Reads the results and events of the workers until they exit"""
+        conns = {conn: worker for worker, conn in enumerate(self._conns)}
+        while conns:
+            for conn in wait(list(conns)):
+                try:
+                    messages = conn.recv()
+                except (EOFError, OSError):
+                    self._on_worker_exit(conns.pop(conn))
+                    continue
+                for message in messages:
+                    if message[0] == "result":
+                        self._on_result(*message[1:])
+                    else:
+                        self._on_event(*message[1:])
+
+    def _on_result(self, call_id, ok, value):
+        with self._lock:
+            future, _ = self._calls.pop(call_id, (None, None))
+        if future is None:
+            return
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    def _on_event(self, player_id, event_value, context_name, values):
+        """Rebuilds the context of a forwarded event and runs its callbacks"""
+        proxy = self._proxies.get(player_id)
+        if proxy is None:
+            return
+        event = MPyg321Events(event_value)
+        callbacks = proxy._events[event]
+        if not callbacks:
+            return
+        cls = getattr(EventContext, context_name)
+        context = cls.__new__(cls)
+        context.player = proxy
+        for field, value in zip(_context_fields(cls), values):
+            setattr(context, field, value)
+        if self.dispatcher is not None:
+            self.dispatcher.submit((player_id, event), list(callbacks), context)
+            return
+        for callback in callbacks:
+            try:
+                callback(context)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = MPygEventListenerError(
+                    "Error while executing event callback: {}".format(e)
+                )
+
+    def _on_worker_exit(self, worker):
+        """Fails the calls waiting for an exited worker"""
+        with self._lock:
+            call_ids = [i for i, (_, w) in self._calls.items() if w == worker]
+        self._fail_calls(call_ids, MPygWorkerError("Worker {} exited".format(worker)))
+
+    def close(self):
+        """Quits all the players and stops the workers"""
+        for worker in range(len(self._conns)):
+            self._submit(worker, ("close",))
+        for process in self._processes:
+            process.join(self.join_timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._receiver.join()
+        for conn in self._conns:
+            conn.close()
+        with self._lock:
+            self.players = []
+            self._proxies = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,191 @@
+"""
+Mpyg PlayerManager class
+Owns many players and reads the output of all their processes from a
+single selectors loop running in one thread, instead of one reader
+thread per player. The parsed messages are routed to the player they
+come from, so events and callbacks behave as with standalone players
+(the callbacks run on the manager thread).
+It also provides bulk operations over all the managed players.
+"""
+
+import os
+import selectors
+import time
+from threading import Lock, Thread
+
+from .consts import PlayerStatus
+from .MPyg123Player import MPyg123Player
+
+
+class PlayerManager:
+    """Multiplexes the output of many players on one selector"""
+
+    timeout_check = 1.0  # max seconds between two checks of the command timeouts
+
+    def __init__(self, player_class=MPyg123Player, **player_kwargs):
+        """Players are built as player_class(threaded=False, **player_kwargs)"""
+        self.player_class = player_class
+        self.player_kwargs = player_kwargs
+        self.players = []
+        self._fds = {}  # player -> registered output fd
+        self._selector = selectors.DefaultSelector()
+        self._lock = Lock()
+        self._running = False
+        self._thread = None
+        # Self pipe waking the loop up when players are added or removed
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+    def __len__(self):
+        return len(self.players)
+
+    def __iter__(self):
+        return iter(list(self.players))
+
+    def add_player(self, **player_kwargs):
+        """Builds a player without reader thread and manages it"""
+        kwargs = dict(self.player_kwargs, **player_kwargs)
+        player = self.player_class(threaded=False, **kwargs)
+        with self._lock:
+            self.players.append(player)
+            self._register(player)
+        self._wakeup()
+        return player
+
+    def remove_player(self, player, quit=True):
+        """Stops managing a player, quitting it by default"""
+        with self._lock:
+            if player not in self.players:
+                return
+            self.players.remove(player)
+            self._unregister(player)
+        self._wakeup()
+        if quit and player.player.isalive():
+            player.quit()
+
+    def _register(self, player):
+        fd = player.player.child_fd
+        self._selector.register(fd, selectors.EVENT_READ, player)
+        self._fds[player] = fd
+
+    def _unregister(self, player):
+        fd = self._fds.pop(player, None)
+        if fd is not None:
+            self._selector.unregister(fd)
+
+    def _wakeup(self):
+        os.write(self._wakeup_w, b"\0")
+
+    def start(self):
+        """Runs the loop in a background thread"""
+        self._thread = Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def run(self):
+        """Reads the output of the players until close() is called"""
+        self._running = True
+        next_check = 0.0
+        while self._running:
+            timeout = max(next_check - time.perf_counter(), 0.0)
+            for key, _ in self._selector.select(timeout):
+                player = key.data
+                if player is None:
+                    os.read(self._wakeup_r, 4096)
+                    continue
+                try:
+                    data = player.player.read_nonblocking(player.read_size, timeout=0)
+                except player._timeout_error:
+                    continue
+                except player._eof_error:
+                    self._on_player_exit(player)
+                    continue
+                player.feed_output(data)
+            now = time.perf_counter()
+            if now >= next_check:
+                next_check = now + self._expire_commands()
+
+    def _expire_commands(self):
+        """Fails the commands not acknowledged within the command_timeout of
+        their player, returns the seconds before the next check
+        """
+        interval = self.timeout_check
+        with self._lock:
+            players = list(self.players)
+        for player in players:
+            if player.command_timeout is not None:
+                interval = min(interval, player.command_timeout)
+                if player._pending_commands:
+                    player._expire_commands()
+        return interval
+
+    def _on_player_exit(self, player):
+        """Follows a player whose process has exited to its respawned process"""
+        with self._lock:
+            if player not in self.players:
+                return
+            self._unregister(player)
+        respawned = player.on_player_exit_int()
+        with self._lock:
+            if player not in self.players:
+                # Removed while respawning
+                if respawned:
+                    player.quit()
+                return
+            if respawned:
+                self._register(player)
+            else:
+                self.players.remove(player)
+
+    def close(self):
+        """Quits all the players and stops the loop"""
+        self.quit_all()
+        self._running = False
+        self._wakeup()
+        if self._thread is not None:
+            self._thread.join()
+        self._selector.close()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # # # Bulk operations # # #
+    def where(self, predicate):
+        """Returns the players for which predicate(player) is true"""
+        return [p for p in self if predicate(p)]
+
+    def pause_all(self):
+        """Pauses all the playing players"""
+        for player in self:
+            player.pause()
+
+    def resume_all(self):
+        """Resumes all the paused players"""
+        for player in self:
+            player.resume()
+
+    def stop_all(self):
+        """Stops all the players"""
+        self.stop_where(lambda p: True)
+
+    def stop_where(self, predicate):
+        """Stops the playing or paused players for which predicate(player) is true"""
+        for player in self.where(predicate):
+            if player.requested_status in (PlayerStatus.PLAYING, PlayerStatus.PAUSED):
+                player.stop()
+
+    def volume_all(self, percent):
+        """Sets the volume of all the players"""
+        for player in self:
+            player.volume(percent)
+
+    def quit_all(self):
+        """Quits all the players"""
+        for player in self:
+            self.remove_player(player)
@@ -0,0 +1,138 @@
+"""
+Mpyg PlayerPool class
+Keeps pre-spawned, silenced players ready to be handed out, so that
+playing a song does not wait for the player process to be launched,
+checked and to open the audio device.
+Players that have quit or crashed are recycled and replaced in the
+background.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition, Thread
+
+from .consts import PlayerStatus
+from .MPyg123Player import MPyg123Player
+from .MpygError import MPygError
+
+
+class PlayerPool:
+    """Pool of pre-warmed players"""
+
+    stop_timeout = 1.0  # seconds to wait for a released player to stop
+
+    def __init__(self, size=4, player_class=MPyg123Player, **player_kwargs):
+        """Spawns size players of player_class, built with player_kwargs"""
+        self.size = size
+        self.player_class = player_class
+        self.player_kwargs = player_kwargs
+        self._idle = deque()
+        self._condition = Condition()
+        self._closed = False
+        for _ in range(size):
+            self._idle.append(self._spawn())
+        self._refiller = Thread(target=self._refill)
+        self._refiller.daemon = True
+        self._refiller.start()
+
+    def _spawn(self):
+        """Builds a new player"""
+        return self.player_class(**self.player_kwargs)
+
+    def _refill(self):
+        """Keeps size idle players in the pool"""
+        while True:
+            with self._condition:
+                while not self._closed and len(self._idle) >= self.size:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            player = self._spawn()
+            with self._condition:
+                if self._closed:
+                    player.quit()
+                    return
+                self._idle.append(player)
+                self._condition.notify_all()
+
+    @staticmethod
+    def is_healthy(player):
+        """Whether the player process and its output reader are still running"""
+        return (
+            player.status != PlayerStatus.QUITTED
+            and player.player.isalive()
+            and (player.output_processor is None or player.output_processor.is_alive())
+        )
+
+    def acquire(self):
+        """Hands out a running player, spawning one if the pool is empty"""
+        with self._condition:
+            if self._closed:
+                raise MPygError("The player pool is closed")
+            player = None
+            while self._idle:
+                candidate = self._idle.popleft()
+                if self.is_healthy(candidate):
+                    player = candidate
+                    break
+                self._discard(candidate)
+            self._condition.notify_all()
+        if player is None:
+            player = self._spawn()
+        return player
+
+    def release(self, player):
+        """Takes a player back, it is stopped and reset (see BasePlayer.reset)
+        Players that cannot be reset are quit.
+        """
+        reset = self.is_healthy(player) and player.reset(self.stop_timeout)
+        with self._condition:
+            if self._closed or not reset or len(self._idle) >= self.size:
+                self._discard(player)
+            else:
+                self._idle.append(player)
+            self._condition.notify_all()
+
+    @contextmanager
+    def player(self):
+        """Context manager acquiring a player and releasing it on exit"""
+        player = self.acquire()
+        try:
+            yield player
+        finally:
+            self.release(player)
+
+    def recycle(self):
+        """Replaces the idle players that have quit or crashed"""
+        with self._condition:
+            healthy = [p for p in self._idle if self.is_healthy(p)]
+            for player in self._idle:
+                if player not in healthy:
+                    self._discard(player)
+            self._idle = deque(healthy)
+            self._condition.notify_all()
+
+    def close(self):
+        """Quits all the idle players"""
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.popleft())
+            self._condition.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _discard(self, player):
+        """Quits a player, killing its process if it no longer reads commands"""
+        if not player.player.isalive():
+            return
+        if player.output_processor is None or player.output_processor.is_alive():
+            player.quit()
+        else:
+            # Not a crash, the watchdog must not respawn it
+            player.status = PlayerStatus.QUITTED
+            player.player.terminate(force=True)
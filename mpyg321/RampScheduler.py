@@ -0,0 +1,228 @@
+"""
+Mpyg RampScheduler class
+Runs the volume ramps (fades) of any number of players, and timed
+actions, on a single timer thread, instead of a sleep loop per fade.
+Each ramp is evaluated every interval seconds, but a VOLUME command is
+only sent once the volume has moved by min_step_db from the last one
+sent, the smallest change the ear notices, so a fade costs a few dozen
+writes whatever its length. The lateness of the timer wakeups is
+recorded in the jitter histogram (ms).
+"""
+
+import heapq
+import itertools
+import math
+import time
+from concurrent.futures import Future
+from threading import Condition, Lock, Thread
+
+from .Metrics import Histogram
+from .MpygError import MPygError
+
+
+def _decibels(percent):
+    """Level of a volume in dB, floored at -60 dB"""
+    return 20 * math.log10(max(percent, 0.1) / 100)
+
+
+class Ramp:
+    """Volume ramp of a player"""
+
+    def __init__(self, player, start, end, started, duration, curve, future):
+        self.player = player
+        self.start = start
+        self.end = end
+        self.started = started  # perf_counter time of the start of the ramp
+        self.duration = duration
+        self.curve = curve  # "linear" or "equal_power"
+        self.future = future  # resolved once the end volume is sent
+        self.sent = start  # last volume sent
+        self.cancelled = False
+
+    def volume_at(self, now):
+        """Volume of the ramp at a perf_counter time"""
+        t = min(max((now - self.started) / self.duration, 0.0), 1.0)
+        if self.curve == "equal_power":
+            angle = t * math.pi / 2
+            return self.start * math.cos(angle) + self.end * math.sin(angle)
+        return self.start + (self.end - self.start) * t
+
+
+class RampScheduler:
+    """Single timer thread running volume ramps and timed actions"""
+
+    min_step_db = 0.5  # smallest volume change sent to a player
+    interval = 0.01  # seconds between two evaluations of a ramp
+
+    def __init__(self, min_step_db=None, interval=None):
+        if min_step_db is not None:
+            self.min_step_db = min_step_db
+        if interval is not None:
+            self.interval = interval
+        self.jitter = Histogram()  # lateness of the timer wakeups (ms)
+        self.sent = 0  # volume commands sent
+        self.coalesced = 0  # evaluations without audible change, not sent
+        self._ramps = {}  # player -> running Ramp
+        self._heap = []  # (perf_counter time, order, function)
+        self._order = itertools.count()
+        self._condition = Condition()
+        self._closed = False
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def call_at(self, when, function):
+        """Calls function() on the timer thread at a perf_counter time"""
+        with self._condition:
+            if self._closed:
+                raise MPygError("The ramp scheduler is closed")
+            heapq.heappush(self._heap, (when, next(self._order), function))
+            self._condition.notify()
+
+    def call_later(self, delay, function):
+        """Calls function() on the timer thread in delay seconds"""
+        self.call_at(time.perf_counter() + delay, function)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._heap:
+                        timeout = self._heap[0][0] - time.perf_counter()
+                        if timeout <= 0:
+                            break
+                        self._condition.wait(timeout)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+                when, _, function = heapq.heappop(self._heap)
+            self.jitter.observe((time.perf_counter() - when) * 1000)
+            try:
+                function()
+            except Exception:
+                # A failing action must not stop the other ramps
+                pass
+
+    def ramp(self, player, to, duration, start=None, curve="linear"):
+        """Ramps the volume of player to to (percent) over duration seconds
+        from start (its current volume by default). It replaces the ramp
+        running on the player. Returns a future resolved once the last
+        volume is sent.
+        """
+        if start is None:
+            start = 100 if player._volume is None else player._volume
+        future = Future()
+        now = time.perf_counter()
+        ramp = Ramp(player, start, to, now, max(duration, 1e-9), curve, future)
+        with self._condition:
+            previous = self._ramps.get(player)
+            self._ramps[player] = ramp
+        if previous is not None:
+            previous.cancelled = True
+            previous.future.cancel()
+        if start != player._volume:
+            self._send(ramp, start)
+        when = now + self.interval
+        self.call_at(when, lambda: self._step(ramp, when))
+        return future
+
+    def _step(self, ramp, when):
+        """Evaluates a ramp, sending its volume when the change is audible"""
+        if ramp.cancelled:
+            return
+        if when - ramp.started >= ramp.duration:
+            if ramp.sent != ramp.end:
+                self._send(ramp, ramp.end)
+            with self._condition:
+                if self._ramps.get(ramp.player) is ramp:
+                    del self._ramps[ramp.player]
+            ramp.future.set_result(None)
+            return
+        volume = ramp.volume_at(time.perf_counter())
+        if abs(_decibels(volume) - _decibels(ramp.sent)) >= self.min_step_db:
+            self._send(ramp, volume)
+        else:
+            self.coalesced += 1
+        # Scheduled from the previous deadline so that the ramp does not drift
+        when = min(when + self.interval, ramp.started + ramp.duration)
+        self.call_at(when, lambda: self._step(ramp, when))
+
+    def _send(self, ramp, volume):
+        ramp.sent = volume
+        self.sent += 1
+        ramp.player.volume(round(volume, 2))
+
+    def cancel(self, player):
+        """Stops the ramp of player where it is"""
+        with self._condition:
+            ramp = self._ramps.pop(player, None)
+        if ramp is not None:
+            ramp.cancelled = True
+            ramp.future.cancel()
+
+    def crossfade(self, outgoing, incoming, duration, volume=None, path=None):
+        """Fades outgoing out and incoming in with equal power curves
+        incoming starts at volume 0 and ends at volume (the one of outgoing
+        by default). With path, incoming plays it, sent in the same write
+        as its first volume. outgoing is stopped at the end of the fade
+        and set back to its volume. Returns a future resolved once it is
+        stopped.
+        """
+        if volume is None:
+            volume = 100 if outgoing._volume is None else outgoing._volume
+        outgoing_volume = 100 if outgoing._volume is None else outgoing._volume
+        if path is None:
+            fade_in = self.ramp(incoming, volume, duration, 0, "equal_power")
+        else:
+            with incoming.batch():
+                fade_in = self.ramp(incoming, volume, duration, 0, "equal_power")
+                incoming.play_song(path)
+        fade_out = self.ramp(outgoing, 0, duration, outgoing_volume, "equal_power")
+        future = Future()
+        lock = Lock()
+        finished = []
+
+        def done(_):
+            with lock:
+                if finished or not (fade_in.done() and fade_out.done()):
+                    return
+                finished.append(True)
+            if fade_in.cancelled() or fade_out.cancelled():
+                future.cancel()
+                return
+            with outgoing.batch():
+                stopped = outgoing.stop()
+                outgoing.volume(outgoing_volume)
+            # Resolved once outgoing is stopped, it can then load another song
+            stopped.add_done_callback(lambda _: future.set_result(None))
+
+        fade_in.add_done_callback(done)
+        fade_out.add_done_callback(done)
+        return future
+
+    def stats(self):
+        """Returns the counters and the jitter histogram of the scheduler"""
+        return {
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "jitter": self.jitter.snapshot(),
+        }
+
+    def close(self):
+        """Stops the timer thread, the running ramps stay where they are"""
+        with self._condition:
+            self._closed = True
+            self._heap = []
+            ramps, self._ramps = self._ramps, {}
+            self._condition.notify()
+        for ramp in ramps.values():
+            ramp.cancelled = True
+            ramp.future.cancel()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
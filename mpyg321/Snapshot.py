@@ -0,0 +1,59 @@
+"""
+Mpyg snapshot functions
+Save the state of a fleet of named players (song, frame, volume, mute
+state and queue, see BasePlayer.snapshot) to a compact JSON file, and
+restore it on startup: the commands of all the players are sent at once
+and their acknowledgements awaited together, so the whole fleet resumes
+within a single bounded timeout instead of player after player.
+"""
+
+import json
+import os
+from concurrent.futures import wait
+
+from .MpygError import MPygCommandTimeoutError
+
+
+def save_snapshot(path, players):
+    """Atomically writes the snapshot of players ({name: player}) to path"""
+    data = {name: player.snapshot() for name, player in players.items()}
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """Returns the {name: state} saved by save_snapshot, {} if path is missing"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def restore_snapshot(path, players, timeout=None):
+    """Restores players ({name: player}) concurrently from the file at path
+    Players missing from the snapshot are left untouched.
+    Returns {name: error}: None when the player resumed, the player error,
+    or MPygCommandTimeoutError when it did not resume within timeout seconds.
+    """
+    states = load_snapshot(path)
+    futures = {}
+    results = {}
+    for name, player in players.items():
+        if name not in states:
+            continue
+        try:
+            futures[name] = player.restore(states[name])
+        except Exception as e:
+            results[name] = e
+    wait(futures.values(), timeout)
+    for name, future in futures.items():
+        if not future.done():
+            results[name] = MPygCommandTimeoutError(
+                "{} not restored after {}s".format(name, timeout)
+            )
+        else:
+            results[name] = future.exception()
+    return results
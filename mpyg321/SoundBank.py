@@ -0,0 +1,135 @@
+"""
+Mpyg SoundBank class
+Low latency playback of short clips (UI and notification sounds).
+Every registered clip is preloaded, paused, into one or more players
+(the voices), so triggering it is a single PAUSE command instead of a
+LOAD opening and decoding the file. Several clips can play at once, up
+to the number of voices: when they are all busy, the voice that started
+first is stolen.
+"""
+
+import time
+from threading import Lock
+
+from .consts import MPyg321Events
+from .MPyg123Player import MPyg123Player
+from .MpygError import MPygError
+
+
+class Voice:
+    """Player of a SoundBank, with the clip it is preloaded with"""
+
+    def __init__(self, player, clip):
+        self.player = player
+        self.clip = clip  # clip reloaded, paused, after each playback
+        self.playing = None  # clip being played, None when idle
+        self.armed = False  # clip loaded and paused, ready to be resumed
+        self.started = 0.0
+
+
+class SoundBank:
+    """Pool of players with preloaded clips"""
+
+    def __init__(self, max_voices=8, player_class=MPyg123Player, **player_kwargs):
+        """Voices are built as player_class(**player_kwargs), which must
+        support load_paused (MPyg123Player)
+        """
+        self.max_voices = max_voices
+        self.player_class = player_class
+        self.player_kwargs = player_kwargs
+        self.clips = {}  # name -> path
+        self.voices = []
+        self.stolen = 0  # number of voices stolen so far
+        self._lock = Lock()
+
+    def register(self, name, path, voices=1):
+        """Registers a clip, preloaded in voices players (its polyphony)
+        Returns the futures of the preloads.
+        """
+        if len(self.voices) + voices > self.max_voices:
+            raise MPygError(
+                "A sound bank holds at most {} voices".format(self.max_voices)
+            )
+        self.clips[name] = path
+        futures = []
+        for _ in range(voices):
+            voice = Voice(self.player_class(**self.player_kwargs), name)
+            voice.player.subscribe_event(
+                MPyg321Events.MUSIC_END, lambda context, voice=voice: self._arm(voice)
+            )
+            with self._lock:
+                self.voices.append(voice)
+            futures.append(self._arm(voice))
+        return futures
+
+    def _arm(self, voice):
+        """Preloads the clip of an idle voice"""
+        with self._lock:
+            voice.playing = None
+            voice.armed = False
+        future = voice.player.load_paused(self.clips[voice.clip])
+        future.add_done_callback(lambda f: self._on_armed(voice, f))
+        return future
+
+    def _on_armed(self, voice, future):
+        if future.exception() is None:
+            with self._lock:
+                if voice.playing is None:
+                    voice.armed = True
+
+    def trigger(self, name):
+        """Plays a clip, returns the future of the command starting it
+        An idle voice preloaded with the clip starts it with one PAUSE.
+        Otherwise another idle voice loads it, or the voice playing for
+        the longest time is stolen (restarted with JUMP 0 when it plays
+        the same clip).
+        """
+        path = self.clips[name]
+        with self._lock:
+            voice = self._pick(name)
+            if voice is None:
+                raise MPygError("The sound bank has no voice")
+            previous, armed = voice.playing, voice.armed
+            voice.playing = name
+            voice.armed = False
+            voice.started = time.monotonic()
+        if previous is None and armed and voice.clip == name:
+            return voice.player.resume()
+        if previous == name:
+            return voice.player.jump(0)
+        return voice.player.play_song(path)
+
+    def _pick(self, name):
+        """Voice playing name next, the lock being held"""
+        idle = [v for v in self.voices if v.playing is None]
+        for voice in idle:
+            if voice.armed and voice.clip == name:
+                return voice
+        if idle:
+            # Prefer voices preloaded with another clip than the ones loading
+            idle.sort(key=lambda v: not v.armed)
+            return idle[0]
+        if not self.voices:
+            return None
+        self.stolen += 1
+        return min(self.voices, key=lambda v: v.started)
+
+    def stop_all(self):
+        """Stops the clips being played, the voices are preloaded again"""
+        with self._lock:
+            playing = [v for v in self.voices if v.playing is not None]
+        for voice in playing:
+            voice.player.stop().add_done_callback(lambda f, v=voice: self._arm(v))
+
+    def close(self):
+        """Quits all the players"""
+        with self._lock:
+            voices, self.voices = self.voices, []
+        for voice in voices:
+            voice.player.quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
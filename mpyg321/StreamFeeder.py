@@ -0,0 +1,115 @@
+"""
+Mpyg StreamFeeder class
+Feeds in-memory MP3 data to a player through a named pipe (FIFO): the
+player LOADs the pipe path as any file, and a writer thread copies the
+data into it. Chunks are written from memoryviews (bytes sources) or read
+into a single preallocated buffer (file objects), without copies.
+Writes block while the pipe is full, so the source is only consumed as
+fast as the player decodes it.
+"""
+
+import errno
+import os
+import shutil
+import tempfile
+import time
+from threading import Event, Thread
+
+from .MpygError import MPygError
+
+
+class StreamFeeder:
+    """Writes a source of MP3 data into a named pipe"""
+
+    open_timeout = 5.0  # seconds to wait for the player to open the pipe
+
+    def __init__(self, source, chunk_size=65536):
+        """source is bytes-like, a file object or an iterable of bytes-like chunks"""
+        if not hasattr(os, "mkfifo"):
+            raise MPygError("Streaming needs named pipes, not supported here")
+        self.source = source
+        self.chunk_size = chunk_size
+        self.bytes_written = 0
+        self.error = None  # OSError raised while writing, if any
+        self._cancelled = Event()
+        self._directory = tempfile.mkdtemp(prefix="mpyg321-")
+        self.path = os.path.join(self._directory, "stream")
+        os.mkfifo(self.path)
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+
+    def start(self):
+        """Starts the writer thread"""
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        """Stops feeding at the next chunk, or while waiting for the player"""
+        self._cancelled.set()
+
+    @property
+    def done(self):
+        return not self.thread.is_alive()
+
+    def _run(self):
+        try:
+            fd = self._open()
+            if fd is None:
+                return
+            try:
+                self._write_source(fd)
+            finally:
+                os.close(fd)
+        except BrokenPipeError:
+            # The player closed the pipe: song stopped or replaced
+            pass
+        except OSError as e:
+            self.error = e
+        finally:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _open(self):
+        """Opens the pipe once the player has opened it, None on cancel/timeout"""
+        deadline = time.monotonic() + self.open_timeout
+        while not self._cancelled.is_set():
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            except OSError as e:
+                if e.errno != errno.ENXIO or time.monotonic() > deadline:
+                    raise
+                # No reader yet
+                self._cancelled.wait(0.005)
+                continue
+            os.set_blocking(fd, True)
+            return fd
+        return None
+
+    def _write_source(self, fd):
+        source = self.source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._write(fd, memoryview(source))
+        elif hasattr(source, "readinto"):
+            view = memoryview(bytearray(self.chunk_size))
+            while not self._cancelled.is_set():
+                size = source.readinto(view)
+                if not size:
+                    break
+                self._write(fd, view[:size])
+        elif hasattr(source, "read"):
+            while not self._cancelled.is_set():
+                chunk = source.read(self.chunk_size)
+                if not chunk:
+                    break
+                self._write(fd, memoryview(chunk))
+        else:
+            for chunk in source:
+                if self._cancelled.is_set():
+                    break
+                self._write(fd, memoryview(chunk))
+
+    def _write(self, fd, view):
+        """Writes a whole memoryview, slices do not copy the data"""
+        while view:
+            written = os.write(fd, view)
+            self.bytes_written += written
+            view = view[written:]
@@ -0,0 +1,125 @@
+"""
+Mpyg Tracer class
+Records timestamped spans of the player activity (commands written,
+parsed output messages, events and their callbacks) into a ring buffer
+allocated once, and exports them in the Chrome Trace Event format, which
+chrome://tracing and https://ui.perfetto.dev open. Each player is a
+process track of the trace and each thread (output reader, dispatcher
+workers, yours) one of its threads, so the time spent in mpg123, in the
+read loop and in the callbacks shows on a single timeline.
+Recording a span costs a few hundred nanoseconds; the names are only
+computed at export time. Once the buffer is full the oldest spans are
+overwritten.
+"""
+
+import itertools
+import json
+import threading
+import time
+from enum import Enum
+from threading import Lock, get_ident
+
+
+class Tracer:
+    """Ring buffer of spans exported as a Chrome trace"""
+
+    def __init__(self, capacity=65536):
+        """capacity (rounded up to a power of 2) is the number of spans kept"""
+        size = 1
+        while size < capacity:
+            size *= 2
+        self.capacity = size
+        self._mask = size - 1
+        self._spans = [None] * size
+        self._index = itertools.count()
+        self._tracks = ["mpyg321"]  # track names, the index is the track id
+        self._threads = {}  # thread ident -> name, filled at export
+        self._lock = Lock()
+        self.origin = time.perf_counter_ns()  # time 0 of the trace
+
+    def track(self, name):
+        """Registers a track (a player) and returns its id"""
+        with self._lock:
+            self._tracks.append(name)
+            return len(self._tracks) - 1
+
+    def record(self, category, name, track, start, end):
+        """Records a span between two perf_counter_ns times on a track (0 for
+        your own spans). name may be any object (a callback, an event), it
+        is named at export.
+        """
+        index = next(self._index)
+        self._spans[index & self._mask] = (
+            index,
+            start,
+            end,
+            track,
+            get_ident(),
+            category,
+            name,
+        )
+
+    def clear(self):
+        """Drops the recorded spans"""
+        self._spans = [None] * self.capacity
+
+    def recorded(self):
+        """Number of spans recorded, including the overwritten ones"""
+        spans = self._spans
+        index = max((span[0] for span in spans if span is not None), default=-1)
+        return index + 1
+
+    def spans(self):
+        """Returns the recorded spans, oldest first, as tuples
+        (index, start, end, track, thread ident, category, name)
+        """
+        return sorted(span for span in list(self._spans) if span is not None)
+
+    def events(self):
+        """Returns the spans as a list of Chrome Trace Event dictionaries"""
+        spans = self.spans()
+        for thread in threading.enumerate():
+            self._threads[thread.ident] = thread.name
+        events = []
+        threads = set()
+        for _, start, end, track, tid, category, name in spans:
+            event = {
+                "name": _span_name(name),
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": track,
+                "tid": tid,
+            }
+            if category == "command":
+                event["args"] = {"line": name}
+            events.append(event)
+            threads.add((track, tid))
+        for track in sorted({track for track, _ in threads}):
+            events.append(_metadata("process_name", track, 0, self._tracks[track]))
+        for track, tid in sorted(threads):
+            name = self._threads.get(tid, str(tid))
+            events.append(_metadata("thread_name", track, tid, name))
+        return events
+
+    def dump(self, path):
+        """Writes the trace to path as Chrome Trace Event JSON"""
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, file)
+
+
+def _span_name(name):
+    """Name of a span recorded with a string, a command line, an event or a
+    callback
+    """
+    if isinstance(name, str):
+        return name.split(" ", 1)[0]
+    if isinstance(name, Enum):
+        return str(name.value)
+    function = getattr(name, "func", name)  # functools.partial
+    return getattr(function, "__qualname__", None) or repr(function)
+
+
+def _metadata(kind, pid, tid, name):
+    return {"name": kind, "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
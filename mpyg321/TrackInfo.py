@@ -0,0 +1,155 @@
+"""
+Mpyg TrackInfo class
+Structured view of the "@I" (ID3 tags) and "@S" (stream) messages
+sent by the player when a song is loaded, completed by the length of
+the song once the first "@F" frame message is received.
+"""
+
+import os
+
+# Field names of the "@S" message, in order
+STREAM_FIELDS = (
+    "mpeg_version",
+    "layer",
+    "sample_rate",
+    "mode",
+    "mode_extension",
+    "frame_size",
+    "channels",
+    "copyright",
+    "error_protection",
+    "emphasis",
+    "bitrate",
+    "extension",
+)
+
+# Width of the fields of the "@I ID3:" (ID3v1) message
+ID3V1_FIELDS = (("title", 30), ("artist", 30), ("album", 30), ("year", 4))
+
+
+class TrackInfo:
+    """Tags and stream information of a song"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.tags = {}  # every tag found, e.g. {"title": ..., "artist": ...}
+        self.stream = {}  # "@S" fields, see STREAM_FIELDS
+        self.frames = None
+        self.duration = None  # seconds
+
+    def __repr__(self):
+        return "TrackInfo({!r}, {!r}, duration={!r})".format(
+            self.path, self.tags, self.duration
+        )
+
+    @property
+    def title(self):
+        return self.tags.get("title")
+
+    @property
+    def artist(self):
+        return self.tags.get("artist")
+
+    @property
+    def album(self):
+        return self.tags.get("album")
+
+    @property
+    def year(self):
+        return self.tags.get("year")
+
+    @property
+    def genre(self):
+        return self.tags.get("genre")
+
+    @property
+    def bitrate(self):
+        return self.stream.get("bitrate")
+
+    @property
+    def sample_rate(self):
+        return self.stream.get("sample_rate")
+
+    @property
+    def channels(self):
+        return self.stream.get("channels")
+
+    @property
+    def frame_rate(self):
+        """MPEG frames per second, None before the "@S" message"""
+        sample_rate = self.sample_rate
+        if not sample_rate:
+            return None
+        layer = self.stream.get("layer")
+        if layer == 1:
+            samples = 384
+        elif layer == 3 and self.stream.get("mpeg_version") != 1.0:
+            # MPEG 2 and 2.5 layer 3 frames hold half as many samples
+            samples = 576
+        else:
+            samples = 1152
+        return sample_rate / samples
+
+    def parse_info(self, info):
+        """Parses the arguments of an "@I" message"""
+        if info.startswith("ID3v2."):
+            name, _, value = info[6:].partition(":")
+            self.tags[name.lower()] = value.strip()
+        elif info.startswith("ID3:"):
+            data, offset = info[4:], 0
+            for name, width in ID3V1_FIELDS:
+                value = data[offset : offset + width].strip()
+                if value:
+                    self.tags.setdefault(name, value)
+                offset += width
+            comment, genre = data[offset : offset + 30], data[offset + 30 :]
+            if comment.strip():
+                self.tags.setdefault("comment", comment.strip())
+            if genre.strip():
+                self.tags.setdefault("genre", genre.strip())
+        elif info.startswith("ICY-"):
+            # Stream metadata, e.g. "ICY-NAME: Radio"
+            name, _, value = info.partition(":")
+            self.tags[name.lower()] = value.strip()
+        elif info and "title" not in self.tags and ":" not in info:
+            # Untagged songs are announced by their name only
+            self.tags["title"] = info.strip()
+
+    def parse_stream(self, stream):
+        """Parses the arguments of an "@S" message"""
+        for name, value in zip(STREAM_FIELDS, stream.split()):
+            try:
+                value = float(value) if "." in value else int(value)
+            except ValueError:
+                pass
+            self.stream[name] = value
+        bitrate = self.stream.get("bitrate")
+        if self.duration is None and bitrate and self.path:
+            # Constant bitrate estimate, replaced by the frame count when known
+            try:
+                self.duration = os.path.getsize(self.path) * 8 / (bitrate * 1000)
+            except OSError:
+                pass
+
+    def set_length(self, position):
+        """Sets the length of the song from a PlayerPosition"""
+        self.frames = position.frame + position.frames_left
+        self.duration = position.seconds + position.seconds_left
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "tags": self.tags,
+            "stream": self.stream,
+            "frames": self.frames,
+            "duration": self.duration,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        info = cls(data.get("path"))
+        info.tags = data.get("tags", {})
+        info.stream = data.get("stream", {})
+        info.frames = data.get("frames")
+        info.duration = data.get("duration")
+        return info
@@ -1,64 +1,155 @@
+from collections import namedtuple
 from enum import Enum
 
-from pexpect import TIMEOUT as pexpectTIMEOUT
-
 mpg_outs = [
     {
         "mpg_code": "@P 0",
+        "tag": "@P 0",
         "action": "music_stop",
         "description": """For mpg123, it corresponds to any stop
                         For mpg312 it corresponds to user stop only""",
     },
     {
         "mpg_code": "@P 1",
+        "tag": "@P 1",
         "action": "user_pause",
         "description": "Music has been paused by the user.",
     },
     {
         "mpg_code": "@P 2",
+        "tag": "@P 2",
         "action": "user_start_or_resume",
         "description": "Music has been started resumed by the user.",
     },
     {
         "mpg_code": "@E *",
+        "tag": "@E",
         "action": "error",
         "description": "Player has encountered an error.",
     },
     {
         "mpg_code": "@silence",
-        "action": None,
+        "tag": "@silence",
+        "action": "silence",
         "description": "Player has been silenced by the user.",
     },
     {
         "mpg_code": r"@V [0-9\.\s%]*",
-        "action": None,
+        "tag": "@V",
+        "action": "volume",
         "description": "Volume change event.",
     },
+    {
+        "mpg_code": r"@J [0-9]*",
+        "tag": "@J",
+        "action": "jump",
+        "description": "Jump acknowledgement event.",
+    },
     {
         "mpg_code": r"@S [a-zA-Z0-9\.\s-]*",
-        "action": None,
+        "tag": "@S",
+        "action": "stream_info",
         "description": "Stereo info event.",
     },
-    {"mpg_code": "@I *", "action": None, "description": "Information event."},
-    {"mpg_code": pexpectTIMEOUT, "action": None, "description": "Timeout event."},
+    {
+        "mpg_code": r"@F [0-9\.\s-]*",
+        "tag": "@F",
+        "action": "progress",
+        "description": "Frame decoding progress event.",
+    },
+    {
+        "mpg_code": "@I *",
+        "tag": "@I",
+        "action": "info",
+        "description": "Information event.",
+    },
+    {
+        "mpg_code": None,  # pexpect.TIMEOUT, see pexpectTIMEOUT
+        "tag": None,
+        "action": None,
+        "description": "Timeout event.",
+    },
 ]
 
 mpg_outs_ext = {
     "mpg123": [
         {
             "mpg_code": "@mute",
+            "tag": "@mute",
             "action": "user_mute",
             "description": "Player has been muted by the user.",
         },
         {
             "mpg_code": "@unmute",
+            "tag": "@unmute",
             "action": "user_unmute",
             "description": "Player has been unmuted by the user.",
         },
+        {
+            "mpg_code": r"@PITCH [0-9\.-]*",
+            "tag": "@PITCH",
+            "action": "pitch",
+            "description": "Pitch change acknowledgement event.",
+        },
+        {
+            "mpg_code": r"@1 : [0-9]* : [0-9\.-]*",
+            "tag": "@1",
+            "action": "eq",
+            "description": "Equalizer change (left channel) event.",
+        },
+        {
+            "mpg_code": r"@2 : [0-9]* : [0-9\.-]*",
+            "tag": "@2",
+            "action": "eq",
+            "description": "Equalizer change (right channel) event.",
+        },
+        {
+            "mpg_code": r"@3 : [0-9]* : [0-9\.-]*",
+            "tag": "@3",
+            "action": "eq",
+            "description": "Equalizer change (both channels) event.",
+        },
+        {
+            "mpg_code": r"@bass: [0-9\.-]* mid: [0-9\.-]* treble: [0-9\.-]*",
+            "tag": "@bass:",
+            "action": "seq",
+            "description": "Simple equalizer change event.",
+        },
+        {
+            "mpg_code": "@RVA *",
+            "tag": "@RVA",
+            "action": "rva",
+            "description": "Volume adjustment mode change event.",
+        },
+        {
+            "mpg_code": "@SCAN done",
+            "tag": "@SCAN",
+            "action": "scan",
+            "description": "Seek index built by a scan of the file.",
+        },
+        {
+            "mpg_code": r"@SAMPLE [0-9]* [0-9]*",
+            "tag": "@SAMPLE",
+            "action": "sample",
+            "description": "Sample position and total samples event.",
+        },
+        {
+            "mpg_code": "@T *",
+            "tag": "@T",
+            "action": "tag_line",
+            "description": "Line of a tag listing, between @T { and @T }.",
+        },
+        {
+            "mpg_code": "@STATE *",
+            "tag": "@STATE",
+            "action": "state_line",
+            "description": "Line of a state listing, between @STATE { and @STATE }.",
+        },
     ],
     "mpg321": [
         {
             "mpg_code": "@P 3",
+            "tag": "@P 3",
             "action": "end_of_song",
             "description": "Player has reached the end of the song.",
         }
@@ -89,6 +180,7 @@ class PlayerStatus:
     STOPPING = 4
     STOPPED = 5
     QUITTED = 6
+    CRASHED = 7
 
 
 class MPyg321Events(Enum):
@@ -100,3 +192,34 @@ class MPyg321Events(Enum):
     ERROR = "error"
     USER_MUTE = "mute"
     USER_UNMUTE = "unmute"
+    PROGRESS = "progress"
+    TRACK_END = "track_end"
+    TRACK_INFO = "track_info"
+    PLAYER_CRASHED = "player_crashed"
+    PLAYER_RECOVERED = "player_recovered"
+
+
+class BackpressurePolicy(Enum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+
+
+class RepeatMode(Enum):
+    NONE = "none"
+    ONE = "one"
+    ALL = "all"
+
+
+PlayerPosition = namedtuple(
+    "PlayerPosition", ["frame", "frames_left", "seconds", "seconds_left"]
+)
+
+
+def __getattr__(name):
+    # pexpect is only imported when it is used, see BasePlayer._spawn
+    if name == "pexpectTIMEOUT":
+        from pexpect import TIMEOUT
+
+        return TIMEOUT
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -14,6 +14,7 @@ setuptools.setup(
     url="https://github.com/4br3mm0rd/mpyg321",
     packages=setuptools.find_packages(),
     install_requires=["pexpect"],
+    extras_require={"numpy": ["numpy"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",